@@ -1,13 +1,28 @@
 import os
+import time
+import uuid
+import hashlib
+import asyncio
 import logging
-import requests
 import io
 import tempfile
+import aiohttp
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
 from openai import OpenAI
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from requests.exceptions import RequestException
-from pydub import AudioSegment
+from ..utils.api_call_metrics import instrumented_call
+from ..utils.audio_format import (
+    SNIFF_BYTES, WHISPER_FORMATS, copy_to_path, encode_speech_profile, sniff_audio_format, transcode_cost,
+    transcode_to_mp3
+)
+from ..utils.call_recorder import recording_path, render_recording_wav
+from ..utils.audio_chunker import detect_silences, extract_chunk, plan_chunks, stitch_transcripts
+from ..utils.transcription_cache import get_transcription_cache
+from ..utils.http_client import get_http_session
+from ..utils.task_pools import PoolSaturatedError, run_task
+from ..utils.metrics import registry
 
 # Load environment variables
 load_dotenv()
@@ -16,79 +31,436 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Download limits
+MAX_DOWNLOAD_BYTES = int(os.getenv("AUDIO_MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Downloads stay in memory up to this size, then spill over to disk
+SPOOL_MAX_MEMORY = int(os.getenv("AUDIO_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+# Chunked transcription kicks in automatically above this size (Whisper rejects uploads over 25 MB)
+CHUNKED_TRANSCRIPTION_MIN_BYTES = int(os.getenv("CHUNKED_TRANSCRIPTION_MIN_BYTES", str(24 * 1024 * 1024)))
+CHUNK_CONCURRENCY = int(os.getenv("TRANSCRIPTION_CHUNK_CONCURRENCY", "4"))
+# Re-encode uploads as 16 kHz mono low-bitrate MP3 with long silences trimmed
+SPEECH_PROFILE_ENABLED = os.getenv("AUDIO_SPEECH_PROFILE", "false").lower() == "true"
+SPEECH_PROFILE_TRIM_SILENCE = os.getenv("AUDIO_SPEECH_PROFILE_TRIM_SILENCE", "true").lower() == "true"
+ALLOWED_CONTENT_TYPES = [
+    content_type.strip().lower()
+    for content_type in os.getenv(
+        "AUDIO_ALLOWED_CONTENT_TYPES",
+        "audio/*,video/mp4,video/mpeg,video/webm,video/ogg,application/ogg,"
+        "application/octet-stream,binary/octet-stream"
+    ).split(",")
+    if content_type.strip()
+]
+
+AUDIO_PREPARED = registry.counter(
+    "audio_prepared_total",
+    "Audio files prepared for transcription, by detected format and path taken",
+    ["format", "path"],
+)
+TRANSCODE_SECONDS_SAVED = registry.counter(
+    "audio_transcode_seconds_saved_total",
+    "Estimated transcoding time avoided by uploading supported formats untouched",
+)
+AUDIO_SOURCE_BYTES = registry.counter(
+    "audio_source_bytes_total",
+    "Bytes of source audio handed to transcription, by upload profile",
+    ["profile"],
+)
+AUDIO_UPLOADED_BYTES = registry.counter(
+    "audio_uploaded_bytes_total",
+    "Bytes of audio uploaded to Whisper, by upload profile",
+    ["profile"],
+)
+AUDIO_TRANSCRIPTION_LATENCY = registry.histogram(
+    "audio_transcription_duration_seconds",
+    "Time from receiving audio to having its transcript (preparation and upload), by upload profile",
+    ["profile"],
+    buckets=(0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+# Downloads currently in progress, keyed by download ID
+active_downloads: Dict[str, Dict] = {}
+
+
+def is_allowed_content_type(content_type: Optional[str]) -> bool:
+    """Check a Content-Type header against the allowlist"""
+    if not content_type:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    for allowed in ALLOWED_CONTENT_TYPES:
+        if allowed.endswith("/*"):
+            if media_type.startswith(allowed[:-1]):
+                return True
+        elif media_type == allowed:
+            return True
+    return False
+
+
+def get_download_progress():
+    """Get the progress of all downloads in flight"""
+    return list(active_downloads.values())
+
+
 class AudioController:
     def __init__(self):
         self.client = OpenAI()  # Automatically reads API key from env
+        self.last_audio_stats = None
         logger.info("AudioController initialized")
     
-    async def download_audio(self, audio_url):
-        """Download audio from URL"""
+    async def download_audio(self, audio_url, progress_callback: Optional[Callable[[Dict], None]] = None,
+                             headers: Optional[Dict[str, str]] = None):
+        """
+        Stream audio from a URL into a spooled temporary file
+
+        The file is checked against the size limit and content-type allowlist
+        while it streams, so memory stays flat whatever the file size. The
+        SHA-256 of the content is computed on the way.
+
+        Args:
+            audio_url (str): URL of the audio file
+            progress_callback (callable, optional): Called with the progress dict after each chunk
+            headers (dict, optional): Extra request headers, e.g. for a conditional request
+
+        Returns:
+            tuple: (SpooledTemporaryFile with the audio positioned at the start,
+            dict with the "sha256", "bytes", "etag" and "last_modified" of the
+            download), or (None, None) if the server answered 304 Not Modified
+        """
+        download_id = uuid.uuid4().hex
+        # Progress is served without auth and audio URLs are often presigned,
+        # so only the host and a hash of the URL are kept here
+        progress = {
+            "id": download_id,
+            "host": urlsplit(audio_url).hostname,
+            "url_sha256": hashlib.sha256(audio_url.encode()).hexdigest()[:16],
+            "bytes_received": 0,
+            "total_bytes": None,
+            "started_at": time.time(),
+        }
+        audio_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        content_hash = hashlib.sha256()
+        active_downloads[download_id] = progress
         try:
-            logger.info(f"Downloading audio from: {audio_url}")
-            response = requests.get(audio_url)
-            response.raise_for_status()  # Raises error for HTTP codes >= 400
-            return response.content
-        except RequestException as req_err:
+            logger.info(f"Downloading audio {progress['url_sha256']} from: {progress['host']}")
+            session = await get_http_session()
+            async with session.get(audio_url, headers=headers) as response:
+                if response.status == 304:
+                    logger.info("Audio not modified since last download")
+                    audio_file.close()
+                    return None, None
+                if response.status >= 400:
+                    logger.error(f"Audio download failed with status {response.status}")
+                    raise HTTPException(status_code=500, detail="Network error while downloading audio")
+
+                content_type = response.headers.get("Content-Type")
+                if not is_allowed_content_type(content_type):
+                    logger.error(f"Rejected audio download with content type: {content_type}")
+                    raise HTTPException(status_code=415, detail=f"Unsupported audio content type: {content_type}")
+
+                if response.content_length is not None:
+                    progress["total_bytes"] = response.content_length
+                    if response.content_length > MAX_DOWNLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail="Audio file is too large")
+
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    progress["bytes_received"] += len(chunk)
+                    if progress["bytes_received"] > MAX_DOWNLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail="Audio file is too large")
+                    audio_file.write(chunk)
+                    content_hash.update(chunk)
+                    if progress_callback:
+                        progress_callback(progress)
+
+                metadata = {
+                    "sha256": content_hash.hexdigest(),
+                    "bytes": progress["bytes_received"],
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+
+            logger.info(f"Downloaded {progress['bytes_received']} bytes in {time.time() - progress['started_at']:.2f}s")
+            audio_file.seek(0)
+            return audio_file, metadata
+        except HTTPException:
+            audio_file.close()
+            raise
+        except aiohttp.ClientError as req_err:
+            audio_file.close()
             logger.error(f"Network error while downloading audio: {req_err}")
             raise HTTPException(status_code=500, detail="Network error while downloading audio")
         except Exception as e:
+            audio_file.close()
             logger.error(f"Unexpected error downloading audio: {str(e)}")
             raise HTTPException(status_code=500, detail="Unexpected error downloading audio")
+        finally:
+            active_downloads.pop(download_id, None)
+
+    async def transcribe_url(self, audio_url, chunked=None, speech_profile=None):
+        """
+        Download and transcribe audio, reusing cached transcripts where possible
+
+        A URL seen before is fetched with a conditional request; if the server
+        answers 304 the cached transcript is returned without downloading.
+        Otherwise the downloaded bytes are hashed and looked up in the cache
+        before anything is sent to Whisper.
+
+        Args:
+            audio_url (str): URL of the audio file
+            chunked (bool, optional): Passed on to transcribe_audio
+            speech_profile (bool, optional): Passed on to transcribe_audio
+
+        Returns:
+            str: The transcript
+        """
+        cache = get_transcription_cache()
+        headers = {}
+        url_entry = cache.get_url_entry(audio_url)
+        if url_entry:
+            if url_entry.get("etag"):
+                headers["If-None-Match"] = url_entry["etag"]
+            if url_entry.get("last_modified"):
+                headers["If-Modified-Since"] = url_entry["last_modified"]
+
+        audio_file, download = await self.download_audio(audio_url, headers=headers or None)
+        if audio_file is None:
+            transcript = cache.get(url_entry["hash"], record=False)
+            if transcript is not None:
+                cache.record_revalidated()
+                self.last_audio_stats = {"cache": "revalidated", "sha256": url_entry["hash"]}
+                return transcript
+            # The entry was evicted in the meantime, fetch the file unconditionally
+            audio_file, download = await self.download_audio(audio_url)
+
+        with audio_file:
+            transcript = cache.get(download["sha256"])
+            if transcript is not None:
+                self.last_audio_stats = {"cache": "hit", "sha256": download["sha256"], "bytes": download["bytes"]}
+            else:
+                transcript = await self.transcribe_audio(audio_file, chunked=chunked, speech_profile=speech_profile)
+                if transcript:
+                    cache.put(download["sha256"], transcript)
+                self.last_audio_stats = dict(self.last_audio_stats or {}, cache="miss", sha256=download["sha256"])
+
+        cache.set_url_entry(audio_url, download["sha256"], download["etag"], download["last_modified"])
+        return transcript
+
+    async def transcribe_recording(self, call_sid, speech_profile=None):
+        """
+        Re-transcribe a call from its local recording
+
+        The memory-mapped recording written during the call is mixed down
+        to a mono 8 kHz WAV and passed to transcribe_audio, so nothing is
+        downloaded.
 
-    async def transcribe_audio(self, audio_content):
-        """Transcribe audio using OpenAI Whisper"""
+        Args:
+            call_sid (str): The Twilio call SID
+            speech_profile (bool, optional): Passed on to transcribe_audio
+
+        Returns:
+            str: The transcript
+        """
+        path = recording_path(call_sid)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="No recording for this call")
+        try:
+            wav_file = await run_task("audio", render_recording_wav, path)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        with wav_file:
+            transcript = await self.transcribe_audio(wav_file, speech_profile=speech_profile)
+        self.last_audio_stats = dict(self.last_audio_stats or {}, source="recording", call_sid=call_sid)
+        return transcript
+
+    async def transcribe_audio(self, audio_content, chunked=None, chunk_concurrency=None, speech_profile=None):
+        """
+        Transcribe audio using OpenAI Whisper
+
+        Formats Whisper accepts are uploaded untouched. Anything else is
+        transcoded to MP3 through an ffmpeg pipe first. With the speech
+        profile every upload is re-encoded as 16 kHz mono low-bitrate MP3
+        with long silences trimmed. Details about the preparation step,
+        bytes uploaded and latency are kept in self.last_audio_stats.
+
+        Args:
+            audio_content: The audio as bytes or a binary file object
+            chunked (bool, optional): Split the recording at silences and transcribe
+                the chunks in parallel; by default only for files over
+                CHUNKED_TRANSCRIPTION_MIN_BYTES
+            chunk_concurrency (int, optional): Chunks transcribed at once,
+                defaults to TRANSCRIPTION_CHUNK_CONCURRENCY
+            speech_profile (bool, optional): Use the speech profile, defaults to AUDIO_SPEECH_PROFILE
+        """
         try:
-            if not audio_content:
+            audio_file = io.BytesIO(audio_content) if isinstance(audio_content, (bytes, bytearray)) else audio_content
+            audio_size = audio_file.seek(0, io.SEEK_END) if audio_file is not None else 0
+            if not audio_size:
                 logger.error("Empty audio content received")
                 raise HTTPException(status_code=400, detail="Empty audio content received")
+            audio_file.seek(0)
             
-            logger.info(f"Processing audio content, size: {len(audio_content)} bytes")
-            
-            # Create a temporary directory to work with the audio files
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Save the original audio content to a temporary file
-                original_file = os.path.join(temp_dir, "original_audio")
-                with open(original_file, "wb") as f:
-                    f.write(audio_content)
-                
+            logger.info(f"Processing audio content, size: {audio_size} bytes")
+
+            prepare_start = time.perf_counter()
+            audio_format = sniff_audio_format(audio_file.read(SNIFF_BYTES))
+            audio_file.seek(0)
+            logger.info(f"Detected audio format: {audio_format or 'unknown'}")
+
+            stats = {
+                "format": audio_format,
+                "bytes": audio_size,
+                "transcoded": False,
+                "uploaded_bytes": audio_size,
+                "prepare_seconds": 0.0,
+                "estimated_seconds_saved": 0.0,
+                "profile": "standard",
+            }
+            self.last_audio_stats = stats
+
+            if chunked is None:
+                chunked = audio_size > CHUNKED_TRANSCRIPTION_MIN_BYTES
+            if chunked:
+                return await self._transcribe_chunked(audio_file, stats, chunk_concurrency or CHUNK_CONCURRENCY)
+
+            if speech_profile is None:
+                speech_profile = SPEECH_PROFILE_ENABLED
+            if speech_profile:
                 try:
-                    # Convert to a format that Whisper definitely supports (mp3)
-                    logger.info("Converting audio to MP3 format")
-                    audio = AudioSegment.from_file(original_file)
-                    mp3_file = os.path.join(temp_dir, "converted_audio.mp3")
-                    audio.export(mp3_file, format="mp3")
-                    
-                    # Transcribe with OpenAI Whisper using the converted file
-                    logger.info("Transcribing audio with Whisper API...")
-                    with open(mp3_file, "rb") as audio_file:
-                        try:
-                            transcript_response = self.client.audio.transcriptions.create(
-                                model="whisper-1",
-                                file=audio_file,
-                                response_format="text"
-                            )
-                            logger.info(f"Transcription successful: {transcript_response[:100] if transcript_response else 'Empty response'}...")
-                            return transcript_response  # Response is already a string
-                        except Exception as api_err:
-                            logger.error(f"Whisper API error: {str(api_err)}")
-                            raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI API: {str(api_err)}")
-                except Exception as convert_err:
-                    logger.error(f"Error converting audio: {str(convert_err)}")
-                    
-                    # Fallback: Try sending the original file directly
-                    logger.info("Conversion failed, trying with original file...")
-                    with open(original_file, "rb") as audio_file:
-                        try:
-                            transcript_response = self.client.audio.transcriptions.create(
-                                model="whisper-1",
-                                file=audio_file,
-                                response_format="text"
-                            )
-                            logger.info(f"Transcription successful: {transcript_response[:100] if transcript_response else 'Empty response'}...")
-                            return transcript_response
-                        except Exception as api_err:
-                            logger.error(f"Whisper API error with original file: {str(api_err)}")
-                            raise HTTPException(status_code=500, detail=f"Error processing audio: {str(api_err)}")
+                    logger.info("Encoding audio with the speech profile")
+                    encoded, profile_stats = await encode_speech_profile(
+                        audio_file, trim_silence=SPEECH_PROFILE_TRIM_SILENCE
+                    )
+                except PoolSaturatedError as encode_err:
+                    logger.warning(f"Skipping the speech profile: {str(encode_err)}")
+                    audio_file.seek(0)
+                except Exception as encode_err:
+                    logger.error(f"Speech profile encoding failed, using the standard path: {str(encode_err)}")
+                    audio_file.seek(0)
+                else:
+                    AUDIO_PREPARED.labels(audio_format or "unknown", "speech_profile").inc()
+                    with encoded:
+                        stats.update(profile_stats)
+                        stats["profile"] = "speech"
+                        stats["transcoded"] = True
+                        stats["uploaded_bytes"] = encoded.seek(0, io.SEEK_END)
+                        stats["prepare_seconds"] = round(time.perf_counter() - prepare_start, 3)
+                        encoded.seek(0)
+                        return await self._transcribe_prepared(
+                            ("speech_audio.mp3", encoded), "Whisper API error", stats, prepare_start
+                        )
+
+            if audio_format in WHISPER_FORMATS:
+                # Already something Whisper understands, send it as-is
+                saved = transcode_cost.estimate(audio_size)
+                stats["estimated_seconds_saved"] = round(saved, 3)
+                stats["prepare_seconds"] = round(time.perf_counter() - prepare_start, 3)
+                TRANSCODE_SECONDS_SAVED.inc(saved)
+                AUDIO_PREPARED.labels(audio_format, "passthrough").inc()
+                return await self._transcribe_prepared(
+                    (f"audio.{audio_format}", audio_file), "Whisper API error", stats, prepare_start
+                )
+
+            try:
+                logger.info("Transcoding audio to MP3 through ffmpeg")
+                converted = await transcode_to_mp3(audio_file)
+            except Exception as convert_err:
+                logger.error(f"Error converting audio: {str(convert_err)}")
+                
+                # Fallback: Try sending the original file directly
+                logger.info("Conversion failed, trying with original file...")
+                AUDIO_PREPARED.labels(audio_format or "unknown", "fallback").inc()
+                audio_file.seek(0)
+                return await self._transcribe_prepared(
+                    ("original_audio", audio_file), "Whisper API error with original file", stats, prepare_start
+                )
+
+            AUDIO_PREPARED.labels(audio_format or "unknown", "transcoded").inc()
+            with converted:
+                stats["transcoded"] = True
+                stats["uploaded_bytes"] = converted.seek(0, io.SEEK_END)
+                stats["prepare_seconds"] = round(time.perf_counter() - prepare_start, 3)
+                converted.seek(0)
+                return await self._transcribe_prepared(
+                    ("converted_audio.mp3", converted), "Whisper API error", stats, prepare_start
+                )
+        except HTTPException:
+            raise
+        except PoolSaturatedError as e:
+            logger.warning(f"Rejecting transcription: {str(e)}")
+            raise HTTPException(status_code=503, detail="Transcription is at capacity, try again shortly")
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Unexpected error transcribing audio: {str(e)}")
+
+    async def _transcribe_chunked(self, audio_file, stats, concurrency):
+        """Split audio at silences and transcribe the chunks concurrently"""
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # ffmpeg needs a seekable file on disk to cut chunks from
+            source_path = os.path.join(temp_dir, "source_audio")
+            audio_file.seek(0)
+            await run_task("audio", copy_to_path, audio_file, source_path)
+
+            duration, silences = await detect_silences(source_path)
+            if not duration:
+                raise HTTPException(status_code=400, detail="Could not determine audio duration")
+            chunks = plan_chunks(duration, silences)
+            logger.info(f"Transcribing {duration:.0f}s of audio in {len(chunks)} chunks, {concurrency} at a time")
+
+            semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+            async def transcribe_chunk(index, chunk_start, chunk_end):
+                async with semaphore:
+                    chunk_file = await extract_chunk(source_path, chunk_start, chunk_end)
+                    with chunk_file:
+                        # The OpenAI client is synchronous, run it off the event loop
+                        return await run_task(
+                            "transcription",
+                            self._transcribe_file, (f"chunk_{index}.mp3", chunk_file), f"Whisper API error on chunk {index}"
+                        )
+
+            texts = await asyncio.gather(*(
+                transcribe_chunk(index, chunk_start, chunk_end)
+                for index, (chunk_start, chunk_end) in enumerate(chunks)
+            ))
+
+        overlaps = [index > 0 and chunks[index][0] < chunks[index - 1][1] for index in range(len(chunks))]
+        stats.update({
+            "transcoded": True,
+            "chunks": len(chunks),
+            "chunk_concurrency": concurrency,
+            "audio_seconds": round(duration, 3),
+            "prepare_seconds": round(time.perf_counter() - start, 3),
+        })
+        AUDIO_PREPARED.labels(stats["format"] or "unknown", "chunked").inc()
+        return stitch_transcripts(texts, overlaps)
+
+    async def _transcribe_prepared(self, upload, error_message, stats, started):
+        """Transcribe a prepared upload and record bytes uploaded and end-to-end latency"""
+        transcribe_start = time.perf_counter()
+        # The OpenAI client is synchronous, run it off the event loop
+        transcript = await run_task("transcription", self._transcribe_file, upload, error_message)
+        finished = time.perf_counter()
+        stats["transcribe_seconds"] = round(finished - transcribe_start, 3)
+        stats["total_seconds"] = round(finished - started, 3)
+        stats["bytes_saved"] = stats["bytes"] - stats["uploaded_bytes"]
+        AUDIO_SOURCE_BYTES.labels(stats["profile"]).inc(stats["bytes"])
+        AUDIO_UPLOADED_BYTES.labels(stats["profile"]).inc(stats["uploaded_bytes"])
+        AUDIO_TRANSCRIPTION_LATENCY.labels(stats["profile"]).observe(finished - started)
+        return transcript
+
+    def _transcribe_file(self, upload, error_message):
+        """Send a prepared (filename, file) upload to Whisper"""
+        logger.info("Transcribing audio with Whisper API...")
+        try:
+            transcript_response = instrumented_call(
+                "audio.transcribe_audio",
+                self.client.with_options(max_retries=0).audio.transcriptions.create,
+                model="whisper-1",
+                file=upload,
+                response_format="text"
+            )
+            logger.info(f"Transcription successful: {transcript_response[:100] if transcript_response else 'Empty response'}...")
+            return transcript_response  # Response is already a string
+        except Exception as api_err:
+            logger.error(f"{error_message}: {str(api_err)}")
+            raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI API: {str(api_err)}")
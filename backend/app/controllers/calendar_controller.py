@@ -1,18 +1,22 @@
+import asyncio
 import logging
 import os
 import aiohttp
 from ..services.google_calendar_service import GoogleCalendarService
-from ..services.firebase_service import FirebaseService
+from ..services.firebase_service import get_firebase_service
 from fastapi import HTTPException
 from datetime import datetime
 from firebase_admin import auth
 
 logger = logging.getLogger(__name__)
 
+# Token refreshes sent to Google at once by refresh_expired_tokens
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("GOOGLE_TOKEN_REFRESH_CONCURRENCY", "10"))
+
 class CalendarController:
     def __init__(self):
         self.calendar_service = GoogleCalendarService()
-        self.firebase_service = FirebaseService()
+        self.firebase_service = get_firebase_service()
         self.google_token_url = 'https://oauth2.googleapis.com/token'
         logger.info("Calendar Controller initialized")
     
@@ -67,6 +71,54 @@ class CalendarController:
                 detail=f"Failed to refresh access token: {str(e)}"
             )
     
+    async def refresh_expired_tokens(self, user_emails: list) -> dict:
+        """
+        Refresh the Google access tokens of many users at once
+        
+        Tokens are read with one batched Firestore read, expired ones are
+        refreshed concurrently and the results are written back in batches.
+        
+        Args:
+            user_emails (list): Emails of the users
+            
+        Returns:
+            dict: Lists of emails that were "refreshed", still "valid", "missing" or "failed"
+        """
+        tokens_by_email = await self.firebase_service.get_user_tokens_many(user_emails)
+        current_time = datetime.now().timestamp()
+        result = {"refreshed": [], "valid": [], "missing": [], "failed": []}
+        semaphore = asyncio.Semaphore(TOKEN_REFRESH_CONCURRENCY)
+        updated = {}
+        
+        async def refresh(email, tokens):
+            async with semaphore:
+                try:
+                    updated[email] = dict(tokens, **await self.refresh_access_token(tokens['refresh_token']))
+                except Exception as e:
+                    logger.error(f"Could not refresh tokens for {email}: {str(e)}")
+                    result["failed"].append(email)
+        
+        refreshes = []
+        for email, tokens in tokens_by_email.items():
+            if not tokens or not tokens.get('refresh_token'):
+                result["missing"].append(email)
+            elif current_time >= float(tokens.get('token_expiry', 0)):
+                refreshes.append(refresh(email, tokens))
+            else:
+                result["valid"].append(email)
+        await asyncio.gather(*refreshes)
+        
+        if updated:
+            if await self.firebase_service.store_user_tokens_many(updated):
+                result["refreshed"] = list(updated)
+            else:
+                result["failed"].extend(updated)
+        logger.info(
+            f"Token refresh: {len(result['refreshed'])} refreshed, {len(result['valid'])} valid, "
+            f"{len(result['missing'])} missing, {len(result['failed'])} failed"
+        )
+        return result
+    
     async def create_event(self, user_id: str, meeting_data: dict) -> dict:
         """
         Create a calendar event using the user's stored tokens
@@ -90,7 +142,7 @@ class CalendarController:
                 )
             
             # Get user's tokens from Firebase using email
-            tokens = self.firebase_service.get_user_tokens(user_email)
+            tokens = await self.firebase_service.get_user_tokens_async(user_email)
             
             if not tokens:
                 raise HTTPException(
@@ -111,7 +163,7 @@ class CalendarController:
                 
                 # Update the stored tokens
                 tokens.update(updated_tokens)
-                self.firebase_service.store_user_tokens(user_email, tokens)
+                await self.firebase_service.store_user_tokens_async(user_email, tokens)
                 
                 logger.info("Successfully refreshed and stored new access token")
             
@@ -3,8 +3,10 @@ import logging
 from elevenlabs import ElevenLabs
 from elevenlabs.conversational_ai.conversation import Conversation, ConversationInitiationData
 from dotenv import load_dotenv
-import requests
 import aiohttp
+from ..utils.conversation_cache import get_conversation_cache
+from ..utils.http_client import get_http_session
+from ..utils.signed_url_pool import create_signed_url_pool
 
 # Load environment variables
 load_dotenv()
@@ -13,12 +15,34 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
+
+
+async def fetch_signed_url():
+    """Mint a signed URL for the web agent from the ElevenLabs API"""
+    agent_id = os.getenv("AGENT_ID")
+    session = await get_http_session()
+    async with session.get(
+        f"{ELEVENLABS_BASE_URL}/convai/conversation/get_signed_url",
+        params={"agent_id": agent_id},
+        headers={"xi-api-key": os.getenv("ELEVENLABS_API_KEY") or ""}
+    ) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise Exception(f"ElevenLabs API error ({response.status}): {error_text}")
+        data = await response.json()
+        return data.get("signed_url")
+
+
+# Shared by all controller instances so URLs minted in the background survive between requests
+signed_url_pool = create_signed_url_pool(fetch_signed_url)
+
 class ElevenLabsController:
     def __init__(self):
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         self.agent_id = os.getenv("AGENT_ID")
         self.client = ElevenLabs(api_key=self.api_key)
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = ELEVENLABS_BASE_URL
         
         if not self.api_key:
             logger.warning("ELEVENLABS_API_KEY not set in environment variables")
@@ -189,46 +213,51 @@ class ElevenLabsController:
             raise Exception(f"Error in conversation: {str(e)}")
 
     async def get_signed_url(self):
-        """Get a signed URL for connecting to the agent"""
+        """
+        Get a signed URL for connecting to the agent
+        
+        URLs come from the pre-minted pool; when it's empty one is fetched
+        directly without blocking the event loop.
+        """
         try:
-            logger.info(f"Getting signed URL for agent {self.agent_id}")
-            
-            url = f"https://api.elevenlabs.io/v1/convai/conversation/get_signed_url?agent_id={self.agent_id}"
-            headers = {"xi-api-key": self.api_key}
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            return {"signedUrl": data.get("signed_url")}
+            return {"signedUrl": await signed_url_pool.get()}
         
         except Exception as e:
             logger.error(f"Error getting signed URL: {str(e)}")
             raise Exception(f"Error getting signed URL: {str(e)}")
             
     async def get_conversation_details(self, conversation_id):
-        """Get conversation details from ElevenLabs API"""
-        logger.info(f"Getting conversation details for ID: {conversation_id}")
+        """
+        Get conversation details, from the cache once the conversation has finished
         
+        Finished conversations never change, so they are served from the
+        conversation cache. Concurrent requests for the same uncached
+        conversation share one ElevenLabs API call.
+        """
+        logger.info(f"Getting conversation details for ID: {conversation_id}")
+        return await get_conversation_cache().get_or_fetch(conversation_id, self._fetch_conversation_details)
+    
+    async def _fetch_conversation_details(self, conversation_id):
+        """Get conversation details from ElevenLabs API"""
         if not self.api_key:
             raise Exception("ElevenLabs API key not configured")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/convai/conversation/{conversation_id}"
-                headers = {"xi-api-key": self.api_key}
+            session = await get_http_session()
+            url = f"{self.base_url}/convai/conversation/{conversation_id}"
+            headers = {"xi-api-key": self.api_key}
+            
+            async with session.get(url, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"ElevenLabs API error: {error_text}")
+                    raise Exception(
+                        f"ElevenLabs API error: {error_text}"
+                    )
                 
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"ElevenLabs API error: {error_text}")
-                        raise Exception(
-                            f"ElevenLabs API error: {error_text}"
-                        )
-                    
-                    data = await response.json()
-                    logger.info(f"Successfully retrieved conversation details")
-                    return data
+                data = await response.json()
+                logger.info(f"Successfully retrieved conversation details")
+                return data
                     
         except aiohttp.ClientError as e:
             logger.error(f"Error connecting to ElevenLabs API: {str(e)}")
@@ -1,17 +1,28 @@
 import logging
 from fastapi import HTTPException
 from ..services.meeting_service import MeetingService
+from ..services.meeting_repository import parse_start_ts
 from ..controllers.audio_controller import AudioController
 from ..controllers.text_parser_controller import TextParserController
 from ..controllers.elevenlabs_controller import ElevenLabsController
+from ..utils.api_call_metrics import instrumented_call
+from ..utils.task_pools import run_task_when_free
 from openai import OpenAI
 import os
 import json
+import time
+import asyncio
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Limits for /api/process-conversations/bulk
+BULK_MAX_CONVERSATIONS = int(os.getenv("BULK_MAX_CONVERSATIONS", "5000"))
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "64"))
+BULK_ELEVENLABS_CONCURRENCY = int(os.getenv("BULK_ELEVENLABS_CONCURRENCY", "16"))
+BULK_LLM_CONCURRENCY = int(os.getenv("BULK_LLM_CONCURRENCY", "4"))
+
 class MeetingController:
     def __init__(self):
         self.meeting_service = MeetingService()
@@ -24,17 +35,17 @@ class MeetingController:
         # Initialize OpenAI client
         self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     
-    async def process_audio(self, audio_url, user_id=None, client_id=None, meeting_id=None):
+    async def process_audio(self, audio_url, user_id=None, client_id=None, meeting_id=None, chunked=None,
+                            speech_profile=None):
         """Process audio and extract meeting details"""
         try:
-            # Download audio
-            audio_content = await self.audio_controller.download_audio(audio_url)
-            
-            # Transcribe audio
-            transcript = await self.audio_controller.transcribe_audio(audio_content)
+            # Download and transcribe audio, reusing cached transcripts for known content
+            transcript = await self.audio_controller.transcribe_url(
+                audio_url, chunked=chunked, speech_profile=speech_profile
+            )
             
             # Parse transcript
-            parser_result = self.text_parser.parse_to_json(transcript)
+            parser_result = await run_task_when_free("llm", self.text_parser.parse_to_json, transcript)
             
             # Check if parsing was successful
             if isinstance(parser_result, tuple):
@@ -59,7 +70,8 @@ class MeetingController:
                 "status": "success",
                 "message": "Audio processed successfully",
                 "transcript": transcript,
-                "meeting": meeting_data
+                "meeting": meeting_data,
+                "audioProcessing": self.audio_controller.last_audio_stats
             }
         except Exception as e:
             logger.error(f"Error processing audio: {str(e)}")
@@ -76,7 +88,7 @@ class MeetingController:
             logger.info(f"Processing transcript from frontend: {transcript[:100]}...")
             
             # Parse transcript using the text parser controller
-            parser_result = self.text_parser.parse_to_json(transcript)
+            parser_result = await run_task_when_free("llm", self.text_parser.parse_to_json, transcript)
             
             # Check if parsing was successful
             if isinstance(parser_result, tuple):
@@ -110,16 +122,12 @@ class MeetingController:
             conversation_details = await self.elevenlabs_controller.get_conversation_details(conversation_id)
             
             # Extract the transcript
-            transcript = ""
-            if "messages" in conversation_details:
-                for message in conversation_details["messages"]:
-                    role = "Assistant" if message.get("source") == "agent" else "User"
-                    transcript += f"{role}: {message.get('message', '')}\n"
+            transcript = self._conversation_transcript(conversation_details)
             
             logger.info(f"Extracted transcript: {transcript[:200]}...")
             
             # Use the existing text parser to extract meeting details
-            parser_result = self.text_parser.parse_to_json(transcript)
+            parser_result = await run_task_when_free("llm", self.text_parser.parse_to_json, transcript)
             
             # Check if parsing was successful
             if isinstance(parser_result, tuple):
@@ -138,6 +146,85 @@ class MeetingController:
             logger.error(f"Error processing conversation: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
     
+    def _conversation_transcript(self, conversation_details):
+        """Build a "Role: message" transcript from ElevenLabs conversation details"""
+        transcript = ""
+        if "messages" in conversation_details:
+            for message in conversation_details["messages"]:
+                role = "Assistant" if message.get("source") == "agent" else "User"
+                transcript += f"{role}: {message.get('message', '')}\n"
+        return transcript
+    
+    def process_conversations_bulk(self, conversation_ids, elevenlabs_concurrency=None, llm_concurrency=None):
+        """
+        Process many conversations concurrently
+        
+        Conversation fetches and LLM parses are limited separately, so a
+        slow upstream doesn't hold slots the other one could use. LLM calls
+        also go through the shared "llm" task pool, which bounds them across
+        all bulk jobs.
+        
+        Args:
+            conversation_ids (list): Conversation IDs to process
+            elevenlabs_concurrency (int, optional): Fetches in flight at once,
+                defaults to BULK_ELEVENLABS_CONCURRENCY
+            llm_concurrency (int, optional): Parses in flight at once, defaults to BULK_LLM_CONCURRENCY
+            
+        Returns:
+            async iterator: One result dict per conversation, in the order they finish
+        """
+        if not conversation_ids:
+            raise HTTPException(status_code=400, detail="conversationIds must not be empty")
+        if len(conversation_ids) > BULK_MAX_CONVERSATIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {BULK_MAX_CONVERSATIONS} conversations can be processed per request"
+            )
+        elevenlabs_concurrency = elevenlabs_concurrency or BULK_ELEVENLABS_CONCURRENCY
+        llm_concurrency = llm_concurrency or BULK_LLM_CONCURRENCY
+        if not (1 <= elevenlabs_concurrency <= BULK_MAX_CONCURRENCY and 1 <= llm_concurrency <= BULK_MAX_CONCURRENCY):
+            raise HTTPException(status_code=400, detail=f"Concurrency must be between 1 and {BULK_MAX_CONCURRENCY}")
+        return self._process_conversations_bulk(conversation_ids, elevenlabs_concurrency, llm_concurrency)
+    
+    async def _process_conversations_bulk(self, conversation_ids, elevenlabs_concurrency, llm_concurrency):
+        fetch_limit = asyncio.Semaphore(elevenlabs_concurrency)
+        llm_limit = asyncio.Semaphore(llm_concurrency)
+        logger.info(
+            f"Bulk processing {len(conversation_ids)} conversations "
+            f"({elevenlabs_concurrency} fetches, {llm_concurrency} parses at a time)"
+        )
+        
+        async def process(index, conversation_id):
+            started = time.perf_counter()
+            result = {"index": index, "conversationId": conversation_id}
+            try:
+                async with fetch_limit:
+                    conversation_details = await self.elevenlabs_controller.get_conversation_details(conversation_id)
+                transcript = self._conversation_transcript(conversation_details)
+                async with llm_limit:
+                    # Waits for a free slot in the shared pool instead of failing when other jobs fill it
+                    parser_result = await run_task_when_free("llm", self.text_parser.parse_to_json, transcript)
+                if isinstance(parser_result, tuple):
+                    error_response, _ = parser_result
+                    raise Exception(error_response.get('error', 'Failed to parse transcript'))
+                meeting_data = parser_result.get('formData', {})
+                self.meeting_service.create_meeting(meeting_data)
+                result.update(status="success", meeting=meeting_data)
+            except Exception as e:
+                logger.error(f"Error processing conversation {conversation_id}: {str(e)}")
+                result.update(status="error", error=str(e))
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            return result
+        
+        tasks = [asyncio.create_task(process(index, conversation_id)) for index, conversation_id in enumerate(conversation_ids)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The client went away or the stream ended, don't leave work running
+            for task in tasks:
+                task.cancel()
+    
     async def extract_meeting_details(self, transcript):
         """Extract meeting details from transcript using OpenAI"""
         try:
@@ -155,7 +242,12 @@ class MeetingController:
             JSON:
             """
             
-            response = self.openai_client.chat.completions.create(
+            # The client and instrumented_call's retry backoff both block, keep them off the event loop
+            response = await run_task_when_free(
+                "llm",
+                instrumented_call,
+                "meeting.extract_meeting_details",
+                self.openai_client.with_options(max_retries=0).chat.completions.create,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that extracts meeting details from conversations."},
@@ -200,6 +292,44 @@ class MeetingController:
         """Get all meetings"""
         return self.meeting_service.get_all_meetings()
     
+    def _parse_time_filter(self, name, value):
+        if value is None:
+            return None
+        timestamp = parse_start_ts(value)
+        if timestamp is None:
+            raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date-time")
+        return timestamp
+    
+    def get_meetings_page(self, user_id=None, client_id=None, start_from=None, start_to=None, cursor=None, limit=100):
+        """
+        Get one page of meetings ordered by start time
+        
+        Args:
+            start_from (str, optional): ISO date-time, only meetings starting at or after it
+            start_to (str, optional): ISO date-time, only meetings starting before it
+            cursor (str, optional): nextCursor from the previous page
+            limit (int): Page size
+            
+        Returns:
+            str: JSON body {"meetings": [...], "nextCursor": ...}, assembled from the
+            stored JSON without re-serializing each meeting
+        """
+        start_from = self._parse_time_filter("startFrom", start_from)
+        start_to = self._parse_time_filter("startTo", start_to)
+        try:
+            meetings, next_cursor = self.meeting_service.get_meetings_page(
+                user_id, client_id, start_from, start_to, cursor, limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return '{"meetings":[' + ",".join(meetings) + '],"nextCursor":' + json.dumps(next_cursor) + "}"
+    
+    def stream_meetings(self, user_id=None, client_id=None, start_from=None, start_to=None):
+        """Get an NDJSON line iterator over all matching meetings"""
+        start_from = self._parse_time_filter("startFrom", start_from)
+        start_to = self._parse_time_filter("startTo", start_to)
+        return self.meeting_service.iter_meetings_ndjson(user_id, client_id, start_from, start_to)
+    
     def get_meeting_example(self):
         """Get example meeting"""
         import os
@@ -7,6 +7,8 @@ import pytz
 from openai import OpenAI
 from fastapi import HTTPException
 from dotenv import load_dotenv
+from ..utils.transcript_budget import reduce_transcript
+from ..utils.api_call_metrics import instrumented_call
 
 # Load environment variables
 load_dotenv()
@@ -20,7 +22,7 @@ class TextParserController:
         self.client = OpenAI()  # Automatically reads API key from env
         logger.info("TextParserController initialized")
 
-    def parse_to_json(self, transcript, host_availability=None, host_name=None):
+    def parse_to_json(self, transcript, host_availability=None, host_name=None, token_budget=None):
         """
         Parse a conversation transcript to extract meeting details
         
@@ -28,6 +30,8 @@ class TextParserController:
             transcript (str): The conversation transcript
             host_availability (str, optional): Host's availability constraints
             host_name (str, optional): Host's name
+            token_budget (int, optional): Maximum transcript tokens sent to the model,
+                defaults to TRANSCRIPT_TOKEN_BUDGET
             
         Returns:
             dict: Extracted meeting details
@@ -139,9 +143,22 @@ class TextParserController:
                 
             system_content += "\n\nParse the conversation and ensure your output matches the structure of the example exactly."
 
+            # Keep long calls within the token budget
+            reduction = reduce_transcript(transcript, token_budget=token_budget)
+            transcript_stats = reduction["stats"]
+            if reduction["trimmed"]:
+                logger.info(
+                    f"Transcript trimmed from {transcript_stats['original_tokens']} to "
+                    f"{transcript_stats['kept_tokens']} tokens "
+                    f"({transcript_stats['trimmed_turns']} of {transcript_stats['original_turns']} turns dropped)"
+                )
+            transcript = reduction["transcript"]
+
             logger.info("Sending to GPT-4o-mini...")
             try:
-                completion = self.client.chat.completions.create(
+                completion = instrumented_call(
+                    "text_parser.parse_to_json",
+                    self.client.with_options(max_retries=0).chat.completions.create,
                     model="gpt-4o-mini",
                     messages=[
                         {
@@ -171,7 +188,8 @@ class TextParserController:
                 logger.info(f"Successfully parsed JSON response")
                 return {
                     'success': True,
-                    'formData': parsed_json
+                    'formData': parsed_json,
+                    'transcriptStats': transcript_stats
                 }
             except json.JSONDecodeError as e:
                 logger.error(f"Invalid JSON from GPT: {str(e)}")
@@ -186,7 +204,8 @@ class TextParserController:
                         logger.info(f"Extracted JSON from markdown code block: {parsed_json}")
                         return {
                             'success': True,
-                            'formData': parsed_json
+                            'formData': parsed_json,
+                            'transcriptStats': transcript_stats
                         }
                     except Exception as ex:
                         logger.error(f"Error parsing extracted JSON: {ex}")
@@ -2,6 +2,7 @@ import os
 import logging
 from fastapi import HTTPException
 from twilio.rest import Client
+from twilio.http.async_http_client import AsyncTwilioHttpClient
 from dotenv import load_dotenv
 import urllib.parse
 
@@ -12,6 +13,49 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds before a Twilio REST request is abandoned, so a hung request can't hold a campaign slot
+TWILIO_REQUEST_TIMEOUT = float(os.getenv("TWILIO_REQUEST_TIMEOUT_SECONDS", "15"))
+
+class TimeoutAsyncTwilioHttpClient(AsyncTwilioHttpClient):
+    """AsyncTwilioHttpClient keeps its timeout argument but never applies it; use it for every request"""
+
+    async def request(self, method, url, *args, timeout=None, **kwargs):
+        return await super().request(method, url, *args, timeout=timeout or self.timeout, **kwargs)
+
+# Async REST client shared by all requests, so calls are placed without blocking the event loop
+_async_client = None
+
+def get_async_twilio_client():
+    """Get the process-wide Twilio client backed by aiohttp; must be called on the event loop"""
+    global _async_client
+    if _async_client is None:
+        _async_client = Client(
+            os.getenv("TWILIO_ACCOUNT_SID"),
+            os.getenv("TWILIO_AUTH_TOKEN"),
+            http_client=TimeoutAsyncTwilioHttpClient(timeout=TWILIO_REQUEST_TIMEOUT)
+        )
+    return _async_client
+
+async def close_async_twilio_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.http_client.close()
+        _async_client = None
+
+def format_phone_number(phone_number):
+    """Normalize a phone number to E.164, assuming US for 10-digit numbers"""
+    to_number = phone_number.strip()
+    
+    # If the number doesn't start with +, add the country code
+    if not to_number.startswith('+'):
+        # If it's a 10-digit US number, add +1
+        if len(to_number) == 10 and to_number.isdigit():
+            to_number = f"+1{to_number}"
+        # Otherwise just add + (assuming it already has country code)
+        else:
+            to_number = f"+{to_number}"
+    return to_number
+
 class TwilioController:
     def __init__(self):
         # Get Twilio credentials from environment variables
@@ -25,8 +69,7 @@ class TwilioController:
         if not all([self.account_sid, self.auth_token, self.twilio_phone]):
             logger.warning("Twilio credentials not fully configured")
         else:
-            # Initialize Twilio client
-            self.client = Client(self.account_sid, self.auth_token)
+            # REST calls go through the shared async client, see get_async_twilio_client
             logger.info("Twilio controller initialized")
     
     async def initiate_call(self, phone_number, host_availability=None, host_email=None, host_name=None):
@@ -50,53 +93,16 @@ class TwilioController:
         print("=========================================\n")
         
         # Format the phone number
-        to_number = phone_number.strip()
-        
-        # If the number doesn't start with +, add the country code
-        if not to_number.startswith('+'):
-            # If it's a 10-digit US number, add +1
-            if len(to_number) == 10 and to_number.isdigit():
-                to_number = f"+1{to_number}"
-            # Otherwise just add + (assuming it already has country code)
-            else:
-                to_number = f"+{to_number}"
+        to_number = format_phone_number(phone_number)
         
         print(f"\n=== TWILIO CONTROLLER: FORMATTED PHONE NUMBER ===")
         print(f"Original: '{phone_number}'")
         print(f"Formatted: '{to_number}'")
         print(f"==============================================\n")
         
-        # Construct the webhook URL with properly encoded parameters
-        webhook_url = f"{self.render_external_url}/api/twilio/voice"
-        
-        # Add query parameters with proper URL encoding
-        params = {}
-        if host_availability:
-            params['availability'] = host_availability
-        if host_email:
-            params['host_email'] = host_email
-        if host_name:
-            params['host_name'] = host_name
-            
-        # Add parameters to URL if we have any
-        if params:
-            query_string = "&".join([f"{k}={urllib.parse.quote(v)}" for k, v in params.items()])
-            webhook_url = f"{webhook_url}?{query_string}"
-        
-        print("\n=== TWILIO CONTROLLER: WEBHOOK URL ===")
-        print(f"Webhook URL: '{webhook_url}'")
-        print("======================================\n")
-        
         try:
             # Initiate the call
-            call = self.client.calls.create(
-                to=to_number,
-                from_=self.twilio_phone,
-                url=webhook_url,
-                status_callback=f"{self.render_external_url}/api/twilio/status",
-                status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
-                status_callback_method='POST'
-            )
+            call = await self.create_call(to_number, host_availability, host_email, host_name)
             
             print(f"\n=== TWILIO CONTROLLER: CALL INITIATED ===")
             print(f"Call SID: {call.sid}")
@@ -115,4 +121,45 @@ class TwilioController:
             return {
                 "status": "error",
                 "message": str(e)
-            } 
\ No newline at end of file
+            }
+
+    def build_webhook_url(self, host_availability=None, host_email=None, host_name=None):
+        """Build the /voice webhook URL with the host parameters in the query string"""
+        # Construct the webhook URL with properly encoded parameters
+        webhook_url = f"{self.render_external_url}/api/twilio/voice"
+        
+        # Add query parameters with proper URL encoding
+        params = {}
+        if host_availability:
+            params['availability'] = host_availability
+        if host_email:
+            params['host_email'] = host_email
+        if host_name:
+            params['host_name'] = host_name
+            
+        # Add parameters to URL if we have any
+        if params:
+            query_string = "&".join([f"{k}={urllib.parse.quote(v)}" for k, v in params.items()])
+            webhook_url = f"{webhook_url}?{query_string}"
+        return webhook_url
+
+    async def create_call(self, to_number, host_availability=None, host_email=None, host_name=None):
+        """
+        Place a call to an E.164 number with the async Twilio client
+        
+        Returns:
+            CallInstance: The created call
+            
+        Raises:
+            TwilioRestException: If Twilio rejects the request
+        """
+        webhook_url = self.build_webhook_url(host_availability, host_email, host_name)
+        logger.info(f"Placing call to {to_number} with webhook {webhook_url}")
+        return await get_async_twilio_client().calls.create_async(
+            to=to_number,
+            from_=self.twilio_phone,
+            url=webhook_url,
+            status_callback=f"{self.render_external_url}/api/twilio/status",
+            status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
+            status_callback_method='POST'
+        ) 
\ No newline at end of file
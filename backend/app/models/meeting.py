@@ -6,6 +6,8 @@ class AudioRequest(BaseModel):
     userId: Optional[str] = None
     clientId: Optional[str] = None
     meetingId: Optional[str] = None
+    chunked: Optional[bool] = None  # Force chunked transcription on or off
+    speechProfile: Optional[bool] = None  # Force the low-bitrate speech upload profile on or off
 
 class Attendee(BaseModel):
     name: str
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+import os
 from ..controllers.calendar_controller import CalendarController
 from ..middleware.auth_middleware import get_authenticated_user
 import logging
@@ -6,6 +7,8 @@ import logging
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/calendar", tags=["calendar"])
 
+MAX_REFRESH_EMAILS = int(os.getenv("GOOGLE_TOKEN_REFRESH_MAX_USERS", "1000"))
+
 def get_calendar_controller():
     return CalendarController()
 
@@ -51,4 +54,25 @@ async def create_event(
         raise HTTPException(
             status_code=500,
             detail=f"Failed to create calendar event: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/refresh-tokens")
+async def refresh_tokens(
+    request: dict,
+    user = Depends(get_authenticated_user),
+    controller: CalendarController = Depends(get_calendar_controller)
+):
+    """
+    Refresh the expired Google tokens of several hosts at once, e.g. before a campaign
+
+    Request body:
+    {
+        "user_emails": ["string"]
+    }
+    """
+    user_emails = request.get("user_emails")
+    if not isinstance(user_emails, list) or not user_emails or not all(isinstance(e, str) for e in user_emails):
+        raise HTTPException(status_code=400, detail="user_emails must be a non-empty list of emails")
+    if len(user_emails) > MAX_REFRESH_EMAILS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REFRESH_EMAILS} users can be refreshed at once")
+    return await controller.refresh_expired_tokens(user_emails)
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, Request, Response, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
 from ..controllers.twilio_controller import TwilioController
 from ..controllers.elevenlabs_controller import ElevenLabsController
 from ..controllers.text_parser_controller import TextParserController
+from ..controllers.audio_controller import AudioController
 from ..utils.twilio_audio_interface import TwilioAudioInterface
 from ..utils.call_manager import CallManager
+from ..utils.call_tracing import call_tracer
+from ..utils.turn_latency import turn_latency
+from ..utils.call_recorder import recording_path, recording_stats
+from ..utils.twiml import render_stream_twiml, form_value, ERROR_TWIML
+from ..utils.metrics import RollingQuantiles, registry
+from ..utils.job_queue import JobQueue
+from ..utils.task_pools import run_task, run_task_when_free
+from collections import OrderedDict
+from ..utils.agent_sessions import (
+    agent_sessions, PrewarmedSession, resolve_host_name, build_agent_variables
+)
+from ..services.campaign_dialer import CampaignDialer
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import asyncio
 import json
+import logging
 import os
 import traceback
 import urllib.parse
@@ -14,7 +29,7 @@ from twilio.twiml.voice_response import VoiceResponse, Connect
 import datetime
 import time
 from ..services.google_calendar_service import GoogleCalendarService
-from ..services.firebase_service import FirebaseService
+from ..services.firebase_service import get_firebase_service
 
 # Try to import from the documented structure
 try:
@@ -33,6 +48,8 @@ except ImportError:
 
 router = APIRouter(prefix="/api/twilio", tags=["twilio"])
 
+logger = logging.getLogger(__name__)
+
 # Initialize ElevenLabs client based on available imports
 try:
     if 'ElevenLabsClient' in locals() and ElevenLabsClient:
@@ -49,8 +66,26 @@ except NameError:
 # Initialize the call manager
 call_manager = CallManager()
 
+VOICE_WEBHOOK_LATENCY = registry.histogram(
+    "twilio_voice_webhook_handler_seconds",
+    "Time spent in the /voice webhook handler",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+voice_webhook_latency = RollingQuantiles(5000)
+
+STATUS_CALLBACK_LATENCY = registry.histogram(
+    "twilio_status_callback_handler_seconds",
+    "Time spent in the status callback handler",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+status_callback_latency = RollingQuantiles(5000)
+status_callback_counts = {"accepted": 0, "duplicate": 0, "rejected": 0}
+# (call SID, status) pairs already handled, to drop Twilio's retried callbacks
+STATUS_DEDUP_SIZE = int(os.getenv("STATUS_CALLBACK_DEDUP_SIZE", "20000"))
+_seen_statuses = OrderedDict()
+
 # Initialize services
-firebase_service = FirebaseService()
+firebase_service = get_firebase_service()
 calendar_service = GoogleCalendarService()
 
 class CallRequest(BaseModel):
@@ -59,20 +94,94 @@ class CallRequest(BaseModel):
     host_email: Optional[str] = None
     host_name: Optional[str] = None  # Add host_name field
 
+class CampaignRequest(BaseModel):
+    phone_numbers: List[str]
+    host_availability: Optional[str] = None
+    host_email: Optional[str] = None
+    host_name: Optional[str] = None
+    calls_per_second: Optional[float] = None  # Defaults to CAMPAIGN_CALLS_PER_SECOND
+    max_concurrent_calls: Optional[int] = None  # Defaults to CAMPAIGN_MAX_CONCURRENT_CALLS
+
+def store_campaign_call(call_sid, params):
+    """Keep the host parameters of a campaign call for its status callbacks and media stream"""
+    call_manager.store_pending_params(call_sid, params["host_availability"], params["host_email"], params["host_name"])
+    call_tracer.mark(call_sid, "call_initiated")
+
+# Outbound call campaigns
+campaign_dialer = CampaignDialer(TwilioController(), on_call_created=store_campaign_call)
+
 # Dependencies
 def get_twilio_controller():
     return TwilioController()
 
+_elevenlabs_controller = None
+
 def get_elevenlabs_controller():
-    return ElevenLabsController()
+    # Shared: building the ElevenLabs client creates an SSL context (~35 ms), too slow for the call path
+    global _elevenlabs_controller
+    if _elevenlabs_controller is None:
+        _elevenlabs_controller = ElevenLabsController()
+    return _elevenlabs_controller
 
 def get_text_parser_controller():
     return TextParserController()
 
+def get_audio_controller():
+    return AudioController()
+
+def prewarm_agent_session(call_sid, availability, host_email, host_name, elevenlabs_controller):
+    """
+    Start the ElevenLabs conversation for a call while it is still ringing
+
+    The agent WebSocket is opened now and the media stream attaches to the
+    session when Twilio connects it, instead of the callee waiting for the
+    connection after answering.
+    """
+    if not agent_sessions.enabled or not call_sid or agent_sessions.has(call_sid):
+        return
+    host_name = resolve_host_name(host_name, host_email)
+    session = PrewarmedSession(call_sid, {
+        "availability": availability or "",
+        "host_email": host_email or "",
+        "host_name": host_name
+    })
+
+    def agent_response_callback(text):
+        session.audio_interface.turns.agent_response()
+        session.transcript.append({"role": "agent", "content": text})
+        if session.stream_sid:
+            call_manager.add_transcript_entry(session.stream_sid, "agent", text)
+
+    def user_transcript_callback(text):
+        session.audio_interface.turns.user_transcript()
+        session.transcript.append({"role": "user", "content": text})
+        if session.stream_sid:
+            call_manager.add_transcript_entry(session.stream_sid, "user", text)
+
+    try:
+        session.audio_interface = TwilioAudioInterface()
+        session.audio_interface.call_sid = call_sid
+        if availability:
+            session.audio_interface.set_host_availability(availability)
+        session.conversation = elevenlabs_controller.create_conversation(
+            audio_interface=session.audio_interface,
+            callback_agent_response=agent_response_callback,
+            callback_user_transcript=user_transcript_callback,
+            variables=build_agent_variables(host_name, availability)
+        )
+        session.conversation.start_session()
+        call_tracer.mark(call_sid, "session_started")
+    except Exception as e:
+        agent_sessions.record_failure(call_sid, e)
+        return
+    agent_sessions.add(session)
+    print(f"\n=== PREWARM: STARTED AGENT SESSION FOR CALL {call_sid} ===\n")
+
 @router.post("/call")
 async def initiate_call(
     request: CallRequest,
-    controller: TwilioController = Depends(get_twilio_controller)
+    controller: TwilioController = Depends(get_twilio_controller),
+    elevenlabs_controller: ElevenLabsController = Depends(get_elevenlabs_controller)
 ):
     """Initiate a call to the customer"""
     print("\n=== CALL ENDPOINT: RECEIVED REQUEST ===")
@@ -91,12 +200,21 @@ async def initiate_call(
     
     # Store the parameters with the call SID
     if result.get("status") == "success" and "call_sid" in result:
+        call_tracer.mark(result["call_sid"], "call_initiated")
         call_manager.store_pending_params(
             result["call_sid"],
             request.host_availability,
             request.host_email,
             request.host_name  # Store the name in pending params
         )
+        # Connect the agent while the phone rings
+        prewarm_agent_session(
+            result["call_sid"],
+            request.host_availability,
+            request.host_email,
+            request.host_name,
+            elevenlabs_controller
+        )
     
     print("\n=== CALL ENDPOINT: RETURNING RESPONSE ===")
     print(f"Response: {result}")
@@ -104,101 +222,104 @@ async def initiate_call(
     
     return result
 
+@router.post("/campaigns")
+async def start_campaign(request: CampaignRequest):
+    """Start calling a batch of numbers, paced to the campaign's call rate and concurrency limits"""
+    try:
+        campaign = campaign_dialer.start(
+            request.phone_numbers,
+            host_availability=request.host_availability,
+            host_email=request.host_email,
+            host_name=request.host_name,
+            calls_per_second=request.calls_per_second,
+            max_concurrent=request.max_concurrent_calls
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return campaign.progress()
+
+@router.get("/campaigns")
+async def list_campaigns():
+    """Get the progress of running and recent campaigns"""
+    return {"campaigns": [campaign.progress() for campaign in campaign_dialer.campaigns.values()]}
+
+@router.get("/campaigns/{campaign_id}")
+async def get_campaign(
+    campaign_id: str,
+    numbers: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get a campaign's progress, and with numbers=true the state of each number"""
+    campaign = campaign_dialer.get(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign.progress(include_numbers=numbers, offset=offset, limit=limit)
+
+@router.post("/campaigns/{campaign_id}/cancel")
+async def cancel_campaign(campaign_id: str):
+    """Stop dialing a campaign's remaining numbers; calls in progress continue"""
+    campaign = campaign_dialer.cancel(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return {"campaign_id": campaign_id, "status": "canceling" if campaign.status == "running" else campaign.status}
+
 @router.post("/voice")
-async def twilio_voice_webhook(request: Request):
+async def twilio_voice_webhook(
+    request: Request,
+    elevenlabs_controller: ElevenLabsController = Depends(get_elevenlabs_controller)
+):
     """
     Webhook for Twilio to get TwiML instructions for the call
     This connects the call to the ElevenLabs agent
+
+    Kept on a fast path: only CallSid is read from the raw form body, the
+    host parameters are stored with the call and the TwiML comes from a
+    precompiled template that hands the media stream the call SID.
     """
+    body = await request.body()
+    # Handler time only; waiting for the body depends on everything else on the loop
+    started = time.perf_counter()
     try:
-        print("\n=== VOICE WEBHOOK: REQUEST RECEIVED ===")
-        # Log the full request for debugging
-        form_data = await request.form()
-        headers = dict(request.headers)
-        query_params = dict(request.query_params)
-        print(f"Headers: {headers}")
-        print(f"Query params: {query_params}")
-        print(f"Form data: {dict(form_data)}")
-        print("======================================\n")
+        call_sid = form_value(body, b"CallSid")
+        call_tracer.mark(call_sid, "voice_webhook")
         
-        # Get parameters from query parameters if present
+        # Host parameters come from the query string TwilioController put on the webhook URL
         availability = request.query_params.get("availability", "")
         host_email = request.query_params.get("host_email", "")
-        host_name = request.query_params.get("host_name", "")  # Get host name
+        host_name = request.query_params.get("host_name", "")
+        logger.debug(f"Voice webhook for call {call_sid}: availability={availability!r}, "
+                     f"host_email={host_email!r}, host_name={host_name!r}")
         
-        print("\n=== VOICE WEBHOOK: EXTRACTED PARAMETERS ===")
-        print(f"Availability: '{availability}'")
-        print(f"Host Email: '{host_email}'")
-        print(f"Host Name: '{host_name}'")  # Log host name
-        print("===========================================\n")
-        
-        # Get the Call SID from the request
-        call_sid = form_data.get("CallSid")
-        
-        print("\n=== VOICE WEBHOOK: CALL SID ===")
-        print(f"Call SID: '{call_sid}'")
-        print("===============================\n")
-        
-        # Store the parameters with the Call SID
+        # Store the parameters with the Call SID, the media stream looks them up by it
         if call_sid:
-            call_manager.store_call_params(call_sid, {
+            call_manager.call_params[call_sid] = {
                 "availability": availability,
                 "host_email": host_email,
-                "host_name": host_name  # Store host name
-            })
+                "host_name": host_name
+            }
+            # Inbound calls (and outbound calls not pre-warmed by /call) connect the agent too.
+            # Starting a session takes milliseconds, so it runs after the TwiML is returned.
+            if agent_sessions.enabled and not agent_sessions.has(call_sid):
+                asyncio.get_running_loop().call_soon(
+                    prewarm_agent_session, call_sid, availability, host_email, host_name, elevenlabs_controller
+                )
         
-        # Generate TwiML to connect to ElevenLabs
-        # Use request.headers.get("host") to get the hostname
         host = request.headers.get("host") or request.url.netloc
-        print(f"Using host: {host}")
-        
-        # Create a properly formatted TwiML response
-        twiml = VoiceResponse()
-        twiml.say("")
-        connect = Connect()
-        
-        # Build the stream URL with query parameters
-        stream_url = f"wss://{host}/api/twilio/media-stream"
-        
-        # Add parameters to the stream URL
-        params = []
-        if availability:
-            encoded_availability = urllib.parse.quote(availability)
-            params.append(f"availability={encoded_availability}")
-        if host_email:
-            encoded_host_email = urllib.parse.quote(host_email)
-            params.append(f"host_email={encoded_host_email}")
-        if host_name:
-            encoded_host_name = urllib.parse.quote(host_name)
-            params.append(f"host_name={encoded_host_name}")  # Add host name
-            
-        if params:
-            stream_url += "?" + "&".join(params)
-        
-        print("\n=== VOICE WEBHOOK: STREAM URL ===")
-        print(f"Stream URL: {stream_url}")
-        print("=================================\n")
-        
-        connect.stream(url=stream_url)
-        twiml.append(connect)
-        
-        # Convert to string and log
-        twiml_str = str(twiml)
-        print("\n=== VOICE WEBHOOK: GENERATED TWIML ===")
-        print(f"TwiML: {twiml_str}")
-        print("=====================================\n")
-        
-        return Response(content=twiml_str, media_type="application/xml")
+        twiml = render_stream_twiml(host, call_sid)
     except Exception as e:
         print(f"Error in twilio_voice_webhook: {str(e)}")
-        import traceback
         traceback.print_exc()
-        
-        # Return a simple TwiML response in case of error
-        error_twiml = VoiceResponse()
-        error_twiml.say("Sorry, there was an error connecting to our scheduling assistant. Please try again later.")
-        
-        return Response(content=str(error_twiml), media_type="application/xml")
+        twiml = ERROR_TWIML
+    elapsed = time.perf_counter() - started
+    VOICE_WEBHOOK_LATENCY.observe(elapsed)
+    voice_webhook_latency.add(elapsed * 1000)
+    return Response(content=twiml, media_type="application/xml")
+
+@router.get("/voice/latency")
+async def get_voice_webhook_latency():
+    """Get rolling percentiles of the time spent in the voice webhook handler"""
+    return {"latency_ms": voice_webhook_latency.snapshot(digits=3)}
 
 @router.websocket("/media-stream")
 async def handle_media_stream(
@@ -208,6 +329,7 @@ async def handle_media_stream(
     """WebSocket endpoint for the media stream between Twilio and ElevenLabs"""
     try:
         await websocket.accept()
+        accepted_at = time.monotonic()
         print("\n=== WEBSOCKET: CONNECTION ESTABLISHED ===\n")
         
         # Initialize variables
@@ -215,6 +337,7 @@ async def handle_media_stream(
         host_email = ""
         host_name = "the host"  # Default name
         stream_sid = None
+        trace_call_sid = None
         conversation = None
         
         # First try to get parameters from query parameters
@@ -258,6 +381,7 @@ async def handle_media_stream(
             print(f"\n=== AGENT RESPONSE CALLBACK ===")
             print(f"Text: {text}")
             print(f"===============================\n")
+            audio_interface.turns.agent_response()
             if stream_sid:
                 call_manager.add_transcript_entry(stream_sid, "agent", text)
             # Also store in our local variable
@@ -267,6 +391,7 @@ async def handle_media_stream(
             print(f"\n=== USER TRANSCRIPT CALLBACK ===")
             print(f"Text: {text}")
             print(f"===============================\n")
+            audio_interface.turns.user_transcript()
             if stream_sid:
                 call_manager.add_transcript_entry(stream_sid, "user", text)
             # Also store in our local variable
@@ -291,33 +416,52 @@ async def handle_media_stream(
                 if first_message and data["event"] == "start" and "streamSid" in data["start"]:
                     first_message = False
                     stream_sid = data["start"]["streamSid"]
+                    # The voice webhook passes the call SID as a stream parameter
+                    custom_parameters = data["start"].get("customParameters") or {}
+                    trace_call_sid = custom_parameters.get("callSid") or data["start"].get("callSid")
+                    call_tracer.mark(trace_call_sid, "websocket_accepted", at=accepted_at)
+                    call_tracer.mark(trace_call_sid, "stream_start")
                     
                     print(f"\n=== WEBSOCKET: RECEIVED STREAM SID ===")
                     print(f"Stream SID: '{stream_sid}'")
                     print(f"===================================\n")
                     
-                    # Try to find the call in the call manager
-                    print(f"\n=== WEBSOCKET: SEARCHING CALL MANAGER FOR PARAMETERS ===")
-                    for call_sid, call_data in call_manager.active_calls.items():
-                        print(f"Checking call SID: '{call_sid}'")
-                        print(f"Call data: {call_data}")
-                    print(f"=====================================================\n")
-                    
-                    for call_sid, call_data in call_manager.active_calls.items():
-                        # If we find a match, use those parameters
-                        if not (availability or host_email or host_name != "the host"):
-                            availability = call_data.get("host_availability", "")
-                            host_email = call_data.get("host_email", "")
-                            if "host_name" in call_data and call_data["host_name"]:
-                                host_name = call_data["host_name"]
-                            print(f"\n=== WEBSOCKET: FOUND PARAMETERS IN ACTIVE CALLS ===")
-                            print(f"Call SID: '{call_sid}'")
-                            print(f"Stream SID: '{stream_sid}'")
-                            print(f"Availability: '{availability}'")
-                            print(f"Host Email: '{host_email}'")
-                            print(f"Host Name: '{host_name}'")
-                            print(f"=================================================\n")
-                            break
+                    # Attach to the agent session started while the call was ringing, if there is one
+                    prewarmed = agent_sessions.claim(trace_call_sid)
+                    if prewarmed:
+                        print(f"\n=== WEBSOCKET: USING PRE-WARMED AGENT SESSION ===")
+                        print(f"Call SID: '{prewarmed.call_sid}'")
+                        print(f"Connected before answer: {prewarmed.connected}")
+                        print(f"===============================================\n")
+                        availability = prewarmed.params["availability"]
+                        host_email = prewarmed.params["host_email"]
+                        host_name = prewarmed.params["host_name"]
+                        conversation = prewarmed.conversation
+                        audio_interface = prewarmed.audio_interface
+                        full_transcript = prewarmed.transcript
+                        audio_interface.on_first_audio = lambda seconds, call_sid=prewarmed.call_sid: (
+                            agent_sessions.record_first_audio("prewarmed", seconds, call_sid)
+                        )
+                        call_manager.register_call_with_name(stream_sid, availability, host_email, host_name)
+                        if hasattr(conversation, 'conversation_id'):
+                            call_manager.set_conversation_id(stream_sid, conversation.conversation_id)
+                        # What the agent said during ringing, later entries are added by the callbacks
+                        for entry in list(full_transcript):
+                            call_manager.add_transcript_entry(stream_sid, entry["role"], entry["content"])
+                        prewarmed.stream_sid = stream_sid
+                        audio_interface.attach_websocket(websocket, stream_sid)
+                
+                # No pre-warmed session: resolve the parameters and start the conversation now
+                if data["event"] == "start" and stream_sid and not conversation:
+                    # Parameters the voice webhook stored for this call
+                    if not (availability or host_email or host_name != "the host"):
+                        call_params = call_manager.call_params.get(trace_call_sid)
+                        if call_params:
+                            availability = call_params.get("availability", "")
+                            host_email = call_params.get("host_email", "")
+                            if call_params.get("host_name"):
+                                host_name = call_params["host_name"]
+                            print(f"\n=== WEBSOCKET: USING PARAMETERS STORED FOR CALL {trace_call_sid} ===\n")
                     
                     # Also try to get parameters from call_params
                     if not (availability or host_email or host_name != "the host"):
@@ -340,11 +484,7 @@ async def handle_media_stream(
                             print(f"===================================================\n")
                     
                     # Extract host name from email only if we don't already have a name
-                    if not host_name or host_name == "the host":
-                        if host_email and "@" in host_email:
-                            host_name = host_email.split("@")[0]
-                            # Capitalize and replace dots/underscores with spaces
-                            host_name = host_name.replace(".", " ").replace("_", " ").title()
+                    host_name = resolve_host_name(host_name, host_email)
                     
                     print(f"\n=== WEBSOCKET: FINAL HOST NAME ===")
                     print(f"Host Name: '{host_name}'")
@@ -353,29 +493,16 @@ async def handle_media_stream(
                     
                     # Create the audio interface
                     audio_interface = TwilioAudioInterface(websocket)
+                    audio_interface.on_first_audio = lambda seconds, call_sid=trace_call_sid: (
+                        agent_sessions.record_first_audio("cold", seconds, call_sid)
+                    )
                     
                     # Set the host availability on the audio interface
                     if availability:
                         audio_interface.set_host_availability(availability)
                     
-                    # Get the current time in ISO format
-                    now = datetime.datetime.now()
-                    now_iso = now.isoformat()
-                    
-                    # Get the current day name
-                    day_name = now.strftime("%A")
-                    
-                    # Get the timezone
-                    timezone_name = time.tzname[0]
-                    
                     # Prepare variables for the ElevenLabs agent
-                    variables = {
-                        "username": host_name,
-                        "available_time": availability or "not specified",
-                        "current_time_iso": now_iso,
-                        "current_day": day_name,
-                        "timezone_info": timezone_name
-                    }
+                    variables = build_agent_variables(host_name, availability)
                     
                     print("\n=== WEBSOCKET: DYNAMIC VARIABLES FOR AGENT ===")
                     for key, value in variables.items():
@@ -397,6 +524,7 @@ async def handle_media_stream(
                     # Start the conversation session
                     print("\n=== WEBSOCKET: STARTING CONVERSATION SESSION ===\n")
                     conversation.start_session()
+                    call_tracer.mark(trace_call_sid, "session_started")
                     print("\n=== WEBSOCKET: CONVERSATION SESSION STARTED ===\n")
                     
                     # Store the conversation ID if available
@@ -426,6 +554,8 @@ async def handle_media_stream(
         import traceback
         traceback.print_exc()
     finally:
+        if 'trace_call_sid' in locals():
+            call_tracer.finish(trace_call_sid)
         if 'conversation' in locals() and conversation:
             print("\n=== WEBSOCKET: ENDING CONVERSATION SESSION ===\n")
             try:
@@ -456,7 +586,7 @@ async def handle_media_stream(
                         text_parser = get_text_parser_controller()
                         
                         # Process the transcript right here
-                        meeting_details = text_parser.parse_to_json(formatted_transcript, host_availability, host_name)
+                        meeting_details = await run_task_when_free("llm", text_parser.parse_to_json, formatted_transcript, host_availability, host_name)
                         
                         print(f"Meeting details extracted: {meeting_details}")
                         
@@ -498,7 +628,7 @@ async def handle_media_stream(
                     try:
                         print("\n=== CREATING CALENDAR EVENT ===")
                         # Get tokens from Firebase
-                        tokens = await firebase_service.get_user_tokens(host_email)
+                        tokens = await firebase_service.get_user_tokens_async(host_email)
                         if not tokens:
                             print(f"No tokens found for user: {host_email}")
                             raise HTTPException(status_code=404, detail="User tokens not found")
@@ -530,123 +660,237 @@ async def handle_media_stream(
 
 @router.post("/status")
 async def twilio_status_callback(request: Request):
-    form_data = await request.form()
-    call_sid = form_data.get("CallSid")
-    call_status = form_data.get("CallStatus")
+    """
+    Record a call status transition and acknowledge it right away
+
+    Transcript parsing and calendar event creation for completed calls run
+    on a background job queue, so slow upstreams can't make Twilio time
+    out and retry. Repeated callbacks for the same status are ignored.
+    """
+    body = await request.body()
+    started = time.perf_counter()
+    call_sid = form_value(body, b"CallSid")
+    call_status = form_value(body, b"CallStatus")
+    duplicate = is_duplicate_status(call_sid, call_status)
+    if not duplicate:
+        logger.info(f"Status callback: call {call_sid} is {call_status}")
+        campaign_dialer.on_status(call_sid, call_status)
+        
+        # A call that ended without connecting its media stream no longer needs its agent session
+        if call_status in ("completed", "busy", "no-answer", "failed", "canceled"):
+            agent_sessions.discard(call_sid)
+            call_tracer.finish(call_sid)
+        
+        # If this is the first status update, store the association
+        if call_status == "in-progress":
+            pending_params = call_manager.get_pending_params(call_sid)
+            if pending_params:
+                call_manager.register_call_with_name(
+                    call_sid,  # Use call_sid as stream_sid temporarily
+                    pending_params.get("availability", ""),
+                    pending_params.get("host_email", ""),
+                    pending_params.get("host_name", "")  # Include host name
+                )
+        
+        # Process completed calls off the request path
+        if call_status == "completed" and not completed_calls.submit(call_sid):
+            # The job queue is full: forget the callback and let Twilio retry it later
+            forget_status(call_sid, call_status)
+            elapsed = time.perf_counter() - started
+            STATUS_CALLBACK_LATENCY.observe(elapsed)
+            status_callback_latency.add(elapsed * 1000)
+            return Response(content=b'{"status":"busy"}', status_code=503, media_type="application/json")
     
-    print(f"\n=== STATUS CALLBACK: CALL STATUS UPDATE ===")
-    print(f"Call SID: '{call_sid}'")
-    print(f"Call Status: '{call_status}'")
-    print(f"All Form Data: {dict(form_data)}")
-    print(f"=========================================\n")
+    elapsed = time.perf_counter() - started
+    STATUS_CALLBACK_LATENCY.observe(elapsed)
+    status_callback_latency.add(elapsed * 1000)
+    return Response(content=b'{"status":"received"}', media_type="application/json")
+
+def is_duplicate_status(call_sid, call_status):
+    """Remember a (call, status) pair, returning True if it was already seen"""
+    key = (call_sid, call_status)
+    if key in _seen_statuses:
+        status_callback_counts["duplicate"] += 1
+        return True
+    _seen_statuses[key] = None
+    if len(_seen_statuses) > STATUS_DEDUP_SIZE:
+        _seen_statuses.popitem(last=False)
+    status_callback_counts["accepted"] += 1
+    return False
+
+def forget_status(call_sid, call_status):
+    """Undo is_duplicate_status for a callback that could not be handled, so its retry is"""
+    if _seen_statuses.pop((call_sid, call_status), False) is None:
+        status_callback_counts["accepted"] -= 1
+        status_callback_counts["rejected"] += 1
+
+async def process_completed_call(call_sid):
+    """Parse the transcript of a completed call and create its calendar event"""
+    print(f"\n=== STATUS CALLBACK: CALL COMPLETED ===")
     
-    # If this is the first status update, store the association
-    if call_status == "in-progress":
-        # Get the pending parameters
-        pending_params = call_manager.get_pending_params(call_sid)
-        if pending_params:
-            print(f"\n=== STATUS CALLBACK: FOUND PENDING PARAMS ===")
-            print(f"Pending Params: {pending_params}")
-            print(f"===========================================\n")
-            
-            # Store them with the call
-            call_manager.register_call_with_name(
-                call_sid,  # Use call_sid as stream_sid temporarily
-                pending_params.get("availability", ""),
-                pending_params.get("host_email", ""),
-                pending_params.get("host_name", "")  # Include host name
-            )
+    # Get the call data
+    call_data = call_manager.get_call_data(call_sid)
     
-    # Process completed calls
-    if call_status == "completed":
-        print(f"\n=== STATUS CALLBACK: CALL COMPLETED ===")
+    if call_data:
+        print(f"Call data found for SID: {call_sid}")
         
-        # Get the call data
-        call_data = call_manager.get_call_data(call_sid)
+        # Get the locally stored transcript directly
+        transcript = call_manager.get_formatted_transcript(call_sid)
+        if not transcript and os.path.exists(recording_path(call_sid)):
+            # Nothing came back from the agent, fall back to the call's own recording
+            try:
+                transcript = await get_audio_controller().transcribe_recording(call_sid)
+            except HTTPException as e:
+                logger.error(f"Re-transcribing call {call_sid} from its recording failed: {e.detail}")
         
-        if call_data:
-            print(f"Call data found for SID: {call_sid}")
-            
-            # Get the locally stored transcript directly
-            transcript = call_manager.get_formatted_transcript(call_sid)
-            
-            print(f"Transcript length: {len(transcript) if transcript else 0} characters")
-            print(f"Transcript preview: {transcript[:200]}..." if transcript and len(transcript) > 200 else transcript)
-            
-            # Get availability and host info
-            host_availability = call_data.get("host_availability")
-            host_email = call_data.get("host_email")
-            host_name = call_data.get("host_name", "Unknown Host")
+        print(f"Transcript length: {len(transcript) if transcript else 0} characters")
+        print(f"Transcript preview: {transcript[:200]}..." if transcript and len(transcript) > 200 else transcript)
+        
+        # Get availability and host info
+        host_availability = call_data.get("host_availability")
+        host_email = call_data.get("host_email")
+        host_name = call_data.get("host_name", "Unknown Host")
+        
+        print(f"Host Name: {host_name}")
+        print(f"Host Email: {host_email}")
+        print(f"Host Availability: {host_availability}")
+        
+        try:
+            # Get the text parser controller
+            text_parser = get_text_parser_controller()
             
-            print(f"Host Name: {host_name}")
-            print(f"Host Email: {host_email}")
-            print(f"Host Availability: {host_availability}")
+            # Process the transcript
+            print(f"\n=== STATUS CALLBACK: PROCESSING TRANSCRIPT ===")
             
-            try:
-                # Get the text parser controller
-                text_parser = get_text_parser_controller()
+            if transcript:
+                # Parse the transcript
+                print(f"Calling parse_to_json with transcript and host_availability")
+                meeting_details = await run_task("llm", text_parser.parse_to_json, transcript, host_availability, host_name)
                 
-                # Process the transcript
-                print(f"\n=== STATUS CALLBACK: PROCESSING TRANSCRIPT ===")
+                print(f"Meeting details extracted: {meeting_details}")
+
+                form_data = meeting_details.get("formData", {})
+                print(f"\n=== EXTRACTED MEETING DETAILS ===")
+                print(f"  Title: {form_data.get('title', '')}")
+                print(f"  Description: {form_data.get('description', '')}")
+                print(f"  Start Time: {form_data.get('startDateTime', '')}")
+                print(f"  End Time: {form_data.get('endDateTime', '')}")
+                print(f"===================================\n")
                 
-                if transcript:
-                    # Parse the transcript
-                    print(f"Calling parse_to_json with transcript and host_availability")
-                    meeting_details = text_parser.parse_to_json(transcript, host_availability, host_name)
-                    
-                    print(f"Meeting details extracted: {meeting_details}")
-
-                    form_data = meeting_details.get("formData", {})
-                    print(f"\n=== EXTRACTED MEETING DETAILS ===")
-                    print(f"  Title: {form_data.get('title', '')}")
-                    print(f"  Description: {form_data.get('description', '')}")
-                    print(f"  Start Time: {form_data.get('startDateTime', '')}")
-                    print(f"  End Time: {form_data.get('endDateTime', '')}")
-                    print(f"===================================\n")
-                    
-                    # Create calendar event if we have valid meeting details
-                    if form_data and host_email:
-                        try:
-                            print("\n=== CREATING CALENDAR EVENT ===")
-                            # Get tokens from Firebase
-                            tokens = await firebase_service.get_user_tokens(host_email)
-                            if not tokens:
-                                print(f"No tokens found for user: {host_email}")
-                                raise HTTPException(status_code=404, detail="User tokens not found")
-                            
-                            # Format the meeting data for Google Calendar
-                            calendar_event_data = calendar_service.format_meeting_for_calendar(form_data)
-                            
-                            # Create the event using the access token
-                            event_result = await calendar_service.create_event(
-                                access_token=tokens["access_token"],
-                                calendar_id="primary",
-                                event_data=calendar_event_data
-                            )
-                            
-                            print(f"Calendar event created successfully: {event_result}")
-                            
-                            # Store the event ID with the call data
-                            call_manager.active_calls[call_sid]["calendar_event_id"] = event_result.get("id")
-                            
-                        except Exception as e:
-                            print(f"Error creating calendar event: {str(e)}")
-                            # Don't raise the exception - we still want to clean up the call data
-                    
-                else:
-                    print("WARNING: No transcript available for processing")
-            except Exception as e:
-                print(f"\n=== STATUS CALLBACK: ERROR PROCESSING TRANSCRIPT ===")
-                print(f"Error: {str(e)}")
-                print(f"=================================================\n")
-                traceback.print_exc()
-            
-            finally:
-                # Clean up
-                print("\n=== STATUS CALLBACK: REMOVING CALL DATA ===\n")
-                call_manager.remove_call(call_sid)
-    
-    return {"status": "received"}
+                # Create calendar event if we have valid meeting details
+                if form_data and host_email:
+                    try:
+                        print("\n=== CREATING CALENDAR EVENT ===")
+                        # Get tokens from Firebase
+                        tokens = await firebase_service.get_user_tokens_async(host_email)
+                        if not tokens:
+                            print(f"No tokens found for user: {host_email}")
+                            raise HTTPException(status_code=404, detail="User tokens not found")
+                        
+                        # Format the meeting data for Google Calendar
+                        calendar_event_data = calendar_service.format_meeting_for_calendar(form_data)
+                        
+                        # Create the event using the access token
+                        event_result = await calendar_service.create_event(
+                            access_token=tokens["access_token"],
+                            calendar_id="primary",
+                            event_data=calendar_event_data
+                        )
+                        
+                        print(f"Calendar event created successfully: {event_result}")
+                        
+                        # Store the event ID with the call data
+                        call_manager.active_calls[call_sid]["calendar_event_id"] = event_result.get("id")
+                        
+                    except Exception as e:
+                        print(f"Error creating calendar event: {str(e)}")
+                        # Don't raise the exception - we still want to clean up the call data
+                
+            else:
+                print("WARNING: No transcript available for processing")
+        except Exception as e:
+            print(f"\n=== STATUS CALLBACK: ERROR PROCESSING TRANSCRIPT ===")
+            print(f"Error: {str(e)}")
+            print(f"=================================================\n")
+            traceback.print_exc()
+        
+        finally:
+            # Clean up
+            print("\n=== STATUS CALLBACK: REMOVING CALL DATA ===\n")
+            call_manager.remove_call(call_sid)
+
+# Follow-up work for completed calls, run by background workers
+completed_calls = JobQueue(
+    "completed_calls",
+    process_completed_call,
+    workers=int(os.getenv("STATUS_CALLBACK_WORKERS", "4")),
+    max_size=int(os.getenv("STATUS_CALLBACK_MAX_QUEUE", "1000"))
+)
+
+@router.get("/status/stats")
+async def get_status_callback_stats():
+    """Get status callback counts, handler latency and the completed-call queue"""
+    return {
+        **status_callback_counts,
+        "handler_latency_ms": status_callback_latency.snapshot(digits=3),
+        "completed_calls": completed_calls.stats(),
+    }
+
+@router.get("/sessions/stats")
+async def get_agent_session_stats():
+    """Get pre-warmed agent session counts and time-to-first-audio percentiles"""
+    return agent_sessions.stats()
+
+@router.get("/calls/latency")
+async def get_call_latency_summary():
+    """Get rolling percentiles of the call setup stage gaps and spans"""
+    return call_tracer.stats()
+
+@router.get("/calls/turn-latency")
+async def get_turn_latency_summary():
+    """Get fleet-wide percentiles of conversational turn and interruption latency"""
+    return turn_latency.stats()
+
+@router.get("/calls/{call_sid}/turn-latency")
+async def get_call_turn_latency(call_sid: str):
+    """Get the turn latency histograms and recent turns of one call"""
+    summary = turn_latency.get(call_sid)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No turn latency for this call")
+    return summary
+
+@router.get("/calls/{call_sid}/latency")
+async def get_call_latency(call_sid: str):
+    """Get the setup stage breakdown of one call"""
+    breakdown = call_tracer.get(call_sid)
+    if breakdown is None:
+        raise HTTPException(status_code=404, detail="No trace for this call")
+    return breakdown
+
+def check_recording_call_sid(call_sid: str):
+    # The SID names the recording file
+    if not call_sid.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid call SID")
+
+@router.get("/calls/{call_sid}/recording")
+async def get_call_recording(call_sid: str):
+    """Get the size of a call's local recording"""
+    check_recording_call_sid(call_sid)
+    stats = recording_stats(recording_path(call_sid))
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No recording for this call")
+    return stats
+
+@router.post("/calls/{call_sid}/retranscribe")
+async def retranscribe_call(
+    call_sid: str,
+    speech_profile: Optional[bool] = Query(None),
+    audio_controller: AudioController = Depends(get_audio_controller)
+):
+    """Re-transcribe a finished call from its local recording"""
+    check_recording_call_sid(call_sid)
+    transcript = await audio_controller.transcribe_recording(call_sid, speech_profile=speech_profile)
+    return {"call_sid": call_sid, "transcript": transcript, "audio": audio_controller.last_audio_stats}
 
 @router.post("/voice-test")
 async def twilio_voice_test(request: Request):
@@ -715,7 +959,7 @@ async def get_meeting_details(call_sid: str):
             host_name = call_data.get("host_name", "")
             
             # Parse transcript to get meeting details
-            meeting_details = text_parser.parse_to_json(transcript, host_availability, host_name)
+            meeting_details = await run_task_when_free("llm", text_parser.parse_to_json, transcript, host_availability, host_name)
             
             # Store the meeting details in the call_manager
             call_manager.active_calls[call_sid]["meeting_details"] = meeting_details
@@ -0,0 +1,355 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import aiohttp
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from twilio.base.exceptions import TwilioRestException
+from dotenv import load_dotenv
+from ..controllers.twilio_controller import format_phone_number
+from ..utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Twilio accounts are limited to 1 outbound call per second unless raised
+CALLS_PER_SECOND = float(os.getenv("CAMPAIGN_CALLS_PER_SECOND", "1"))
+MAX_CONCURRENT_CALLS = int(os.getenv("CAMPAIGN_MAX_CONCURRENT_CALLS", "10"))
+MAX_NUMBERS = int(os.getenv("CAMPAIGN_MAX_NUMBERS", "10000"))
+# A call whose final status never arrives frees its slot after this long
+CALL_TIMEOUT_SECONDS = float(os.getenv("CAMPAIGN_CALL_TIMEOUT_SECONDS", "1800"))
+MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3"))
+CAMPAIGN_HISTORY = int(os.getenv("CAMPAIGN_HISTORY", "50"))
+
+# Twilio call statuses after which the call is over
+FINAL_CALL_STATUSES = {"completed", "busy", "no-answer", "failed", "canceled"}
+# Entry states that free a concurrency slot, on top of the final call statuses
+FINAL_STATES = FINAL_CALL_STATUSES | {"error", "skipped", "timed_out"}
+
+CAMPAIGN_CALLS = registry.counter(
+    "campaign_calls_total",
+    "Campaign numbers by the state they finished in",
+    ["state"],
+)
+CAMPAIGN_ACTIVE_CALLS = registry.gauge(
+    "campaign_active_calls",
+    "Campaign calls placed and not finished yet",
+    callback=lambda: [((), sum(campaign.active for campaign in _all_campaigns()))],
+)
+CAMPAIGN_DIAL_LATENCY = registry.histogram(
+    "campaign_call_create_seconds",
+    "Latency of creating a call through the Twilio REST API",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+
+_dialers: List["CampaignDialer"] = []
+
+
+def _all_campaigns():
+    for dialer in list(_dialers):
+        yield from list(dialer.campaigns.values())
+
+
+class TokenBucket:
+    """Paces acquisitions to rate per second, allowing bursts of up to burst"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CampaignEntry:
+    """One number in a campaign and the state of its call"""
+
+    __slots__ = ("number", "state", "call_sid", "error", "attempts", "dialed_at", "finished_at", "holds_slot",
+                 "timeout_handle")
+
+    def __init__(self, number: str):
+        self.number = number
+        self.state = "pending"
+        self.call_sid: Optional[str] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.dialed_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.holds_slot = False
+        self.timeout_handle: Optional[asyncio.TimerHandle] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "phone_number": self.number,
+            "state": self.state,
+            "call_sid": self.call_sid,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+class Campaign:
+    """A batch of numbers dialed with the same host parameters"""
+
+    def __init__(self, numbers: List[str], params: Dict[str, Optional[str]], calls_per_second: float,
+                 max_concurrent: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.calls_per_second = calls_per_second
+        self.max_concurrent = max_concurrent
+        self.entries = [CampaignEntry(number) for number in numbers]
+        self.counts: Dict[str, int] = {"pending": len(self.entries)}
+        self.status = "running"
+        self.created_at = time.time()
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.active = 0
+        self.dialed = 0
+        self.bucket = TokenBucket(calls_per_second)
+        self.slot_freed: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def set_state(self, entry: CampaignEntry, state: str):
+        self.counts[entry.state] -= 1
+        if not self.counts[entry.state]:
+            del self.counts[entry.state]
+        entry.state = state
+        self.counts[state] = self.counts.get(state, 0) + 1
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running" and self.active == 0
+
+    def progress(self, include_numbers: bool = False, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        finished = sum(count for state, count in self.counts.items() if state in FINAL_STATES)
+        remaining = self.counts.get("pending", 0)
+        rate = self.dialed / elapsed if elapsed > 0 else 0.0
+        progress = {
+            "campaign_id": self.id,
+            "status": self.status,
+            "created_at": datetime.fromtimestamp(self.created_at, timezone.utc).isoformat(),
+            "total": len(self.entries),
+            "dialed": self.dialed,
+            "active": self.active,
+            "finished": finished,
+            "remaining": remaining,
+            "states": dict(self.counts),
+            "calls_per_second": self.calls_per_second,
+            "max_concurrent_calls": self.max_concurrent,
+            "elapsed_seconds": round(elapsed, 1),
+            "dial_rate": round(rate, 3),
+            "eta_seconds": round(remaining / self.calls_per_second, 1) if self.status == "running" else None,
+        }
+        if include_numbers:
+            progress["numbers"] = [entry.to_dict() for entry in self.entries[offset:offset + limit]]
+        return progress
+
+
+class CampaignDialer:
+    """
+    Runs outbound call campaigns
+
+    Calls are created with the async Twilio client, paced by a token
+    bucket to calls_per_second, and limited to max_concurrent calls that
+    are placed but haven't reached a final status. Each number's state
+    follows the status callbacks of its call.
+    """
+
+    def __init__(self, twilio_controller, on_call_created: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.twilio_controller = twilio_controller
+        self.on_call_created = on_call_created
+        self.campaigns: "OrderedDict[str, Campaign]" = OrderedDict()
+        self.calls: Dict[str, tuple] = {}
+        _dialers.append(self)
+
+    def start(self, numbers: List[str], host_availability: Optional[str] = None, host_email: Optional[str] = None,
+              host_name: Optional[str] = None, calls_per_second: Optional[float] = None,
+              max_concurrent: Optional[int] = None) -> Campaign:
+        """
+        Start dialing a batch of numbers in the background
+
+        Duplicate numbers (after normalization) are dialed once.
+
+        Raises:
+            ValueError: If the batch or the limits are invalid
+        """
+        normalized = list(dict.fromkeys(format_phone_number(number) for number in numbers if number.strip()))
+        if not normalized:
+            raise ValueError("No phone numbers to dial")
+        if len(normalized) > MAX_NUMBERS:
+            raise ValueError(f"At most {MAX_NUMBERS} numbers per campaign")
+        calls_per_second = CALLS_PER_SECOND if calls_per_second is None else calls_per_second
+        max_concurrent = MAX_CONCURRENT_CALLS if max_concurrent is None else max_concurrent
+        if calls_per_second <= 0 or max_concurrent < 1:
+            raise ValueError("calls_per_second must be positive and max_concurrent_calls at least 1")
+
+        campaign = Campaign(
+            normalized,
+            {"host_availability": host_availability, "host_email": host_email, "host_name": host_name},
+            calls_per_second,
+            max_concurrent
+        )
+        campaign.slot_freed = asyncio.Event()
+        campaign.task = asyncio.get_running_loop().create_task(self._run(campaign))
+        self.campaigns[campaign.id] = campaign
+        self._prune()
+        logger.info(f"Campaign {campaign.id} started: {len(normalized)} numbers at {calls_per_second}/s, "
+                    f"at most {max_concurrent} concurrent calls")
+        return campaign
+
+    def _prune(self):
+        finished = [campaign_id for campaign_id, campaign in self.campaigns.items() if campaign.done]
+        for campaign_id in finished[:max(len(finished) - CAMPAIGN_HISTORY, 0)]:
+            del self.campaigns[campaign_id]
+
+    async def _run(self, campaign: Campaign):
+        dials = set()
+        try:
+            for entry in campaign.entries:
+                while campaign.active >= campaign.max_concurrent:
+                    campaign.slot_freed.clear()
+                    await campaign.slot_freed.wait()
+                await campaign.bucket.take()
+                campaign.active += 1
+                entry.holds_slot = True
+                campaign.set_state(entry, "dialing")
+                # Dial without waiting, so a slow API response doesn't lower the call rate
+                dial = asyncio.create_task(self._dial(campaign, entry))
+                dials.add(dial)
+                dial.add_done_callback(dials.discard)
+            if dials:
+                # wait() rather than gather(): canceling the campaign must not cancel calls being created
+                await asyncio.wait(set(dials))
+            campaign.status = "dialed"
+        except asyncio.CancelledError:
+            campaign.status = "canceled"
+            for entry in campaign.entries:
+                if entry.state == "pending":
+                    campaign.set_state(entry, "skipped")
+            raise
+        finally:
+            self._maybe_finish(campaign)
+
+    async def _dial(self, campaign: Campaign, entry: CampaignEntry):
+        params = campaign.params
+        while True:
+            entry.attempts += 1
+            started = time.monotonic()
+            try:
+                call = await self.twilio_controller.create_call(
+                    entry.number, params["host_availability"], params["host_email"], params["host_name"]
+                )
+                break
+            except (TwilioRestException, aiohttp.ClientConnectorError) as e:
+                # Creating a call isn't idempotent: after a 5xx or a timeout the call may
+                # exist already, so only throttling and failed connects are retried
+                if (isinstance(e, aiohttp.ClientConnectorError) or e.status == 429) \
+                        and entry.attempts < MAX_ATTEMPTS:
+                    await asyncio.sleep(2 ** (entry.attempts - 1))
+                    await campaign.bucket.take()
+                    continue
+                self._fail(campaign, entry, f"{e.status}: {e.msg}" if isinstance(e, TwilioRestException) else str(e))
+                return
+            except asyncio.TimeoutError:
+                self._fail(campaign, entry, "Timed out creating the call, it may have been placed")
+                return
+            except Exception as e:
+                self._fail(campaign, entry, str(e))
+                return
+            finally:
+                CAMPAIGN_DIAL_LATENCY.observe(time.monotonic() - started)
+
+        entry.call_sid = call.sid
+        entry.dialed_at = time.monotonic()
+        campaign.dialed += 1
+        self.calls[call.sid] = (campaign, entry)
+        entry.timeout_handle = asyncio.get_running_loop().call_later(CALL_TIMEOUT_SECONDS, self._timeout, call.sid)
+        campaign.set_state(entry, "initiated")
+        if self.on_call_created is not None:
+            try:
+                self.on_call_created(call.sid, params)
+            except Exception as e:
+                logger.warning(f"Campaign {campaign.id}: on_call_created failed for {call.sid}: {str(e)}")
+
+    def _fail(self, campaign: Campaign, entry: CampaignEntry, error: str):
+        entry.error = error
+        logger.warning(f"Campaign {campaign.id}: could not call {entry.number}: {error}")
+        self._finish_entry(campaign, entry, "error")
+
+    def _timeout(self, call_sid: str):
+        campaign, entry = self.calls.pop(call_sid, (None, None))
+        if entry is not None:
+            entry.timeout_handle = None
+            self._finish_entry(campaign, entry, "timed_out")
+
+    def _finish_entry(self, campaign: Campaign, entry: CampaignEntry, state: str):
+        campaign.set_state(entry, state)
+        entry.finished_at = time.monotonic()
+        CAMPAIGN_CALLS.labels(state).inc()
+        if entry.timeout_handle is not None:
+            entry.timeout_handle.cancel()
+            entry.timeout_handle = None
+        if entry.holds_slot:
+            entry.holds_slot = False
+            campaign.active -= 1
+            campaign.slot_freed.set()
+        self._maybe_finish(campaign)
+
+    def _maybe_finish(self, campaign: Campaign):
+        if campaign.done and campaign.finished_at is None:
+            campaign.finished_at = time.monotonic()
+            if campaign.status == "dialed":
+                campaign.status = "finished"
+            logger.info(f"Campaign {campaign.id} {campaign.status}: {campaign.counts}")
+
+    def on_status(self, call_sid: Optional[str], call_status: Optional[str]) -> bool:
+        """
+        Update the number of a campaign call from a Twilio status callback
+
+        Returns:
+            bool: Whether the call belongs to a campaign
+        """
+        found = self.calls.get(call_sid) if call_sid else None
+        if found is None or not call_status:
+            return False
+        campaign, entry = found
+        if call_status in FINAL_CALL_STATUSES:
+            del self.calls[call_sid]
+            self._finish_entry(campaign, entry, call_status)
+        elif entry.state not in FINAL_STATES:
+            campaign.set_state(entry, call_status)
+        return True
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        return self.campaigns.get(campaign_id)
+
+    def cancel(self, campaign_id: str) -> Optional[Campaign]:
+        """Stop dialing new numbers; calls already placed run to completion"""
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is not None and campaign.task is not None and not campaign.task.done():
+            campaign.task.cancel()
+        return campaign
+
+    async def close(self):
+        for campaign in list(self.campaigns.values()):
+            if campaign.task is not None and not campaign.task.done():
+                campaign.task.cancel()
+                try:
+                    await campaign.task
+                except asyncio.CancelledError:
+                    pass
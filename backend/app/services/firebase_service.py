@@ -1,7 +1,8 @@
+import asyncio
 import logging
 import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Optional, Dict, Any
+from firebase_admin import credentials, firestore, firestore_async
+from typing import Optional, Dict, Any, Iterable, List
 import os
 from dotenv import load_dotenv
 from datetime import datetime
@@ -10,8 +11,33 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+TOKENS_COLLECTION = 'user_tokens'
+# When set, all Firestore traffic goes to the local emulator (e.g. "localhost:8080") without credentials
+FIRESTORE_EMULATOR_HOST = os.getenv("FIRESTORE_EMULATOR_HOST")
+EMULATOR_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID") or "demo-project"
+# Firestore allows at most 500 writes in one batch
+MAX_BATCH_WRITES = 500
+# Documents requested per get_all call
+MAX_BATCH_READS = int(os.getenv("FIRESTORE_MAX_BATCH_READS", "100"))
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 class FirebaseService:
     def __init__(self):
+        self._async_db = None
+        if FIRESTORE_EMULATOR_HOST:
+            # The emulator needs no service account, the client picks up the host from the environment.
+            # The Admin SDK is still initialized, without credentials, so firebase_admin.auth works
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(options={"projectId": EMULATOR_PROJECT_ID})
+            self.db = firestore.Client(project=EMULATOR_PROJECT_ID)
+            print(f"FirebaseService initialized with the Firestore emulator at {FIRESTORE_EMULATOR_HOST}")
+            return
+
         # Initialize Firebase Admin SDK if not already initialized
         if not firebase_admin._apps:
             cred = credentials.Certificate({
@@ -31,12 +57,22 @@ class FirebaseService:
         self.db = firestore.client()
         print("FirebaseService initialized with Firestore")
     
+    @property
+    def async_db(self):
+        """Async Firestore client, created on first use so it binds to the running event loop"""
+        if self._async_db is None:
+            if FIRESTORE_EMULATOR_HOST:
+                self._async_db = firestore.AsyncClient(project=EMULATOR_PROJECT_ID)
+            else:
+                self._async_db = firestore_async.client()
+        return self._async_db
+    
     def get_user_tokens(self, user_email: str) -> Optional[Dict]:
         """Get user's Google tokens from Firestore"""
         try:
             print(f"Getting tokens for user: {user_email}")
             # Get the document directly using email as document ID
-            doc_ref = self.db.collection('user_tokens').document(user_email)
+            doc_ref = self.db.collection(TOKENS_COLLECTION).document(user_email)
             doc = doc_ref.get()
             
             if not doc.exists:
@@ -57,7 +93,7 @@ class FirebaseService:
             print(f"Storing tokens for user: {user_email}")
             
             # Store directly using email as document ID
-            doc_ref = self.db.collection('user_tokens').document(user_email)
+            doc_ref = self.db.collection(TOKENS_COLLECTION).document(user_email)
             doc_ref.set(tokens, merge=True)
             print(f"Stored tokens for user: {user_email}")
             
@@ -65,4 +101,101 @@ class FirebaseService:
             
         except Exception as e:
             print(f"Error storing user tokens: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+    
+    async def get_user_tokens_async(self, user_email: str) -> Optional[Dict]:
+        """Get user's Google tokens from Firestore without blocking the event loop"""
+        try:
+            doc = await self.async_db.collection(TOKENS_COLLECTION).document(user_email).get()
+            if not doc.exists:
+                print(f"No tokens found for user: {user_email}")
+                return None
+            return doc.to_dict()
+        except Exception as e:
+            print(f"Error getting user tokens: {str(e)}")
+            return None
+    
+    async def store_user_tokens_async(self, user_email: str, tokens: Dict) -> bool:
+        """Store user's Google tokens in Firestore without blocking the event loop"""
+        try:
+            await self.async_db.collection(TOKENS_COLLECTION).document(user_email).set(tokens, merge=True)
+            return True
+        except Exception as e:
+            print(f"Error storing user tokens: {str(e)}")
+            return False
+    
+    async def get_user_tokens_many(self, user_emails: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Get Google tokens for many users with batched reads
+        
+        Args:
+            user_emails (iterable): Emails of the users
+            
+        Returns:
+            dict: Tokens by email, None for users without tokens
+        """
+        emails = list(dict.fromkeys(user_emails))
+        results: Dict[str, Optional[Dict]] = {email: None for email in emails}
+        collection = self.async_db.collection(TOKENS_COLLECTION)
+        
+        async def read_chunk(chunk):
+            refs = [collection.document(email) for email in chunk]
+            async for doc in self.async_db.get_all(refs):
+                if doc.exists:
+                    results[doc.id] = doc.to_dict()
+        
+        try:
+            await asyncio.gather(*(read_chunk(chunk) for chunk in _chunks(emails, MAX_BATCH_READS)))
+            print(f"Found tokens for {sum(1 for t in results.values() if t)} of {len(emails)} users")
+        except Exception as e:
+            print(f"Error getting tokens for {len(emails)} users: {str(e)}")
+        return results
+    
+    async def store_user_tokens_many(self, tokens_by_email: Dict[str, Dict]) -> bool:
+        """
+        Store Google tokens for many users with batched writes
+        
+        Writes are merged into the existing documents, in batches of up to
+        500 (Firestore's limit) that are committed concurrently. Each batch
+        is atomic, so a failure leaves whole batches either written or not.
+        
+        Args:
+            tokens_by_email (dict): Tokens to store, keyed by user email
+            
+        Returns:
+            bool: True if every batch was committed
+        """
+        collection = self.async_db.collection(TOKENS_COLLECTION)
+        
+        async def write_chunk(chunk):
+            batch = self.async_db.batch()
+            for email, tokens in chunk:
+                batch.set(collection.document(email), tokens, merge=True)
+            await batch.commit()
+        
+        items = list(tokens_by_email.items())
+        results = await asyncio.gather(
+            *(write_chunk(chunk) for chunk in _chunks(items, MAX_BATCH_WRITES)),
+            return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        for failure in failures:
+            print(f"Error storing a batch of user tokens: {str(failure)}")
+        print(f"Stored tokens for {len(items)} users in {len(results)} batches ({len(failures)} failed)")
+        return not failures
+
+
+_service: Optional[FirebaseService] = None
+
+
+def get_firebase_service() -> FirebaseService:
+    """
+    Get the process-wide FirebaseService
+
+    Sharing it means one Firestore client, and one async client with its
+    gRPC channel, per process instead of one per request.
+    """
+    global _service
+    if _service is None:
+        _service = FirebaseService()
+    return _service
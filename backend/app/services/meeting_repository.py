@@ -0,0 +1,298 @@
+import os
+import json
+import base64
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from dateutil import parser as date_parser
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "meetings.db")
+MEETING_DB_PATH = os.getenv("MEETING_DB_PATH", DEFAULT_DB_PATH)
+# Rows fetched per query when streaming
+STREAM_BATCH_SIZE = int(os.getenv("MEETING_STREAM_BATCH_SIZE", "500"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT,
+    client_id TEXT,
+    start_ts REAL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_meetings_start ON meetings (start_ts, id);
+CREATE INDEX IF NOT EXISTS idx_meetings_user_start ON meetings (user_id, start_ts, id);
+CREATE INDEX IF NOT EXISTS idx_meetings_client_start ON meetings (client_id, start_ts, id);
+"""
+
+
+def parse_start_ts(value: Any) -> Optional[float]:
+    """Convert a startDateTime value to a UTC timestamp, or None if it can't be parsed"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                parsed = date_parser.isoparse(value)
+        else:
+            parsed = value
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return None
+
+
+def encode_cursor(start_ts: Optional[float], meeting_id: str) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps([start_ts, meeting_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    """
+    Decode a cursor from encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_ts, meeting_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(meeting_id, str) or not (start_ts is None or isinstance(start_ts, (int, float))):
+        raise ValueError("Invalid cursor")
+    return start_ts, meeting_id
+
+
+class MeetingRepository:
+    """
+    Meetings stored in a local SQLite database
+
+    Lookups by ID and range queries by start time go through B-tree
+    indexes. Writes are committed before they return; batches of new
+    meetings go in one transaction with executemany.
+    """
+
+    def __init__(self, path: str = MEETING_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by the request threads, guarded by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        logger.info(f"MeetingRepository opened at {path}")
+
+    @staticmethod
+    def _row(meeting_id: str, meeting: Dict[str, Any]) -> tuple:
+        return (
+            meeting_id,
+            meeting.get("userId"),
+            meeting.get("clientId"),
+            parse_start_ts(meeting.get("startDateTime")),
+            time.time(),
+            json.dumps(meeting, default=str),
+        )
+
+    def add(self, meeting: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Insert a meeting
+
+        The meeting gets a new server-generated "id"; any id it came with is
+        replaced, so a caller can't overwrite someone else's meeting.
+
+        Returns:
+            dict: The meeting, with its id
+
+        Raises:
+            sqlite3.Error: If the insert fails
+        """
+        return self.add_many([meeting])[0]
+
+    def add_many(self, meetings: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several meetings with executemany in one transaction, see add()"""
+        meetings = list(meetings)
+        for meeting in meetings:
+            meeting["id"] = uuid.uuid4().hex
+        rows = [self._row(meeting["id"], meeting) for meeting in meetings]
+        with self.lock:
+            try:
+                with self.connection:
+                    self.connection.execute("BEGIN")
+                    self.connection.executemany(
+                        "INSERT INTO meetings (id, user_id, client_id, start_ts, created_at, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Failed to insert {len(rows)} meetings: {str(e)}")
+                raise
+        return meetings
+
+    def update(self, meeting_id: str, meeting: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Replace a meeting owned by user_id
+
+        The stored id and owner are kept whatever the new data says.
+
+        Returns:
+            dict: The stored meeting, or None if no meeting with that id belongs to user_id
+        """
+        meeting = dict(meeting, id=meeting_id, userId=user_id)
+        _, _, client_id, start_ts, _, data = self._row(meeting_id, meeting)
+        with self.lock:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                cursor = self.connection.execute(
+                    "UPDATE meetings SET client_id = ?, start_ts = ?, data = ? WHERE id = ? AND user_id = ?",
+                    (client_id, start_ts, data, meeting_id, user_id),
+                )
+        return meeting if cursor.rowcount else None
+
+    def get(self, meeting_id: str) -> Optional[Dict[str, Any]]:
+        """Get a meeting by its id"""
+        with self.lock:
+            row = self.connection.execute("SELECT data FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, user_id: Optional[str] = None, client_id: Optional[str] = None,
+             start_from: Optional[float] = None, start_to: Optional[float] = None,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get meetings ordered by start time
+
+        Args:
+            user_id (str, optional): Only meetings for this user
+            client_id (str, optional): Only meetings for this client
+            start_from (float, optional): Only meetings starting at or after this timestamp
+            start_to (float, optional): Only meetings starting before this timestamp
+            limit (int, optional): Maximum number of meetings
+        """
+        rows = self._select(user_id, client_id, start_from, start_to, None, limit)
+        return [json.loads(data) for _, _, data in rows]
+
+    def page(self, user_id: Optional[str] = None, client_id: Optional[str] = None,
+             start_from: Optional[float] = None, start_to: Optional[float] = None,
+             cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[str], Optional[str]]:
+        """
+        Get one page of meetings ordered by start time, using keyset pagination
+
+        Meetings are returned as their stored JSON text so callers can pass
+        them on without parsing and re-serializing.
+
+        Args:
+            cursor (str, optional): nextCursor from the previous page
+
+        Returns:
+            tuple: (list of meeting JSON strings, cursor for the next page or None)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = decode_cursor(cursor) if cursor else None
+        # Fetch one extra row to know whether there is a next page
+        rows = self._select(user_id, client_id, start_from, start_to, after, limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        return [data for _, _, data in rows], next_cursor
+
+    def iter_json(self, user_id: Optional[str] = None, client_id: Optional[str] = None,
+                  start_from: Optional[float] = None, start_to: Optional[float] = None,
+                  batch_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+        """
+        Iterate over all matching meetings as stored JSON text
+
+        Rows are read in keyset-paginated batches and the lock is released
+        between batches, so memory stays constant and writers aren't blocked
+        for the whole export.
+        """
+        after = None
+        while True:
+            rows = self._select(user_id, client_id, start_from, start_to, after, batch_size)
+            for _, _, data in rows:
+                yield data
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    def _select(self, user_id, client_id, start_from, start_to, after, limit) -> List[tuple]:
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if client_id is not None:
+            clauses.append("client_id = ?")
+            params.append(client_id)
+        if start_from is not None:
+            clauses.append("start_ts >= ?")
+            params.append(start_from)
+        if start_to is not None:
+            clauses.append("start_ts < ?")
+            params.append(start_to)
+        if after is not None:
+            after_ts, after_id = after
+            if after_ts is None:
+                # Meetings without a start time sort first (SQLite orders NULL lowest)
+                clauses.append("((start_ts IS NULL AND id > ?) OR start_ts IS NOT NULL)")
+                params.append(after_id)
+            else:
+                clauses.append("(start_ts, id) > (?, ?)")
+                params.extend([after_ts, after_id])
+        query = "SELECT start_ts, id, data FROM meetings"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY start_ts, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return self.connection.execute(query, params).fetchall()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_repository: Optional[MeetingRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_meeting_repository() -> MeetingRepository:
+    """Get the process-wide meeting repository"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = MeetingRepository()
+        return _repository
+
+
+def close_meeting_repository():
+    """Close the database"""
+    global _repository
+    with _repository_lock:
+        if _repository is not None:
+            _repository.close()
+            _repository = None
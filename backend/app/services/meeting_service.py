@@ -1,32 +1,52 @@
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import os
 from openai import OpenAI
+from .meeting_repository import MeetingRepository, get_meeting_repository
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class MeetingService:
-    def __init__(self):
-        # In-memory storage for meetings
-        # In a real app, this would be a database
-        self.meetings = []
+    def __init__(self, repository: Optional[MeetingRepository] = None):
+        # Meetings live in the shared SQLite repository, so they outlive this per-request instance
+        self.repository = repository or get_meeting_repository()
         self.client = OpenAI()  # Automatically reads API key from env
         logger.info("MeetingService initialized")
     
     def create_meeting(self, meeting_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new meeting"""
-        self.meetings.append(meeting_data)
+        self.repository.add(meeting_data)
         logger.info(f"Meeting created: {meeting_data.get('title', 'Untitled')}")
         return meeting_data
     
+    def create_meetings(self, meetings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create several meetings in one batch"""
+        created = self.repository.add_many(meetings)
+        logger.info(f"{len(created)} meetings created")
+        return created
+    
+    def update_meeting(self, meeting_id: str, meeting_data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+        """Replace a meeting owned by user_id; returns None if it doesn't exist or isn't theirs"""
+        return self.repository.update(meeting_id, meeting_data, user_id)
+    
     def get_all_meetings(self) -> List[Dict[str, Any]]:
         """Get all meetings"""
-        return self.meetings
+        return self.repository.find()
+    
+    def get_meetings_page(self, user_id: Optional[str] = None, client_id: Optional[str] = None,
+                          start_from: Optional[float] = None, start_to: Optional[float] = None,
+                          cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[str], Optional[str]]:
+        """Get one page of meetings as JSON strings, plus the cursor for the next page"""
+        return self.repository.page(user_id, client_id, start_from, start_to, cursor, limit)
+    
+    def iter_meetings_ndjson(self, user_id: Optional[str] = None, client_id: Optional[str] = None,
+                             start_from: Optional[float] = None, start_to: Optional[float] = None) -> Iterator[str]:
+        """Stream all matching meetings as newline-delimited JSON"""
+        for data in self.repository.iter_json(user_id, client_id, start_from, start_to):
+            yield data + "\n"
     
-    def get_meeting_by_id(self, meeting_id: str) -> Dict[str, Any]:
+    def get_meeting_by_id(self, meeting_id: str) -> Optional[Dict[str, Any]]:
         """Get a meeting by ID"""
-        # In a real app, you would search by ID
-        # For now, we'll just return the first meeting
-        return self.meetings[0] if self.meetings else None 
\ No newline at end of file
+        return self.repository.get(meeting_id)
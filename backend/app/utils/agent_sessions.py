@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, List, Optional
+from .metrics import RollingQuantiles, registry
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("AGENT_PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+# Unclaimed sessions are closed after this long; Twilio rings for up to 60 seconds by default
+PREWARM_TTL_SECONDS = float(os.getenv("AGENT_PREWARM_TTL_SECONDS", "90"))
+LATENCY_SAMPLES = 500
+
+PREWARM_RESULTS = registry.counter(
+    "agent_session_prewarm_total",
+    "Pre-warmed agent sessions by how they ended",
+    ["result"],
+)
+TIME_TO_FIRST_AUDIO = registry.histogram(
+    "call_time_to_first_audio_seconds",
+    "Time from the Twilio media stream starting to the first agent audio frame sent, by session type",
+    ["session"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+)
+
+
+def resolve_host_name(host_name: Optional[str], host_email: Optional[str]) -> str:
+    """Use the given host name, or derive one from the host's email address"""
+    if host_name and host_name != "the host":
+        return host_name
+    if host_email and "@" in host_email:
+        # Capitalize and replace dots/underscores with spaces
+        return host_email.split("@")[0].replace(".", " ").replace("_", " ").title()
+    return "the host"
+
+
+def build_agent_variables(host_name: str, availability: Optional[str]) -> Dict[str, str]:
+    """Build the dynamic variables the ElevenLabs agent is started with"""
+    now = datetime.datetime.now()
+    return {
+        "username": host_name,
+        "available_time": availability or "not specified",
+        "current_time_iso": now.isoformat(),
+        "current_day": now.strftime("%A"),
+        "timezone_info": time.tzname[0],
+    }
+
+
+class PrewarmedSession:
+    """An agent conversation started while the call is still ringing"""
+
+    def __init__(self, call_sid: str, params: Dict[str, Any]):
+        self.call_sid = call_sid
+        self.params = params
+        self.conversation = None
+        self.audio_interface = None
+        self.transcript: List[Dict[str, str]] = []
+        self.stream_sid: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.expiry_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def alive(self) -> bool:
+        # The SDK stops the audio interface when the upstream connection ends
+        return self.audio_interface is not None and not self.audio_interface.should_stop.is_set()
+
+    @property
+    def connected(self) -> bool:
+        # start() is called by the SDK once the agent WebSocket is open
+        return self.audio_interface is not None and self.audio_interface.started_at is not None
+
+
+class AgentSessionPool:
+    """
+    Agent sessions pre-warmed during ringing, waiting for their media stream
+
+    Sessions are keyed by Twilio Call SID. The media stream claims its
+    session from the "start" event; sessions nobody claims within the TTL
+    (or whose call ends first) are closed.
+    """
+
+    def __init__(self, ttl: float = PREWARM_TTL_SECONDS, enabled: bool = PREWARM_ENABLED):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.sessions: Dict[str, PrewarmedSession] = {}
+        self.counts = {"prewarmed": 0, "claimed": 0, "connected_before_answer": 0,
+                       "expired": 0, "discarded": 0, "dead": 0, "failed": 0}
+        # Time-to-first-audio in milliseconds
+        self.first_audio = {"prewarmed": RollingQuantiles(LATENCY_SAMPLES), "cold": RollingQuantiles(LATENCY_SAMPLES)}
+
+    def has(self, call_sid: str) -> bool:
+        return call_sid in self.sessions
+
+    def add(self, session: PrewarmedSession):
+        """Keep a started session until its media stream claims it or the TTL runs out"""
+        self.sessions[session.call_sid] = session
+        self.counts["prewarmed"] += 1
+        session.expiry_handle = asyncio.get_running_loop().call_later(self.ttl, self._expire, session.call_sid)
+
+    def record_failure(self, call_sid: str, error: Exception):
+        self.counts["failed"] += 1
+        PREWARM_RESULTS.labels("failed").inc()
+        logger.warning(f"Could not pre-warm agent session for call {call_sid}: {str(error)}")
+
+    def claim(self, call_sid: Optional[str]) -> Optional[PrewarmedSession]:
+        """
+        Take the pre-warmed session for a call
+
+        Returns:
+            PrewarmedSession or None: None if there is no live session for the call
+        """
+        session = self.sessions.pop(call_sid, None) if call_sid else None
+        if session is None:
+            return None
+        if session.expiry_handle is not None:
+            session.expiry_handle.cancel()
+        if not session.alive:
+            self.counts["dead"] += 1
+            PREWARM_RESULTS.labels("dead").inc()
+            logger.warning(f"Pre-warmed agent session for call {call_sid} ended before the stream connected")
+            self._close(session)
+            return None
+        self.counts["claimed"] += 1
+        PREWARM_RESULTS.labels("claimed").inc()
+        if session.connected:
+            self.counts["connected_before_answer"] += 1
+        return session
+
+    def discard(self, call_sid: Optional[str]):
+        """Close the pre-warmed session of a call that ended without a media stream"""
+        session = self.sessions.pop(call_sid, None) if call_sid else None
+        if session is not None:
+            if session.expiry_handle is not None:
+                session.expiry_handle.cancel()
+            self.counts["discarded"] += 1
+            PREWARM_RESULTS.labels("discarded").inc()
+            self._close(session)
+
+    def _expire(self, call_sid: str):
+        session = self.sessions.pop(call_sid, None)
+        if session is not None:
+            self.counts["expired"] += 1
+            PREWARM_RESULTS.labels("expired").inc()
+            logger.info(f"Closing unclaimed agent session for call {call_sid}")
+            self._close(session)
+
+    def _close(self, session: PrewarmedSession):
+        # Joining the SDK thread can block for its receive timeout, so do it off the loop
+        asyncio.get_running_loop().run_in_executor(None, self._end_conversation, session)
+
+    @staticmethod
+    def _end_conversation(session: PrewarmedSession):
+        try:
+            session.conversation.end_session()
+            session.conversation.wait_for_session_end()
+        except Exception as e:
+            logger.warning(f"Error closing agent session for call {session.call_sid}: {str(e)}")
+
+    def close(self):
+        """Close all unclaimed sessions"""
+        sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            if session.expiry_handle is not None:
+                session.expiry_handle.cancel()
+            try:
+                session.conversation.end_session()
+            except Exception as e:
+                logger.warning(f"Error closing agent session for call {session.call_sid}: {str(e)}")
+
+    def record_first_audio(self, kind: str, seconds: float, call_sid: Optional[str] = None):
+        """Record time-to-first-audio for a call, kind is "prewarmed" or "cold" """
+        self.first_audio[kind].add(seconds * 1000)
+        TIME_TO_FIRST_AUDIO.labels(kind).observe(seconds)
+        print(f"\n=== CALL {call_sid}: FIRST AGENT AUDIO AFTER {seconds * 1000:.0f} ms ({kind}) ===\n")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "waiting": len(self.sessions),
+            **self.counts,
+            "time_to_first_audio_ms": {kind: samples.snapshot() for kind, samples in self.first_audio.items()},
+        }
+
+
+agent_sessions = AgentSessionPool()
+
+registry.gauge(
+    "agent_sessions_waiting",
+    "Pre-warmed agent sessions waiting for their media stream",
+    callback=lambda: [((), len(agent_sessions.sessions))],
+)
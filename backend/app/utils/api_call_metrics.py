@@ -0,0 +1,141 @@
+import os
+import time
+import random
+import logging
+from typing import Any, Callable, Dict, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Retries are done here instead of inside the OpenAI client so we can count them
+DEFAULT_MAX_RETRIES = int(os.getenv("API_CALL_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("API_CALL_RETRY_BASE_DELAY", "0.5"))
+
+# Error classes (by name) worth retrying - connection problems, timeouts, rate limits and 5xx
+RETRYABLE_ERRORS = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0)
+
+API_CALL_LATENCY = registry.histogram(
+    "api_call_duration_seconds",
+    "Latency of upstream LLM and speech API calls, including retries",
+    ["site", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+API_CALLS = registry.counter(
+    "api_calls_total",
+    "Upstream LLM and speech API calls by outcome",
+    ["site", "model", "outcome"],
+)
+API_CALL_ERRORS = registry.counter(
+    "api_call_errors_total",
+    "Upstream API call attempts that raised, by error class",
+    ["site", "error"],
+)
+API_CALL_RETRIES = registry.counter(
+    "api_call_retries_total",
+    "Retries made for upstream API calls",
+    ["site"],
+)
+API_CALL_TOKENS = registry.counter(
+    "api_call_tokens_total",
+    "Tokens reported by upstream API calls",
+    ["site", "model", "kind"],
+)
+
+
+def _record_usage(site: str, model: str, response: Any):
+    """Record prompt, completion and cached token counts if the response has usage"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    API_CALL_TOKENS.labels(site, model, "prompt").inc(prompt_tokens)
+    API_CALL_TOKENS.labels(site, model, "completion").inc(completion_tokens)
+    API_CALL_TOKENS.labels(site, model, "cached").inc(cached_tokens)
+
+
+def instrumented_call(site: str, func: Callable, *args, max_retries: Optional[int] = None, **kwargs):
+    """
+    Call an upstream API and record latency, token usage, errors and retries
+
+    Both the call and the backoff between retries block, so async code
+    must run this in the "llm" or "transcription" task pool.
+
+    Args:
+        site (str): Name of the call site, e.g. "text_parser.parse_to_json"
+        func (callable): The client method to call; keyword arguments, including
+            model (which also labels the metrics), are passed on to it
+        max_retries (int, optional): Retries for transient errors, defaults to API_CALL_MAX_RETRIES
+
+    Returns:
+        The response returned by func
+    """
+    max_retries = DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+    model = kwargs.get("model", "unknown")
+    start = time.perf_counter()
+    attempt = 0
+    try:
+        upload = kwargs.get("file")
+        if isinstance(upload, tuple):
+            upload = upload[1]
+        while True:
+            try:
+                if attempt and hasattr(upload, "seek"):
+                    # Rewind file uploads so a retry sends the whole file again
+                    upload.seek(0)
+                response = func(*args, **kwargs)
+                break
+            except Exception as e:
+                error_class = type(e).__name__
+                API_CALL_ERRORS.labels(site, error_class).inc()
+                if error_class not in RETRYABLE_ERRORS or attempt >= max_retries:
+                    API_CALLS.labels(site, model, "error").inc()
+                    raise
+                attempt += 1
+                API_CALL_RETRIES.labels(site).inc()
+                delay = RETRY_BASE_DELAY * (2 ** (attempt - 1)) * (1 + random.random() / 2)
+                logger.warning(f"{site}: {error_class}, retrying in {delay:.2f}s (attempt {attempt}/{max_retries})")
+                time.sleep(delay)
+    finally:
+        API_CALL_LATENCY.labels(site, model).observe(time.perf_counter() - start)
+
+    API_CALLS.labels(site, model, "success").inc()
+    _record_usage(site, model, response)
+    return response
+
+
+def get_api_call_stats() -> Dict:
+    """Get a per call site summary of the recorded API call metrics"""
+    sites: Dict[str, Dict] = {}
+
+    def site_entry(site):
+        return sites.setdefault(site, {
+            "calls": {},
+            "latency": {},
+            "tokens": {},
+            "errors": {},
+            "retries": 0,
+        })
+
+    for (site, model, outcome), child in API_CALLS.children():
+        site_entry(site)["calls"][outcome] = site_entry(site)["calls"].get(outcome, 0) + child.value
+    for (site, model), child in API_CALL_LATENCY.children():
+        site_entry(site)["latency"][model] = child.snapshot()
+    for (site, model, kind), child in API_CALL_TOKENS.children():
+        tokens = site_entry(site)["tokens"]
+        tokens[kind] = tokens.get(kind, 0) + child.value
+    for (site, error), child in API_CALL_ERRORS.children():
+        site_entry(site)["errors"][error] = child.value
+    for (site,), child in API_CALL_RETRIES.children():
+        site_entry(site)["retries"] = child.value
+
+    return sites
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+from .audio_format import FFMPEG_BINARY, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Chunk sizing, in seconds
+MAX_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_MAX_CHUNK_SECONDS", "600"))
+MIN_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_MIN_CHUNK_SECONDS", "120"))
+# Overlap added when no silence is found and a chunk has to be cut mid-speech
+CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "2"))
+
+# Silence detection settings for ffmpeg's silencedetect filter
+SILENCE_THRESHOLD_DB = os.getenv("TRANSCRIPTION_SILENCE_THRESHOLD_DB", "-35")
+SILENCE_MIN_SECONDS = os.getenv("TRANSCRIPTION_SILENCE_MIN_SECONDS", "0.5")
+
+_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_SILENCE_START_PATTERN = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END_PATTERN = re.compile(r"silence_end: (\d+(?:\.\d+)?)")
+_WORD_PATTERN = re.compile(r"[^\w']+")
+
+
+async def detect_silences(path: str) -> Tuple[Optional[float], List[Tuple[float, float]]]:
+    """
+    Find silent stretches in an audio file with ffmpeg's silencedetect filter
+
+    Args:
+        path (str): Path to the audio file
+
+    Returns:
+        tuple: (duration in seconds or None, list of (start, end) silences)
+    """
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY, "-hide_banner", "-nostats", "-i", path,
+        "-vn", "-af", f"silencedetect=noise={SILENCE_THRESHOLD_DB}dB:d={SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    duration = None
+    silences = []
+    silence_start = None
+    # Read line by line so memory stays flat for long recordings
+    async for raw_line in process.stderr:
+        line = raw_line.decode(errors="replace")
+        if duration is None:
+            match = _DURATION_PATTERN.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                continue
+        match = _SILENCE_START_PATTERN.search(line)
+        if match:
+            silence_start = max(float(match.group(1)), 0.0)
+            continue
+        match = _SILENCE_END_PATTERN.search(line)
+        if match and silence_start is not None:
+            silences.append((silence_start, float(match.group(1))))
+            silence_start = None
+    return_code = await process.wait()
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg silence detection exited with code {return_code}")
+    if silence_start is not None and duration is not None:
+        silences.append((silence_start, duration))
+    return duration, silences
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]],
+                max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+                min_chunk_seconds: float = MIN_CHUNK_SECONDS,
+                overlap_seconds: float = CHUNK_OVERLAP_SECONDS) -> List[Tuple[float, float]]:
+    """
+    Split a recording into chunks no longer than max_chunk_seconds
+
+    Each cut is placed in the middle of the latest silence that keeps the
+    chunk within bounds. When there is no usable silence the chunk is cut
+    hard and the next chunk starts overlap_seconds earlier so words on the
+    boundary are not lost.
+
+    Returns:
+        list: (start, end) pairs in seconds
+    """
+    min_chunk_seconds = min(min_chunk_seconds, max_chunk_seconds)
+    midpoints = [(start + end) / 2 for start, end in silences]
+    chunks = []
+    position = 0.0
+    while duration - position > max_chunk_seconds:
+        limit = position + max_chunk_seconds
+        candidates = [m for m in midpoints if position + min_chunk_seconds <= m <= limit]
+        if candidates:
+            cut = candidates[-1]
+            chunks.append((position, cut))
+            position = cut
+        else:
+            chunks.append((position, limit))
+            position = max(limit - overlap_seconds, position + 1.0)
+    chunks.append((position, duration))
+    return chunks
+
+
+async def extract_chunk(path: str, start: float, end: float):
+    """
+    Cut a chunk out of an audio file as speech-quality MP3 through an ffmpeg pipe
+
+    Returns:
+        SpooledTemporaryFile: The MP3 chunk, positioned at the start
+    """
+    output, _ = await run_ffmpeg([
+        "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path,
+        "-vn", "-ac", "1", "-ar", "16000", "-b:a", "64k",
+        "-f", "mp3", "pipe:1",
+    ])
+    return output
+
+
+def _normalize_word(word: str) -> str:
+    return _WORD_PATTERN.sub("", word).lower()
+
+
+def stitch_transcripts(texts: List[str], overlaps: Optional[List[bool]] = None,
+                       max_overlap_words: int = 40) -> str:
+    """
+    Join chunk transcripts in order, removing words repeated across boundaries
+
+    When chunks overlap, the end of one transcript and the start of the
+    next contain the same words. The longest run of matching words (ignoring
+    case and punctuation) is dropped from the start of the next chunk.
+
+    Args:
+        texts (list): Transcripts in chunk order
+        overlaps (list, optional): overlaps[i] is True when chunk i starts before
+            chunk i - 1 ends; boundaries without overlap are joined as-is
+        max_overlap_words (int): Longest run of words to look for
+    """
+    merged_words: List[str] = []
+    for index, text in enumerate(texts):
+        words = (text or "").split()
+        if not words:
+            continue
+        overlapped = overlaps[index] if overlaps is not None else True
+        if merged_words and overlapped:
+            tail = [_normalize_word(w) for w in merged_words[-max_overlap_words:]]
+            head = [_normalize_word(w) for w in words[:max_overlap_words]]
+            overlap = 0
+            for size in range(min(len(tail), len(head)), 0, -1):
+                if tail[-size:] == head[:size]:
+                    overlap = size
+                    break
+            words = words[overlap:]
+        merged_words.extend(words)
+    return " ".join(merged_words)
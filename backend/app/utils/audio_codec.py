@@ -0,0 +1,230 @@
+import os
+import math
+import logging
+from typing import Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Twilio media streams always carry 8 kHz mu-law
+TWILIO_AUDIO_FORMAT = "ulaw_8000"
+# Formats the ElevenLabs agent is configured with, e.g. "pcm_16000" or "pcm_24000".
+# Left at the Twilio format, audio is passed through untouched.
+AGENT_INPUT_AUDIO_FORMAT = os.getenv("AGENT_INPUT_AUDIO_FORMAT", TWILIO_AUDIO_FORMAT)
+AGENT_OUTPUT_AUDIO_FORMAT = os.getenv("AGENT_OUTPUT_AUDIO_FORMAT", TWILIO_AUDIO_FORMAT)
+
+# Filter taps per polyphase branch at the lower of the two rates; 16 gives a
+# transition band of roughly 10% of the Nyquist frequency with a Kaiser window
+RESAMPLER_TAPS = int(os.getenv("AUDIO_RESAMPLER_TAPS", "16"))
+RESAMPLER_KAISER_BETA = 8.0
+
+ENCODINGS = ("ulaw", "alaw", "pcm")
+
+
+def _build_ulaw_decode() -> np.ndarray:
+    byte = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = ((((byte & 0x0F) << 3) + 0x84) << ((byte >> 4) & 0x07)) - 0x84
+    return np.where(byte & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_alaw_decode() -> np.ndarray:
+    byte = np.arange(256, dtype=np.int32) ^ 0x55
+    segment = (byte & 0x70) >> 4
+    mantissa = (byte & 0x0F) << 4
+    magnitude = np.where(segment == 0, mantissa + 8, (mantissa + 0x108) << np.maximum(segment - 1, 0))
+    return np.where(byte & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+def _build_ulaw_encode() -> np.ndarray:
+    # Indexed by the int16 sample reinterpreted as uint16
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.where(pcm < 0, -pcm, pcm), 8159) + 0x21
+    segment = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), magnitude)
+    value = np.where(segment >= 8, 0x7F, (np.minimum(segment, 7) << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    return (value ^ mask).astype(np.uint8)
+
+
+def _build_alaw_encode() -> np.ndarray:
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    magnitude = np.where(pcm >= 0, pcm, -pcm - 1)
+    segment = np.searchsorted(np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]), magnitude)
+    mantissa = np.where(segment < 2, magnitude >> 1, magnitude >> np.maximum(segment, 1)) & 0x0F
+    value = np.where(segment >= 8, 0x7F, (np.minimum(segment, 7) << 4) | mantissa)
+    return (value ^ mask).astype(np.uint8)
+
+
+# G.711 lookup tables: a frame converts with one fancy-indexing pass
+ULAW_TO_PCM16 = _build_ulaw_decode()
+ALAW_TO_PCM16 = _build_alaw_decode()
+PCM16_TO_ULAW = _build_ulaw_encode()
+PCM16_TO_ALAW = _build_alaw_encode()
+
+
+def ulaw_to_pcm16(data: bytes) -> np.ndarray:
+    """Decode mu-law bytes to PCM16 samples"""
+    return ULAW_TO_PCM16[np.frombuffer(data, dtype=np.uint8)]
+
+
+def alaw_to_pcm16(data: bytes) -> np.ndarray:
+    """Decode A-law bytes to PCM16 samples"""
+    return ALAW_TO_PCM16[np.frombuffer(data, dtype=np.uint8)]
+
+
+def pcm16_to_ulaw(samples: np.ndarray) -> bytes:
+    """Encode PCM16 samples as mu-law bytes"""
+    return PCM16_TO_ULAW[np.asarray(samples, dtype=np.int16).view(np.uint16)].tobytes()
+
+
+def pcm16_to_alaw(samples: np.ndarray) -> bytes:
+    """Encode PCM16 samples as A-law bytes"""
+    return PCM16_TO_ALAW[np.asarray(samples, dtype=np.int16).view(np.uint16)].tobytes()
+
+
+def parse_audio_format(name: str) -> Tuple[str, int]:
+    """
+    Split an ElevenLabs-style format name into encoding and sample rate
+
+    Args:
+        name (str): e.g. "ulaw_8000" or "pcm_16000"
+
+    Returns:
+        tuple: (encoding, sample_rate)
+    """
+    encoding, _, rate = name.partition("_")
+    if encoding not in ENCODINGS or not rate.isdigit():
+        raise ValueError(f"Unsupported audio format: {name}")
+    return encoding, int(rate)
+
+
+# A misconfigured format should fail at startup, not on the first call
+parse_audio_format(AGENT_INPUT_AUDIO_FORMAT)
+parse_audio_format(AGENT_OUTPUT_AUDIO_FORMAT)
+
+
+class StreamingResampler:
+    """
+    Rational-ratio polyphase FIR resampler for a continuous stream of frames
+
+    The filter history and the output phase carry over between calls, so
+    feeding a stream 20 ms at a time gives the same samples as resampling
+    it in one go. Each call is a single gather and multiply-accumulate.
+    """
+
+    def __init__(self, from_rate: int, to_rate: int, taps: int = RESAMPLER_TAPS):
+        divisor = math.gcd(from_rate, to_rate)
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+
+        # Low-pass prototype at the upsampled rate, cut off at the lower Nyquist frequency
+        length = taps * max(self.up, self.down)
+        length += -length % self.up
+        cutoff = 0.5 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, RESAMPLER_KAISER_BETA)
+        prototype *= self.up / prototype.sum()
+
+        # bank[phase, k] multiplies the input sample k steps back from the current one
+        self.taps = length // self.up
+        self.bank = prototype.reshape(self.taps, self.up).T.astype(np.float32)
+        self.tap_offsets = self.taps - 1 - np.arange(self.taps)
+        # Gather indices and filter rows by (position, frame length); with fixed-size
+        # frames the position cycles through a handful of values
+        self._plans = {}
+        self.reset()
+
+    def reset(self):
+        """Forget the stream so far, e.g. when queued audio is discarded"""
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)
+        # Position of the next output sample, in 1/up input samples from the start of the next frame
+        self.position = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Resample one frame
+
+        Args:
+            samples (np.ndarray): PCM16 samples at from_rate
+
+        Returns:
+            np.ndarray: PCM16 samples at to_rate
+        """
+        if self.up == self.down:
+            return np.asarray(samples, dtype=np.int16)
+        count = len(samples)
+        extended = np.concatenate((self.history, np.asarray(samples, dtype=np.float32)))
+        self.history = extended[count:]
+
+        plan = self._plans.get((self.position, count))
+        if plan is None:
+            plan = self._plan(self.position, count)
+            if len(self._plans) < 64:
+                self._plans[(self.position, count)] = plan
+        indices, filters, self.position = plan
+        if len(indices) == 0:
+            return np.zeros(0, dtype=np.int16)
+        resampled = np.einsum("ij,ij->i", extended[indices], filters)
+        return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16)
+
+    def _plan(self, position: int, count: int):
+        end = count * self.up
+        outputs = max(-(-(end - position) // self.down), 0)
+        positions = position + self.down * np.arange(outputs)
+        indices = (positions // self.up)[:, None] + self.tap_offsets
+        return indices, self.bank[positions % self.up], position + outputs * self.down - end
+
+
+class AudioConverter:
+    """
+    Stateful frame converter between two audio formats, e.g. ulaw_8000 -> pcm_16000
+
+    Returns its input unchanged when both formats are the same. PCM input
+    may be split at odd byte offsets; the dangling byte is kept for the
+    next frame.
+    """
+
+    def __init__(self, source: str, target: str):
+        self.source = source
+        self.target = target
+        self.passthrough = source == target
+        self.source_encoding, source_rate = parse_audio_format(source)
+        self.target_encoding, target_rate = parse_audio_format(target)
+        self.resampler: Optional[StreamingResampler] = None
+        if source_rate != target_rate:
+            self.resampler = StreamingResampler(source_rate, target_rate)
+        self.pending = b""
+
+    def reset(self):
+        self.pending = b""
+        if self.resampler is not None:
+            self.resampler.reset()
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """Decode a frame in the source format to PCM16 at the source rate"""
+        if self.source_encoding == "ulaw":
+            return ulaw_to_pcm16(data)
+        if self.source_encoding == "alaw":
+            return alaw_to_pcm16(data)
+        if self.pending:
+            data = self.pending + data
+        usable = len(data) & ~1
+        self.pending = data[usable:]
+        return np.frombuffer(data, dtype="<i2", count=usable // 2)
+
+    def encode(self, samples: np.ndarray) -> bytes:
+        if self.target_encoding == "ulaw":
+            return pcm16_to_ulaw(samples)
+        if self.target_encoding == "alaw":
+            return pcm16_to_alaw(samples)
+        return np.asarray(samples, dtype="<i2").tobytes()
+
+    def convert(self, data: bytes) -> bytes:
+        if self.passthrough:
+            return data
+        samples = self.decode(data)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        return self.encode(samples)
@@ -0,0 +1,334 @@
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .task_pools import run_task
+from .voice_activity import VAD_FRAME_MS, detect_speech, speech_segments
+
+logger = logging.getLogger(__name__)
+
+# Container formats the Whisper API accepts as-is. Whisper's "mpeg" means MPEG
+# audio, which sniffs as mp3; a sniffed "mpeg" is an MPEG program stream and
+# has to be transcoded.
+WHISPER_FORMATS = {"flac", "m4a", "mp3", "mp4", "ogg", "wav", "webm"}
+
+# ISO-BMFF containers may keep their moov atom at the end of the file, which
+# ffmpeg can't demux from a pipe, so they are given to it as a file instead
+SEEKABLE_INPUT_FORMATS = {"3gp", "m4a", "mov", "mp4"}
+
+# Bytes needed from the start of a file to recognise its format
+SNIFF_BYTES = 64
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+PIPE_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = int(os.getenv("AUDIO_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+
+# Speech profile: what Whisper needs for speech and nothing more
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_BITRATE = os.getenv("AUDIO_SPEECH_BITRATE", "32k")
+# Silences longer than this are trimmed, keeping SPEECH_TRIM_PADDING_MS around the speech
+SPEECH_TRIM_MIN_SILENCE_MS = int(os.getenv("AUDIO_SPEECH_TRIM_MIN_SILENCE_MS", "1000"))
+SPEECH_TRIM_PADDING_MS = int(os.getenv("AUDIO_SPEECH_TRIM_PADDING_MS", "200"))
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    Detect an audio container format from its magic bytes
+
+    Args:
+        header (bytes): The first bytes of the file (SNIFF_BYTES is enough)
+
+    Returns:
+        str: A short format name such as "mp3" or "wav", or None if unknown
+    """
+    if len(header) < 4:
+        return None
+    if header.startswith(b"ID3"):
+        return "mp3"
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        # Matroska family - only the webm doctype is accepted by Whisper
+        return "webm" if b"webm" in header else "mkv"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand.startswith(b"3g"):
+            return "3gp"
+        if brand in (b"qt  ",):
+            return "mov"
+        if brand in (b"M4A ", b"M4B ", b"M4P "):
+            return "m4a"
+        return "mp4"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header.startswith(b"#!AMR"):
+        return "amr"
+    if header[:4] == b"caff":
+        return "caf"
+    if header[:4] in (b"\x00\x00\x01\xba", b"\x00\x00\x01\xb3"):
+        return "mpeg"
+    if header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        # MPEG audio frame sync - layer bits of 00 mean ADTS AAC instead of MP3
+        if (header[1] & 0x06) == 0:
+            return "aac"
+        return "mp3"
+    return None
+
+
+class TranscodeCostEstimator:
+    """Keeps a moving average of how long transcoding takes per megabyte"""
+
+    def __init__(self, initial_seconds_per_mb: float, smoothing: float = 0.2):
+        self.seconds_per_mb = initial_seconds_per_mb
+        self.smoothing = smoothing
+
+    def record(self, size_bytes: int, seconds: float):
+        if size_bytes <= 0:
+            return
+        observed = seconds / (size_bytes / (1024 * 1024))
+        self.seconds_per_mb += self.smoothing * (observed - self.seconds_per_mb)
+
+    def estimate(self, size_bytes: int) -> float:
+        return self.seconds_per_mb * size_bytes / (1024 * 1024)
+
+
+transcode_cost = TranscodeCostEstimator(float(os.getenv("AUDIO_TRANSCODE_SECONDS_PER_MB", "0.5")))
+
+
+def copy_to_path(audio_file, path):
+    """Copy a binary file object to a path on disk, from its current position"""
+    with open(path, "wb") as target:
+        shutil.copyfileobj(audio_file, target, 1024 * 1024)
+
+
+@contextlib.asynccontextmanager
+async def ffmpeg_input(audio_file):
+    """
+    Choose how to give audio to ffmpeg
+
+    Most formats are streamed through stdin. Formats that need seeking are
+    copied to a temporary file first, which is removed on exit.
+
+    Args:
+        audio_file: Binary file object with the source audio
+
+    Yields:
+        tuple: (value for ffmpeg's "-i", file to stream into stdin or None)
+    """
+    audio_file.seek(0)
+    audio_format = sniff_audio_format(audio_file.read(SNIFF_BYTES))
+    audio_file.seek(0)
+    if audio_format not in SEEKABLE_INPUT_FORMATS:
+        yield "pipe:0", audio_file
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, f"source_audio.{audio_format}")
+        await run_task("audio", copy_to_path, audio_file, path)
+        yield path, None
+
+
+async def run_ffmpeg(args, input_file=None, output=None):
+    """
+    Run ffmpeg with its output streamed from stdout into a spooled temporary file
+
+    Args:
+        args (list): ffmpeg arguments, without the binary; output must go to pipe:1
+        input_file: Binary file object to stream into stdin (for "-i pipe:0")
+        output: Binary file object to write to instead of a new spooled file
+
+    Returns:
+        tuple: (output file positioned at the start, bytes fed to stdin)
+    """
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY, *args,
+        stdin=asyncio.subprocess.PIPE if input_file is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    input_size = 0
+
+    async def feed_input():
+        nonlocal input_size
+        if input_file is None:
+            return
+        try:
+            while True:
+                chunk = input_file.read(PIPE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                input_size += len(chunk)
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg stopped reading, the exit code tells us why
+            pass
+        finally:
+            process.stdin.close()
+
+    async def read_output():
+        while True:
+            chunk = await process.stdout.read(PIPE_CHUNK_SIZE)
+            if not chunk:
+                break
+            output.write(chunk)
+
+    try:
+        _, _, stderr = await asyncio.gather(feed_input(), read_output(), process.stderr.read())
+        return_code = await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+        output.close()
+        raise
+
+    if return_code != 0 or output.tell() == 0:
+        output.close()
+        raise RuntimeError(f"ffmpeg exited with code {return_code}: {stderr.decode(errors='replace').strip()}")
+
+    output.seek(0)
+    return output, input_size
+
+
+async def transcode_to_mp3(audio_file, output_args=None):
+    """
+    Transcode audio to MP3 by streaming it through an ffmpeg pipe
+
+    The input is fed to ffmpeg's stdin and the output is read from its
+    stdout into a spooled temporary file, so no intermediate copies are
+    written to disk. MP4-family input is the exception, see ffmpeg_input.
+
+    Args:
+        audio_file: Binary file object with the source audio
+        output_args (list, optional): Extra ffmpeg output arguments
+
+    Returns:
+        SpooledTemporaryFile: The MP3 audio, positioned at the start
+    """
+    start = time.perf_counter()
+    input_size = audio_file.seek(0, os.SEEK_END)
+    async with ffmpeg_input(audio_file) as (source, stdin_file):
+        args = ["-hide_banner", "-loglevel", "error", "-i", source, "-vn"]
+        args += list(output_args or [])
+        args += ["-f", "mp3", "pipe:1"]
+        output, _ = await run_ffmpeg(args, input_file=stdin_file)
+
+    elapsed = time.perf_counter() - start
+    transcode_cost.record(input_size, elapsed)
+    output_size = output.seek(0, os.SEEK_END)
+    output.seek(0)
+    logger.info(f"Transcoded {input_size} bytes to {output_size} bytes of MP3 in {elapsed:.2f}s")
+    return output
+
+
+class _SegmentReader:
+    """File-like reader over selected sample ranges of a PCM16 array"""
+
+    def __init__(self, samples: np.ndarray, ranges: List[Tuple[int, int]]):
+        self.samples = samples
+        self.ranges = list(ranges)
+        self.index = 0
+        self.position = ranges[0][0] if ranges else 0
+
+    def read(self, size: int) -> bytes:
+        sample_count = max(size // 2, 1)
+        while self.index < len(self.ranges):
+            _, end = self.ranges[self.index]
+            if self.position < end:
+                stop = min(self.position + sample_count, end)
+                chunk = self.samples[self.position:stop].tobytes()
+                self.position = stop
+                return chunk
+            self.index += 1
+            if self.index < len(self.ranges):
+                self.position = self.ranges[self.index][0]
+        return b""
+
+
+def _speech_ranges(samples: np.ndarray) -> List[Tuple[int, int]]:
+    """Find the sample ranges to keep once long silences are cut"""
+    total_samples = len(samples)
+    frame_length = SPEECH_SAMPLE_RATE * VAD_FRAME_MS // 1000
+    speech = detect_speech(samples, SPEECH_SAMPLE_RATE)
+    segments = speech_segments(speech, min_silence_ms=SPEECH_TRIM_MIN_SILENCE_MS, padding_ms=SPEECH_TRIM_PADDING_MS)
+    if not segments:
+        return [(0, total_samples)]
+    ranges = [
+        (start_frame * frame_length, min(end_frame * frame_length, total_samples))
+        for start_frame, end_frame in segments
+    ]
+    # A trailing partial frame belongs to the last segment if it reaches the end
+    if segments[-1][1] == len(speech):
+        ranges[-1] = (ranges[-1][0], total_samples)
+    return ranges
+
+
+async def encode_speech_profile(audio_file, trim_silence: bool = True) -> Tuple[object, Dict]:
+    """
+    Re-encode audio as small speech-quality MP3 for transcription
+
+    The audio is decoded to 16 kHz mono PCM, long silences are found with
+    energy-based voice activity detection and cut out, and the rest is
+    encoded as low-bitrate MP3.
+
+    Args:
+        audio_file: Binary file object with the source audio
+        trim_silence (bool): Cut silences longer than SPEECH_TRIM_MIN_SILENCE_MS
+
+    Returns:
+        tuple: (SpooledTemporaryFile with the MP3, stats dict)
+    """
+    start = time.perf_counter()
+    input_size = audio_file.seek(0, os.SEEK_END)
+    # Decoded PCM goes to an unnamed temp file so it can be memory-mapped instead of read into memory
+    with tempfile.TemporaryFile() as pcm_file:
+        async with ffmpeg_input(audio_file) as (source, stdin_file):
+            await run_ffmpeg([
+                "-hide_banner", "-loglevel", "error", "-i", source, "-vn",
+                "-ac", "1", "-ar", str(SPEECH_SAMPLE_RATE), "-f", "s16le", "pipe:1",
+            ], input_file=stdin_file, output=pcm_file)
+        decode_seconds = time.perf_counter() - start
+        transcode_cost.record(input_size, decode_seconds)
+
+        pcm_file.flush()
+        samples = np.memmap(pcm_file, dtype="<i2", mode="r")
+        total_samples = len(samples)
+
+        ranges = [(0, total_samples)]
+        if trim_silence:
+            # Voice activity detection is CPU-bound, keep it off the event loop
+            ranges = await run_task("audio", _speech_ranges, samples)
+        kept_samples = sum(end - begin for begin, end in ranges)
+
+        output, _ = await run_ffmpeg([
+            "-hide_banner", "-loglevel", "error",
+            "-f", "s16le", "-ac", "1", "-ar", str(SPEECH_SAMPLE_RATE), "-i", "pipe:0",
+            "-b:a", SPEECH_BITRATE, "-f", "mp3", "pipe:1",
+        ], input_file=_SegmentReader(samples, ranges))
+        del samples
+
+    output_size = output.seek(0, os.SEEK_END)
+    output.seek(0)
+    elapsed = time.perf_counter() - start
+    stats = {
+        "audio_seconds": round(total_samples / SPEECH_SAMPLE_RATE, 3),
+        "speech_seconds": round(kept_samples / SPEECH_SAMPLE_RATE, 3),
+        "trimmed_seconds": round((total_samples - kept_samples) / SPEECH_SAMPLE_RATE, 3),
+        "segments": len(ranges),
+        "encode_seconds": round(elapsed, 3),
+    }
+    logger.info(
+        f"Encoded {input_size} bytes to {output_size} bytes of speech MP3 in {elapsed:.2f}s, "
+        f"trimmed {stats['trimmed_seconds']}s of {stats['audio_seconds']}s"
+    )
+    return output, stats
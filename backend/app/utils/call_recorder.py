@@ -0,0 +1,257 @@
+import os
+import mmap
+import asyncio
+import time
+import wave
+import struct
+import logging
+import tempfile
+from typing import Dict, Optional, Set
+import numpy as np
+from .audio_codec import ULAW_TO_PCM16
+
+logger = logging.getLogger(__name__)
+
+RECORDING_ENABLED = os.getenv("CALL_RECORDING_ENABLED", "false").lower() == "true"
+RECORDING_DIR = os.getenv("CALL_RECORDING_DIR", os.path.join(tempfile.gettempdir(), "call_recordings"))
+# Sized for this many seconds of call audio in both directions; older audio is overwritten
+RECORDING_MAX_SECONDS = int(os.getenv("CALL_RECORDING_MAX_SECONDS", "1800"))
+RECORDING_RETENTION_SECONDS = int(os.getenv("CALL_RECORDING_RETENTION_SECONDS", str(24 * 3600)))
+# Disk space all recordings together may use; the oldest finished ones are deleted beyond it
+RECORDING_MAX_TOTAL_BYTES = int(os.getenv("CALL_RECORDING_MAX_TOTAL_BYTES", str(2 * 1024 ** 3)))
+SPOOL_MAX_MEMORY = int(os.getenv("AUDIO_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+
+SAMPLE_RATE = 8000
+INBOUND = 0
+OUTBOUND = 1
+
+# File layout: header, then the frame index ring, then the audio ring.
+#   header: magic, version, audio capacity, index capacity, audio bytes written,
+#           frames written, recording start (unix time)
+#   index entry: seconds since start, absolute audio position, length, direction
+HEADER = struct.Struct("<4sHxxQQQQd")
+INDEX_ENTRY = struct.Struct("<dQIB3x")
+MAGIC = b"CREC"
+VERSION = 1
+HEADER_SIZE = 64
+# Frames per second of audio budgeted in the index: 50 inbound plus agent chunks, which are larger
+INDEX_FRAMES_PER_SECOND = 100
+
+INDEX_DTYPE = np.dtype([("at", "<f8"), ("position", "<u8"), ("length", "<u4"), ("direction", "u1"), ("pad", "V3")])
+
+
+def recording_path(call_sid: str) -> str:
+    return os.path.join(RECORDING_DIR, f"{call_sid}.rec")
+
+
+# Recordings still being written, which pruning leaves alone
+_open_recordings: Set[str] = set()
+
+
+def prune_recordings(retention_seconds: int = RECORDING_RETENTION_SECONDS,
+                     max_total_bytes: int = RECORDING_MAX_TOTAL_BYTES):
+    """
+    Delete recordings older than the retention period, then the oldest
+    finished ones until the directory uses no more than max_total_bytes
+    """
+    cutoff = time.time() - retention_seconds
+    try:
+        entries = [entry for entry in os.scandir(RECORDING_DIR) if entry.name.endswith(".rec")]
+    except FileNotFoundError:
+        return
+    kept = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+            if entry.path in _open_recordings:
+                kept.append((float("inf"), stat.st_blocks * 512, entry.path))
+            elif stat.st_mtime < cutoff:
+                os.unlink(entry.path)
+            else:
+                kept.append((stat.st_mtime, stat.st_blocks * 512, entry.path))
+        except OSError as e:
+            logger.warning(f"Could not prune recording {entry.path}: {str(e)}")
+
+    # Files are sparse, so count the blocks actually used rather than their length
+    total = sum(used for _, used, _ in kept)
+    for mtime, used, path in sorted(kept):
+        if total <= max_total_bytes or mtime == float("inf"):
+            break
+        try:
+            os.unlink(path)
+            total -= used
+        except OSError as e:
+            logger.warning(f"Could not prune recording {path}: {str(e)}")
+
+
+class CallRecorder:
+    """
+    Ring-buffer recording of a call's mu-law audio in a memory-mapped file
+
+    Frames are copied straight from the received bytes into the mapping
+    and indexed with their timestamps, so recording costs one memcpy and
+    one struct write per frame. Both directions are written from the
+    event loop (inbound frames as they arrive, outbound as they are sent
+    to Twilio), so no lock is needed. When the ring is full the oldest
+    audio is overwritten.
+
+    The file is sparse: its length covers the whole ring but disk blocks
+    are only allocated as audio is written, so a call uses about 16 KB of
+    disk per second rather than the full ring up front.
+    """
+
+    def __init__(self, call_sid: str, max_seconds: int = RECORDING_MAX_SECONDS):
+        os.makedirs(RECORDING_DIR, mode=0o700, exist_ok=True)
+        self.call_sid = call_sid
+        self.path = recording_path(call_sid)
+        self.audio_capacity = max_seconds * SAMPLE_RATE * 2
+        self.index_capacity = max_seconds * INDEX_FRAMES_PER_SECOND
+        self.index_offset = HEADER_SIZE
+        self.audio_offset = HEADER_SIZE + self.index_capacity * INDEX_ENTRY.size
+        size = self.audio_offset + self.audio_capacity
+
+        # Call audio: readable by this user only
+        self.file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600), "w+b")
+        self.file.truncate(size)
+        _open_recordings.add(self.path)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.started = time.monotonic()
+        self.audio_written = 0
+        self.frames_written = 0
+        # Agent audio reaches Twilio faster than real time, so outbound frames are
+        # stamped with when they will play rather than when they were sent
+        self.playout_at = 0.0
+        self.closed = False
+        self._write_header(time.time())
+
+    def _write_header(self, started_at: float):
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.audio_capacity, self.index_capacity,
+                         self.audio_written, self.frames_written, started_at)
+
+    def _append(self, frame: bytes, at: float, direction: int):
+        length = len(frame)
+        if self.closed or not length or length > self.audio_capacity:
+            return
+        start = self.audio_written % self.audio_capacity
+        first = min(length, self.audio_capacity - start)
+        base = self.audio_offset + start
+        self.map[base:base + first] = frame if first == length else memoryview(frame)[:first]
+        if first < length:
+            self.map[self.audio_offset:self.audio_offset + length - first] = memoryview(frame)[first:]
+
+        slot = self.frames_written % self.index_capacity
+        INDEX_ENTRY.pack_into(self.map, self.index_offset + slot * INDEX_ENTRY.size,
+                              at, self.audio_written, length, direction)
+        self.audio_written += length
+        self.frames_written += 1
+        # Only the two counters change; the format fields stay as written
+        struct.pack_into("<QQ", self.map, 24, self.audio_written, self.frames_written)
+
+    def inbound(self, frame: bytes):
+        """Record a caller frame as it arrives"""
+        self._append(frame, time.monotonic() - self.started, INBOUND)
+
+    def outbound(self, frame: bytes):
+        """Record an agent frame sent to Twilio, at the time it will play"""
+        now = time.monotonic() - self.started
+        at = max(now, self.playout_at)
+        self.playout_at = at + len(frame) / SAMPLE_RATE
+        self._append(frame, at, OUTBOUND)
+
+    def clear(self):
+        """Twilio dropped its buffered agent audio; the next agent frame plays immediately"""
+        self.playout_at = time.monotonic() - self.started
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        _open_recordings.discard(self.path)
+        logger.info(f"Recorded {self.frames_written} frames ({self.audio_written} bytes) for call {self.call_sid}")
+        # Keep a long-running worker within the retention period and the disk budget
+        try:
+            asyncio.get_running_loop().run_in_executor(None, prune_recordings)
+        except RuntimeError:
+            prune_recordings()
+
+
+def _read_recording(path: str) -> np.ndarray:
+    """Mix a recording's two directions into one PCM16 timeline"""
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, audio_capacity, index_capacity, audio_written, frames_written, _ = \
+                HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a call recording")
+            audio_offset = HEADER_SIZE + index_capacity * INDEX_ENTRY.size
+            index = np.frombuffer(mapped, dtype=INDEX_DTYPE, count=min(frames_written, index_capacity),
+                                  offset=HEADER_SIZE)
+            audio = np.frombuffer(mapped, dtype=np.uint8, count=audio_capacity, offset=audio_offset)
+
+            # Keep only frames whose audio hasn't been overwritten yet, in the order they were written
+            index = np.sort(index[index["position"] >= max(audio_written - audio_capacity, 0)], order="position")
+            if len(index) == 0:
+                del audio
+                return np.zeros(0, dtype=np.int16)
+            starts = np.rint(index["at"] * SAMPLE_RATE).astype(np.int64)
+            first = starts.min()
+            starts -= first
+            total = int((starts + index["length"]).max())
+
+            tracks = np.zeros((2, total), dtype=np.int32)
+            for start, position, length, direction in zip(starts, index["position"], index["length"],
+                                                          index["direction"]):
+                begin = int(position) % audio_capacity
+                end = begin + int(length)
+                if end <= audio_capacity:
+                    samples = ULAW_TO_PCM16[audio[begin:end]]
+                else:
+                    samples = ULAW_TO_PCM16[np.concatenate((audio[begin:], audio[:end - audio_capacity]))]
+                # Later agent audio replaces audio cut short by an interruption, so assign rather than add
+                tracks[direction, start:start + len(samples)] = samples
+            del audio, index
+    return np.clip(tracks.sum(axis=0), -32768, 32767).astype(np.int16)
+
+
+def render_recording_wav(path: str):
+    """
+    Render a call recording as a mono 8 kHz WAV file
+
+    Args:
+        path (str): Recording file written by CallRecorder
+
+    Returns:
+        SpooledTemporaryFile: The WAV audio, positioned at the start
+    """
+    samples = _read_recording(path)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    output.seek(0)
+    return output
+
+
+def recording_stats(path: str) -> Optional[Dict]:
+    """Header fields of a recording, or None if there is none"""
+    try:
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, version, audio_capacity, _, audio_written, frames_written, started_at = HEADER.unpack(header)
+    if magic != MAGIC:
+        return None
+    return {
+        "frames": frames_written,
+        "bytes": audio_written,
+        "seconds_kept": round(min(audio_written, audio_capacity) / SAMPLE_RATE, 1),
+        "started_at": started_at,
+    }
@@ -0,0 +1,163 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from .metrics import RollingQuantiles, registry
+
+logger = logging.getLogger(__name__)
+
+# Call setup stages, in the order they normally happen
+STAGES = (
+    "call_initiated",         # POST /api/twilio/call returning
+    "voice_webhook",          # Twilio fetching TwiML from /voice
+    "websocket_accepted",     # Media stream WebSocket accepted
+    "stream_start",           # Twilio "start" event on the media stream
+    "session_started",        # conversation.start_session() returned
+    "first_inbound_media",    # First caller audio frame from Twilio
+    "first_outbound_audio",   # First agent audio frame sent to Twilio
+)
+# Spans summarised across calls, as (from stage, to stage)
+SPANS = {
+    "ringing": ("call_initiated", "voice_webhook"),
+    "answer_to_stream": ("voice_webhook", "stream_start"),
+    "time_to_first_audio": ("stream_start", "first_outbound_audio"),
+    "answer_to_first_audio": ("voice_webhook", "first_outbound_audio"),
+}
+TRACE_HISTORY = int(os.getenv("CALL_TRACE_HISTORY", "500"))
+MAX_ACTIVE_TRACES = int(os.getenv("CALL_TRACE_MAX_ACTIVE", "2000"))
+SUMMARY_WINDOW = int(os.getenv("CALL_TRACE_SUMMARY_WINDOW", "1000"))
+
+STAGE_GAP = registry.histogram(
+    "call_stage_gap_seconds",
+    "Time from the previous call setup stage to this one, by stage",
+    ["stage"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+SETUP_SPAN = registry.histogram(
+    "call_setup_span_seconds",
+    "Duration of call setup spans, by span",
+    ["span"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+class CallTrace:
+    """Monotonic timestamps of the setup stages of one call"""
+
+    def __init__(self, call_sid: str):
+        self.call_sid = call_sid
+        self.started_at = time.time()
+        self.marks: Dict[str, float] = {}
+
+    def ordered(self) -> List[tuple]:
+        return sorted(self.marks.items(), key=lambda mark: mark[1])
+
+    def gaps(self) -> List[tuple]:
+        """(stage, seconds since the previous stage) in the order the stages happened"""
+        ordered = self.ordered()
+        return [(stage, at - ordered[i - 1][1]) for i, (stage, at) in enumerate(ordered) if i > 0]
+
+    def spans(self) -> Dict[str, float]:
+        return {
+            name: self.marks[end] - self.marks[start]
+            for name, (start, end) in SPANS.items()
+            if start in self.marks and end in self.marks
+        }
+
+    def breakdown(self) -> Dict[str, Any]:
+        ordered = self.ordered()
+        first = ordered[0][1] if ordered else 0.0
+        gaps = dict(self.gaps())
+        return {
+            "call_sid": self.call_sid,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "stages": [
+                {
+                    "stage": stage,
+                    "offset_ms": round((at - first) * 1000, 1),
+                    "gap_ms": round(gaps[stage] * 1000, 1) if stage in gaps else None,
+                }
+                for stage, at in ordered
+            ],
+            "spans_ms": {name: round(seconds * 1000, 1) for name, seconds in self.spans().items()},
+        }
+
+
+class CallTracer:
+    """
+    Per-call setup stage timestamps, keyed by Twilio Call SID
+
+    Stages are stamped as they happen; when the call finishes its stage
+    gaps and spans are added to the fleet-wide histograms and rolling
+    percentiles, and the breakdown is kept for the last TRACE_HISTORY calls.
+    """
+
+    def __init__(self, history: int = TRACE_HISTORY, max_active: int = MAX_ACTIVE_TRACES,
+                 window: int = SUMMARY_WINDOW):
+        self.history = history
+        self.max_active = max_active
+        self.active: "OrderedDict[str, CallTrace]" = OrderedDict()
+        self.completed: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stage_gaps = {stage: RollingQuantiles(window) for stage in STAGES}
+        self.spans = {name: RollingQuantiles(window) for name in SPANS}
+
+    def mark(self, call_sid: Optional[str], stage: str, at: Optional[float] = None):
+        """
+        Stamp a setup stage for a call; only the first stamp of each stage counts
+
+        Args:
+            call_sid (str): Twilio Call SID, calls without one are ignored
+            stage (str): One of STAGES
+            at (float, optional): time.monotonic() of the stage, defaults to now
+        """
+        if not call_sid:
+            return
+        trace = self.active.get(call_sid)
+        if trace is None:
+            if call_sid in self.completed:
+                return
+            trace = self.active[call_sid] = CallTrace(call_sid)
+            while len(self.active) > self.max_active:
+                # Calls whose end we never saw
+                self.finish(next(iter(self.active)))
+        trace.marks.setdefault(stage, time.monotonic() if at is None else at)
+
+    def finish(self, call_sid: Optional[str]):
+        """Summarise a call's stages and move it to the history"""
+        trace = self.active.pop(call_sid, None) if call_sid else None
+        if trace is None:
+            return
+        for stage, seconds in trace.gaps():
+            self.stage_gaps[stage].add(seconds * 1000)
+            STAGE_GAP.labels(stage).observe(seconds)
+        for name, seconds in trace.spans().items():
+            self.spans[name].add(seconds * 1000)
+            SETUP_SPAN.labels(name).observe(seconds)
+        breakdown = trace.breakdown()
+        self.completed[call_sid] = breakdown
+        while len(self.completed) > self.history:
+            self.completed.popitem(last=False)
+        logger.info(f"Call {call_sid} setup: " + ", ".join(
+            f"{stage['stage']} +{stage['gap_ms']}ms" for stage in breakdown["stages"] if stage["gap_ms"] is not None
+        ))
+
+    def get(self, call_sid: str) -> Optional[Dict[str, Any]]:
+        """Get the stage breakdown of an active or recently finished call"""
+        trace = self.active.get(call_sid)
+        if trace is not None:
+            return {**trace.breakdown(), "finished": False}
+        breakdown = self.completed.get(call_sid)
+        return {**breakdown, "finished": True} if breakdown is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self.active),
+            "completed": len(self.completed),
+            "stage_gaps_ms": {stage: quantiles.snapshot() for stage, quantiles in self.stage_gaps.items()},
+            "spans_ms": {name: quantiles.snapshot() for name, quantiles in self.spans.items()},
+        }
+
+
+call_tracer = CallTracer()
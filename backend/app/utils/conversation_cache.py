@@ -0,0 +1,229 @@
+import os
+import json
+import zlib
+import asyncio
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".cache", "conversations"
+)
+CACHE_DIR = os.getenv("CONVERSATION_CACHE_DIR", DEFAULT_CACHE_DIR)
+MEMORY_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+DISK_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+COMPRESSION_LEVEL = 6
+
+# Conversation statuses after which ElevenLabs never changes the conversation again
+FINAL_STATUSES = {"done", "failed"}
+
+CACHE_LOOKUPS = registry.counter(
+    "conversation_cache_lookups_total",
+    "Conversation detail lookups by where they were served from",
+    ["result"],
+)
+
+
+def is_final(conversation: Dict[str, Any]) -> bool:
+    """Check whether a conversation has finished and can be cached forever"""
+    return isinstance(conversation, dict) and conversation.get("status") in FINAL_STATUSES
+
+
+class ConversationCache:
+    """
+    Two-tier cache for finished ElevenLabs conversations
+
+    The memory tier is an LRU of the raw JSON, bounded in bytes. Behind
+    it is an on-disk store of zlib-compressed JSON, one file per
+    conversation, also bounded in bytes with least recently used files
+    removed first. Every hit is decoded into a fresh dict, so callers can
+    modify what they get back. Concurrent lookups of the same uncached
+    conversation share a single upstream fetch.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, memory_max_bytes: int = MEMORY_MAX_BYTES,
+                 disk_max_bytes: int = DISK_MAX_BYTES):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_bytes = 0
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.counts = {"memory": 0, "disk": 0, "miss": 0, "coalesced": 0, "uncacheable": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        # Conversation IDs become file names, keep them to safe characters
+        return "".join(c if c.isalnum() or c in "-_" else "_" for c in conversation_id)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.z")
+
+    def _load(self):
+        """Rebuild the disk LRU order from file modification times"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.z"):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name[:-len(".json.z")], stat.st_size))
+        for _, conversation_id, size in sorted(found):
+            self.disk[conversation_id] = size
+            self.disk_bytes += size
+        logger.info(f"Conversation cache loaded: {len(self.disk)} conversations, {self.disk_bytes} bytes on disk")
+
+    def _count(self, result: str):
+        self.counts[result] += 1
+        CACHE_LOOKUPS.labels(result).inc()
+
+    def _remember(self, conversation_id: str, raw: bytes):
+        self.memory_bytes -= len(self.memory.pop(conversation_id, b""))
+        self.memory[conversation_id] = raw
+        self.memory_bytes += len(raw)
+        while self.memory_bytes > self.memory_max_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _read_disk(self, conversation_id: str) -> Optional[bytes]:
+        key = self._key(conversation_id)
+        if key not in self.disk:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                raw = zlib.decompress(f.read())
+            os.utime(path)
+        except (OSError, zlib.error) as e:
+            logger.warning(f"Dropping unreadable cached conversation {conversation_id}: {str(e)}")
+            self.disk_bytes -= self.disk.pop(key)
+            return None
+        self.disk.move_to_end(key)
+        return raw
+
+    def _write_disk(self, conversation_id: str, raw: bytes):
+        key = self._key(conversation_id)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        # Write to a temp file and rename so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.disk_bytes -= self.disk.pop(key, 0)
+        self.disk[key] = len(data)
+        self.disk_bytes += len(data)
+        while self.disk_bytes > self.disk_max_bytes and len(self.disk) > 1:
+            evicted_key, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            try:
+                os.remove(self._path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Get a cached conversation from memory or disk, or None"""
+        raw = self.memory.get(conversation_id)
+        if raw is not None:
+            self.memory.move_to_end(conversation_id)
+            self._count("memory")
+            return json.loads(raw)
+        raw = self._read_disk(conversation_id)
+        if raw is not None:
+            self._remember(conversation_id, raw)
+            self._count("disk")
+            return json.loads(raw)
+        return None
+
+    def put(self, conversation_id: str, conversation: Dict[str, Any]):
+        """Store a finished conversation in both tiers"""
+        raw = json.dumps(conversation, separators=(",", ":")).encode("utf-8")
+        self._remember(conversation_id, raw)
+        try:
+            self._write_disk(conversation_id, raw)
+        except OSError as e:
+            logger.warning(f"Could not write conversation {conversation_id} to disk: {str(e)}")
+
+    async def get_or_fetch(self, conversation_id: str,
+                           fetch: Callable[[str], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Get a conversation from the cache, or fetch it once for all concurrent callers
+
+        Only finished conversations (status "done" or "failed") are cached.
+
+        Args:
+            conversation_id (str): The conversation ID
+            fetch (callable): Coroutine function that fetches the conversation upstream
+        """
+        while True:
+            cached = self.get(conversation_id)
+            if cached is not None:
+                return cached
+
+            pending = self.in_flight.get(conversation_id)
+            if pending is None:
+                break
+            self._count("coalesced")
+            try:
+                conversation = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only our own cancellation propagates; if the leading caller
+                # was cancelled, look again and fetch ourselves if nobody is
+                if not pending.cancelled():
+                    raise
+                continue
+            return json.loads(json.dumps(conversation))
+
+        self._count("miss")
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[conversation_id] = future
+        try:
+            conversation = await fetch(conversation_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            if is_final(conversation):
+                self.put(conversation_id, conversation)
+            else:
+                self.counts["uncacheable"] += 1
+            future.set_result(conversation)
+            return conversation
+        finally:
+            self.in_flight.pop(conversation_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counts["memory"] + self.counts["disk"] + self.counts["miss"] + self.counts["coalesced"]
+        return {
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_entries": len(self.disk),
+            "disk_bytes": self.disk_bytes,
+            "in_flight": len(self.in_flight),
+            **self.counts,
+            "hit_ratio": (self.counts["memory"] + self.counts["disk"]) / lookups if lookups else None,
+        }
+
+
+_cache: Optional[ConversationCache] = None
+
+
+def get_conversation_cache() -> ConversationCache:
+    """Get the process-wide conversation cache"""
+    global _cache
+    if _cache is None:
+        _cache = ConversationCache()
+    return _cache
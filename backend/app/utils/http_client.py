@@ -0,0 +1,34 @@
+import asyncio
+import logging
+from typing import Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# One ClientSession per process so connections are pooled and reused
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Get the shared aiohttp session, creating it on first use"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, connect=10, sock_read=60),
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+        )
+        _session_loop = loop
+        logger.info("Shared HTTP session created")
+    return _session
+
+
+async def close_http_session():
+    """Close the shared aiohttp session"""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Shared HTTP session closed")
+    _session = None
+    _session_loop = None
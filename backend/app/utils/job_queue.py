@@ -0,0 +1,111 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_DEPTH = registry.gauge(
+    "job_queue_depth",
+    "Jobs waiting in background job queues, by queue",
+    ["queue"],
+    callback=lambda: (((queue.name,), queue.queue.qsize() if queue.queue else 0) for queue in _queues),
+)
+JOB_RESULTS = registry.counter(
+    "job_queue_jobs_total",
+    "Background jobs by queue and outcome",
+    ["queue", "outcome"],
+)
+JOB_DURATION = registry.histogram(
+    "job_queue_job_seconds",
+    "Time background jobs took to run, by queue",
+    ["queue"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+_queues: List["JobQueue"] = []
+
+
+class JobQueue:
+    """
+    Bounded in-process queue drained by a fixed number of worker tasks
+
+    Used to take slow follow-up work off request paths: submit() never
+    blocks, and a failing job is logged without stopping its worker.
+    """
+
+    def __init__(self, name: str, handler: Callable[..., Awaitable[Any]], workers: int = 4,
+                 max_size: int = 1000):
+        self.name = name
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.max_size = max_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.counts = {"submitted": 0, "succeeded": 0, "failed": 0, "dropped": 0}
+        _queues.append(self)
+
+    def start(self):
+        """Start the workers on the running loop"""
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_size)
+            loop = asyncio.get_running_loop()
+            self.tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, *args) -> bool:
+        """
+        Queue a job for the handler
+
+        Returns:
+            bool: False if the queue was full and the job was dropped
+        """
+        self.start()
+        try:
+            self.queue.put_nowait(args)
+        except asyncio.QueueFull:
+            self.counts["dropped"] += 1
+            JOB_RESULTS.labels(self.name, "dropped").inc()
+            logger.error(f"Job queue {self.name} is full, dropping job {args}")
+            return False
+        self.counts["submitted"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            args = await self.queue.get()
+            started = time.monotonic()
+            try:
+                await self.handler(*args)
+                self.counts["succeeded"] += 1
+                JOB_RESULTS.labels(self.name, "succeeded").inc()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counts["failed"] += 1
+                JOB_RESULTS.labels(self.name, "failed").inc()
+                logger.exception(f"Job {args} in queue {self.name} failed: {str(e)}")
+            finally:
+                JOB_DURATION.labels(self.name).observe(time.monotonic() - started)
+                self.queue.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        """Give queued jobs up to timeout seconds to finish, then cancel the workers"""
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job queue {self.name} stopped with {self.queue.qsize()} jobs left")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue else 0,
+            **self.counts,
+        }
@@ -0,0 +1,288 @@
+import bisect
+import math
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow slot
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile from the bucket counts"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else math.inf
+        return math.inf
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {_format_value(b): c for b, c in zip(self.buckets + (math.inf,), self.counts)},
+        }
+
+
+class _Metric:
+    """Base class for labelled metrics.
+
+    Children are created once per label combination and cached, so the
+    hot path is a dict lookup plus an attribute update - no locks.
+    """
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        self._children.pop(tuple(str(v) for v in values), None)
+
+    def children(self):
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in self.children():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        return {",".join(key) or "_": child.value for key, child in self.children()}
+
+
+class _CallbackMetric(_Metric):
+    """A metric whose values can be read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        # A callback lets the value be computed at scrape time instead of on the hot path
+        self.callback = callback
+
+    def children(self):
+        if self.callback is None:
+            return super().children()
+        items = []
+        for key, value in self.callback():
+            child = self._new_child()
+            child.value = value
+            items.append((tuple(str(v) for v in key), child))
+        return items
+
+
+class Counter(_CallbackMetric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_CallbackMetric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in self.children():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        return {",".join(key) or "_": child.snapshot() for key, child in self.children()}
+
+
+class RollingQuantiles:
+    """Exact quantiles over the most recent window of samples"""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.total += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self, digits: int = 1) -> Dict:
+        if not self.samples:
+            return {"count": self.total, "window": 0, "p50": None, "p90": None, "p99": None, "max": None}
+        ordered = sorted(self.samples)
+
+        def pick(q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], digits)
+
+        return {
+            "count": self.total,
+            "window": len(ordered),
+            "p50": pick(0.5),
+            "p90": pick(0.9),
+            "p99": pick(0.99),
+            "max": round(ordered[-1], digits),
+        }
+
+
+class MetricsRegistry:
+    """Holds the process-wide metrics and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                callback=None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, callback=callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+              callback=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback=callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+# Shared registry used across the app
+registry = MetricsRegistry()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Active media streams, keyed by id() of the TwilioAudioInterface
+_active_streams: Dict[int, object] = {}
+
+# Call managers whose map sizes are exported
+_call_managers: Dict[str, object] = {}
+
+
+def register_stream(interface):
+    """Start exporting metrics for a media stream"""
+    _active_streams[id(interface)] = interface
+
+
+def unregister_stream(interface):
+    """Stop exporting metrics for a media stream"""
+    _active_streams.pop(id(interface), None)
+
+
+def register_call_manager(name: str, call_manager):
+    """Export the map sizes of a CallManager under the given name"""
+    _call_managers[name] = call_manager
+
+
+def _stream_label(interface) -> str:
+    return getattr(interface, "stream_sid", None) or f"pending-{id(interface)}"
+
+
+def _frame_counts(attribute: str):
+    """Read a frame counter from each stream; rates are left to rate() in Prometheus"""
+    for interface in list(_active_streams.values()):
+        yield (_stream_label(interface),), getattr(interface, attribute, 0)
+
+
+def _queue_depths():
+    for interface in list(_active_streams.values()):
+        output_queue = getattr(interface, "output_queue", None)
+        yield (_stream_label(interface),), output_queue.qsize() if output_queue is not None else 0
+
+
+def _suppressed_percents():
+    for interface in list(_active_streams.values()):
+        gate = getattr(interface, "silence_gate", None)
+        if gate is not None:
+            yield (_stream_label(interface),), gate.suppressed_percent()
+
+
+def _call_manager_sizes():
+    for name, call_manager in list(_call_managers.items()):
+        for map_name in ("active_calls", "call_params", "pending_params"):
+            yield (name, map_name), len(getattr(call_manager, map_name, {}))
+
+
+registry.gauge(
+    "media_streams_active",
+    "Active Twilio WebSocket media streams",
+    callback=lambda: [((), len(_active_streams))],
+)
+registry.counter(
+    "media_stream_received_frames_total",
+    "Inbound media frames received on each stream",
+    ["stream_sid"],
+    callback=lambda: _frame_counts("media_packet_count"),
+)
+registry.counter(
+    "media_stream_sent_frames_total",
+    "Outbound media frames sent on each stream",
+    ["stream_sid"],
+    callback=lambda: _frame_counts("output_packet_count"),
+)
+registry.gauge(
+    "media_stream_output_queue_depth",
+    "Audio chunks waiting in the output queue",
+    ["stream_sid"],
+    callback=_queue_depths,
+)
+registry.gauge(
+    "media_stream_inbound_suppressed_percent",
+    "Share of inbound frames the silence gate has kept from the agent so far",
+    ["stream_sid"],
+    callback=_suppressed_percents,
+)
+INBOUND_FRAMES = registry.counter(
+    "media_stream_inbound_frames_total",
+    "Inbound media frames by what the silence gate did with them",
+    ["outcome"],
+)
+SUPPRESSED_PERCENT = registry.histogram(
+    "media_stream_call_suppressed_percent",
+    "Per-call share of inbound frames suppressed by the silence gate",
+    buckets=(5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100),
+)
+STALE_FRAMES_DROPPED = registry.counter(
+    "media_stream_stale_frames_dropped_total",
+    "Agent audio chunks dropped at the sender because an interruption invalidated them",
+)
+registry.gauge(
+    "call_manager_entries",
+    "Number of entries in each CallManager map",
+    ["manager", "map"],
+    callback=_call_manager_sizes,
+)
+
+EVENT_LOOP_LAG = registry.gauge("event_loop_lag_seconds", "Most recent event loop lag measurement")
+EVENT_LOOP_LAG_HISTOGRAM = registry.histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event loop lag measurements",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed sleep"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Event loop lag monitor started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("SIGNED_URL_POOL_SIZE", "8"))
+# How long ElevenLabs signed URLs stay valid, and how close to expiry we stop handing them out
+URL_TTL_SECONDS = float(os.getenv("SIGNED_URL_TTL_SECONDS", "900"))
+EXPIRY_MARGIN_SECONDS = float(os.getenv("SIGNED_URL_EXPIRY_MARGIN_SECONDS", "60"))
+REFILL_CONCURRENCY = int(os.getenv("SIGNED_URL_REFILL_CONCURRENCY", "2"))
+MAX_BACKOFF_SECONDS = 30.0
+
+POOL_REQUESTS = registry.counter(
+    "signed_url_pool_requests_total",
+    "Signed URL requests by whether they were served from the pool",
+    ["result"],
+)
+POOL_DISCARDED = registry.counter(
+    "signed_url_pool_expired_total",
+    "Pooled signed URLs discarded because they got too close to expiry",
+)
+POOL_FETCH_LATENCY = registry.histogram(
+    "signed_url_fetch_duration_seconds",
+    "Latency of minting a signed URL upstream",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+
+
+class SignedUrlPool:
+    """
+    Pool of pre-minted signed URLs, refilled in the background
+
+    Each URL is handed out once, soonest-expiring first, and dropped when
+    it gets within expiry_margin of its expiry. When the pool is empty
+    the caller fetches a URL directly and a refill is triggered.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[str]], size: int = POOL_SIZE,
+                 ttl: float = URL_TTL_SECONDS, expiry_margin: float = EXPIRY_MARGIN_SECONDS,
+                 refill_concurrency: int = REFILL_CONCURRENCY):
+        self.fetch = fetch
+        self.size = size
+        self.ttl = ttl
+        self.expiry_margin = expiry_margin
+        self.refill_concurrency = max(refill_concurrency, 1)
+        self.entries: Deque[Tuple[str, float]] = deque()
+        self.counts = {"hit": 0, "miss": 0, "expired": 0, "fetch_errors": 0}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _usable_until(self, expires_at: float) -> float:
+        return expires_at - self.expiry_margin
+
+    def _drop_expiring(self):
+        now = time.monotonic()
+        while self.entries and self._usable_until(self.entries[0][1]) <= now:
+            self.entries.popleft()
+            self.counts["expired"] += 1
+            POOL_DISCARDED.inc()
+
+    async def _fetch_entry(self) -> Tuple[str, float]:
+        started = time.monotonic()
+        try:
+            url = await self.fetch()
+        finally:
+            POOL_FETCH_LATENCY.observe(time.monotonic() - started)
+        # Expiry is counted from when the request was sent, to stay on the safe side
+        return url, started + self.ttl
+
+    def start(self):
+        """Start the background refill task on the running loop"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._refill_loop())
+            logger.info(f"Signed URL pool started, keeping {self.size} URLs ready")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refill_loop(self):
+        backoff = 1.0
+        while True:
+            self._drop_expiring()
+            missing = self.size - len(self.entries)
+            if missing > 0:
+                results = await asyncio.gather(
+                    *(self._fetch_entry() for _ in range(min(missing, self.refill_concurrency))),
+                    return_exceptions=True
+                )
+                fetched = [result for result in results if not isinstance(result, BaseException)]
+                for result in results:
+                    if isinstance(result, BaseException):
+                        self.counts["fetch_errors"] += 1
+                        logger.warning(f"Could not mint a signed URL for the pool: {str(result)}")
+                # Keep the deque ordered by expiry
+                self.entries.extend(fetched)
+                self.entries = deque(sorted(self.entries, key=lambda entry: entry[1]))
+                if len(fetched) < len(results):
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                else:
+                    backoff = 1.0
+                continue
+
+            # Full: sleep until the oldest URL needs replacing or a URL is taken
+            timeout = max(self._usable_until(self.entries[0][1]) - time.monotonic(), 0.0) if self.entries else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def get(self) -> str:
+        """Take a signed URL from the pool, or fetch one if the pool is empty"""
+        self.start()
+        self._drop_expiring()
+        if self.entries:
+            url, _ = self.entries.popleft()
+            self.counts["hit"] += 1
+            POOL_REQUESTS.labels("hit").inc()
+            self._wakeup.set()
+            return url
+
+        self.counts["miss"] += 1
+        POOL_REQUESTS.labels("miss").inc()
+        self._wakeup.set()
+        url, _ = await self._fetch_entry()
+        return url
+
+    def stats(self) -> Dict:
+        requests = self.counts["hit"] + self.counts["miss"]
+        return {
+            "size": self.size,
+            "available": len(self.entries),
+            "occupancy": len(self.entries) / self.size if self.size else None,
+            "refilling": self._task is not None and not self._task.done(),
+            **self.counts,
+            "hit_ratio": self.counts["hit"] / requests if requests else None,
+        }
+
+
+_pools = []
+
+registry.gauge(
+    "signed_url_pool_available",
+    "Signed URLs ready in the pool",
+    callback=lambda: [((), sum(len(pool.entries) for pool in _pools))],
+)
+
+
+def create_signed_url_pool(fetch: Callable[[], Awaitable[str]], **kwargs) -> SignedUrlPool:
+    """Create a signed URL pool whose size is exported as a metric"""
+    pool = SignedUrlPool(fetch, **kwargs)
+    _pools.append(pool)
+    return pool
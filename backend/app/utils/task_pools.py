@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+THREAD_WORKERS = int(os.getenv("TASK_POOL_THREADS", "16"))
+
+TASK_POOL_RUNNING = registry.gauge(
+    "task_pool_running",
+    "Tasks currently running in the shared worker pools, by task type",
+    ["task"],
+    callback=lambda: (((name,), task.running) for name, task in task_pools.task_types.items()),
+)
+TASK_POOL_QUEUED = registry.gauge(
+    "task_pool_queued",
+    "Tasks waiting for a worker slot, by task type",
+    ["task"],
+    callback=lambda: (((name,), len(task.waiters)) for name, task in task_pools.task_types.items()),
+)
+TASK_POOL_REJECTED = registry.counter(
+    "task_pool_rejected_total",
+    "Tasks rejected because their queue was full, by task type",
+    ["task"],
+)
+TASK_POOL_WAIT = registry.histogram(
+    "task_pool_wait_seconds",
+    "Time tasks spent waiting for a worker slot, by task type",
+    ["task"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a task type already has max_queue tasks waiting"""
+
+    def __init__(self, task_name: str, queued: int):
+        super().__init__(f"Task pool '{task_name}' is saturated ({queued} tasks queued)")
+        self.task_name = task_name
+        self.queued = queued
+
+
+class TaskType:
+    """Concurrency limit and queue bound for one kind of offloaded work"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.running = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.completed = 0
+        self.rejected = 0
+
+    async def acquire(self, wait: bool = False):
+        """
+        Take a slot, queueing for one if all are busy
+
+        Args:
+            wait (bool): Queue even when max_queue tasks are already waiting,
+                for callers that bound their own concurrency and would rather
+                wait than fail
+        """
+        if self.running < self.concurrency and not self.waiters:
+            self.running += 1
+            return
+        if not wait and len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            TASK_POOL_REJECTED.labels(self.name).inc()
+            raise PoolSaturatedError(self.name, len(self.waiters))
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we were cancelled, pass it on
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next waiter so running never drops below the limit while work is queued
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+
+class TaskPools:
+    """
+    A shared, bounded thread pool for work that shouldn't run on the event loop
+
+    The offloaded work is blocking I/O (the synchronous OpenAI client, file
+    copies) and NumPy, which releases the GIL, so threads are enough.
+
+    Every task type has its own concurrency limit and queue bound, so a
+    burst of one kind of work can't take all workers, and callers get a
+    PoolSaturatedError instead of an ever-growing queue.
+    """
+
+    def __init__(self, thread_workers: int = THREAD_WORKERS):
+        self.thread_workers = thread_workers
+        self.task_types: Dict[str, TaskType] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+    def register(self, name: str, concurrency: int, max_queue: int) -> TaskType:
+        """
+        Register a task type
+
+        Args:
+            name (str): Task type name used by run() and in metrics
+            concurrency (int): Tasks of this type running at once
+            max_queue (int): Tasks allowed to wait for a slot before new ones are rejected
+        """
+        task_type = TaskType(name, concurrency, max_queue)
+        self.task_types[name] = task_type
+        return task_type
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="task-pool")
+        return self._thread_pool
+
+    async def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func in the pool for its task type and wait for the result
+
+        Raises:
+            PoolSaturatedError: When the task type's queue is full
+        """
+        return await self._run(name, False, func, args, kwargs)
+
+    async def run_when_free(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Like run(), but waits for a slot however long the queue is instead of raising"""
+        return await self._run(name, True, func, args, kwargs)
+
+    async def _run(self, name: str, wait: bool, func: Callable, args: tuple, kwargs: Dict) -> Any:
+        task_type = self.task_types[name]
+        queued_at = time.perf_counter()
+        await task_type.acquire(wait)
+        TASK_POOL_WAIT.labels(name).observe(time.perf_counter() - queued_at)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor().submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            task_type.release()
+            raise
+
+        def finished(_):
+            # Cancelling the caller doesn't stop a task that has started, so the
+            # slot is only given back once the worker is actually done with it
+            try:
+                loop.call_soon_threadsafe(self._finished, task_type)
+            except RuntimeError:
+                pass  # The loop is closed, nothing is waiting for the slot
+
+        future.add_done_callback(finished)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _finished(self, task_type: TaskType):
+        task_type.completed += 1
+        task_type.release()
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "concurrency": task.concurrency,
+                "max_queue": task.max_queue,
+                "running": task.running,
+                "queued": len(task.waiters),
+                "completed": task.completed,
+                "rejected": task.rejected,
+            }
+            for name, task in self.task_types.items()
+        }
+
+    def shutdown(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+task_pools = TaskPools()
+# Audio sample crunching with NumPy (which releases the GIL) and large file copies
+task_pools.register(
+    "audio",
+    int(os.getenv("TASK_POOL_AUDIO_CONCURRENCY", "2")),
+    int(os.getenv("TASK_POOL_AUDIO_MAX_QUEUE", "8")),
+)
+# Blocking Whisper uploads from the synchronous OpenAI client
+task_pools.register(
+    "transcription",
+    int(os.getenv("TASK_POOL_TRANSCRIPTION_CONCURRENCY", "8")),
+    int(os.getenv("TASK_POOL_TRANSCRIPTION_MAX_QUEUE", "64")),
+)
+# Blocking LLM calls from the synchronous OpenAI client
+task_pools.register(
+    "llm",
+    int(os.getenv("TASK_POOL_LLM_CONCURRENCY", "8")),
+    int(os.getenv("TASK_POOL_LLM_MAX_QUEUE", "256")),
+)
+
+
+async def run_task(name: str, func: Callable, *args, **kwargs) -> Any:
+    """Run func in the shared task pools under the limits of task type name"""
+    return await task_pools.run(name, func, *args, **kwargs)
+
+
+async def run_task_when_free(name: str, func: Callable, *args, **kwargs) -> Any:
+    """Run func in the shared task pools, waiting for a slot rather than raising PoolSaturatedError"""
+    return await task_pools.run_when_free(name, func, *args, **kwargs)
@@ -0,0 +1,174 @@
+import os
+import re
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# tiktoken is optional - without it we fall back to a regex-based estimate
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "6000"))
+DEFAULT_RECENT_TURNS = int(os.getenv("TRANSCRIPT_RECENT_TURNS", "12"))
+
+# Words and patterns that mark a turn as relevant for scheduling
+SCHEDULING_PATTERN = re.compile(
+    r"\b("
+    r"meet|meeting|meetings|schedul\w*|appointment|calendar|availab\w*|busy|book\w*|"
+    r"reschedul\w*|cancel\w*|confirm\w*|invite|email|"
+    r"today|tomorrow|tonight|morning|afternoon|evening|noon|midnight|"
+    r"week|weekend|month|next|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"january|february|march|april|june|july|august|september|october|november|december|"
+    r"o'clock|hour|hours|minutes|"
+    r"est|edt|cst|cdt|mst|mdt|pst|pdt|utc|gmt|eastern|central|mountain|pacific|timezone"
+    r")\b"
+    r"|\b\d{1,2}:\d{2}\b|\b\d{1,2}\s*(am|pm|a\.m\.|p\.m\.)|\b\d{1,2}(st|nd|rd|th)\b|\S+@\S+",
+    re.IGNORECASE,
+)
+
+TURN_PATTERN = re.compile(r"^(User|Agent|Assistant|Customer|Host)\s*:", re.IGNORECASE)
+
+# Rough token estimate used when tiktoken is not available: words and punctuation
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Set by load_token_encoder() at startup. The first load may download the
+# encoding, so requests never trigger it and use the estimate until it's ready.
+_encoder = None
+
+
+def load_token_encoder():
+    """Load the tiktoken encoder; meant to run once at startup, off the event loop"""
+    global _encoder
+    if _encoder is not None:
+        return
+    if tiktoken is None:
+        logger.info("tiktoken not installed, using approximate token counts")
+        return
+    try:
+        _encoder = tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception:
+        try:
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoding, using approximate token counts: {str(e)}")
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text without calling the API"""
+    if not text:
+        return 0
+    encoder = _encoder
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(_FALLBACK_TOKEN_PATTERN.findall(text))
+
+
+def split_turns(transcript: str) -> List[str]:
+    """Split a formatted transcript into speaker turns.
+
+    Lines that don't start with a speaker label are treated as a
+    continuation of the previous turn.
+    """
+    turns = []
+    for line in transcript.splitlines():
+        if not line.strip():
+            continue
+        if TURN_PATTERN.match(line) or not turns:
+            turns.append(line)
+        else:
+            turns[-1] += "\n" + line
+    return turns
+
+
+def reduce_transcript(transcript: str, token_budget: Optional[int] = None,
+                      recent_turns: Optional[int] = None) -> Dict:
+    """
+    Reduce a transcript so that it fits into a token budget
+
+    The most recent turns are always kept first since that is where the
+    meeting usually gets confirmed. The remaining budget is filled with
+    turns that mention dates, times or other scheduling keywords, and
+    then with the opening of the call. Kept turns stay in their original
+    order and gaps are marked so the model knows something was dropped.
+
+    Args:
+        transcript (str): The formatted conversation transcript
+        token_budget (int, optional): Maximum tokens for the reduced transcript
+        recent_turns (int, optional): Number of trailing turns to always prefer
+
+    Returns:
+        dict: The reduced transcript and statistics about what was trimmed
+    """
+    token_budget = max(token_budget if token_budget is not None else DEFAULT_TOKEN_BUDGET, 0)
+    recent_turns = recent_turns if recent_turns is not None else DEFAULT_RECENT_TURNS
+
+    turns = split_turns(transcript or "")
+    turn_tokens = [count_tokens(turn) for turn in turns]
+    original_tokens = sum(turn_tokens)
+
+    stats = {
+        "original_turns": len(turns),
+        "original_tokens": original_tokens,
+        "token_budget": token_budget,
+    }
+
+    if original_tokens <= token_budget:
+        stats.update({
+            "kept_turns": len(turns),
+            "kept_tokens": original_tokens,
+            "trimmed_turns": 0,
+            "trimmed_tokens": 0,
+        })
+        return {"transcript": transcript, "trimmed": False, "stats": stats}
+
+    # Build the order in which turns are considered: recent context first,
+    # then scheduling-relevant turns (newest first), then the rest from the start
+    count = len(turns)
+    recent = list(range(count - 1, max(count - recent_turns, 0) - 1, -1))
+    recent_set = set(recent)
+    relevant = [i for i in range(count - 1, -1, -1)
+                if i not in recent_set and SCHEDULING_PATTERN.search(turns[i])]
+    relevant_set = set(relevant)
+    remainder = [i for i in range(count) if i not in recent_set and i not in relevant_set]
+
+    # Reserve a little room for the gap markers we add below
+    marker_tokens = count_tokens("[... 000 turns omitted ...]")
+    used = 0
+    kept = set()
+    for i in recent + relevant + remainder:
+        cost = turn_tokens[i] + marker_tokens
+        if used + cost > token_budget:
+            continue
+        kept.add(i)
+        used += cost
+
+    lines = []
+    skipped = 0
+    for i in range(count):
+        if i in kept:
+            if skipped:
+                lines.append(f"[... {skipped} turns omitted ...]")
+                skipped = 0
+            lines.append(turns[i])
+        else:
+            skipped += 1
+    if skipped:
+        lines.append(f"[... {skipped} turns omitted ...]")
+
+    reduced = "\n".join(lines)
+    if not kept:
+        # Not even a single turn fits, keep the tail of the transcript instead.
+        # A zero budget keeps nothing: transcript[-0:] would be the whole thing.
+        reduced = transcript[-token_budget * 4:] if token_budget else ""
+    kept_tokens = count_tokens(reduced)
+    stats.update({
+        "kept_turns": len(kept),
+        "kept_tokens": kept_tokens,
+        "trimmed_turns": count - len(kept),
+        "trimmed_tokens": max(original_tokens - kept_tokens, 0),
+    })
+    return {"transcript": reduced, "trimmed": True, "stats": stats}
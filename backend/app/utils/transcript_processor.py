@@ -2,6 +2,7 @@ import logging
 import json
 from ..controllers.text_parser_controller import TextParserController
 from ..controllers.calendar_controller import CalendarController
+from .task_pools import run_task_when_free
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,9 @@ class TranscriptProcessor:
         try:
             # Step 1: Parse the transcript
             logger.info("Parsing transcript to extract meeting details")
-            meeting_details = self.text_parser.parse_to_json(
+            meeting_details = await run_task_when_free(
+                "llm",
+                self.text_parser.parse_to_json,
                 transcript, 
                 host_availability,
                 host_name
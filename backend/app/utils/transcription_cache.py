@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Optional
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".cache", "transcripts"
+)
+CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", DEFAULT_CACHE_DIR)
+CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+URL_INDEX_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_URLS", "10000"))
+
+_URL_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+CACHE_LOOKUPS = registry.counter(
+    "transcription_cache_lookups_total",
+    "Transcription cache lookups by result",
+    ["result"],
+)
+
+
+class TranscriptionCache:
+    """
+    Disk-backed LRU cache of transcripts keyed by the SHA-256 of the audio
+
+    Transcripts are stored one file per hash. Recency is kept in memory and
+    mirrored to the file modification times, so the LRU order survives a
+    restart. A small URL index maps audio URLs to their content hash and
+    validators (ETag / Last-Modified) so unchanged files can be revalidated
+    with a conditional request instead of being downloaded again. The index
+    is keyed by the SHA-256 of the URL, so signed-URL tokens never reach disk.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.url_index_path = os.path.join(directory, "url_index.json")
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.url_index: "OrderedDict[str, Dict]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, content_hash[:2], f"{content_hash}.txt")
+
+    def _load(self):
+        """Rebuild the LRU order from the files on disk"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, content_hash, size in sorted(found):
+            self.entries[content_hash] = size
+            self.total_bytes += size
+
+        try:
+            with open(self.url_index_path, "r") as f:
+                url_index = json.load(f)
+            # Older indexes were keyed by the full URL, hash those keys and rewrite the file
+            self.url_index = OrderedDict(
+                (key if _URL_KEY_PATTERN.match(key) else self._url_key(key), entry)
+                for key, entry in url_index.items()
+            )
+            if list(self.url_index) != list(url_index):
+                self._save_url_index()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable transcription URL index: {str(e)}")
+
+        logger.info(f"Transcription cache loaded: {len(self.entries)} entries, {self.total_bytes} bytes")
+
+    def get(self, content_hash: str, record: bool = True) -> Optional[str]:
+        """
+        Get a cached transcript, or None on a miss
+
+        Args:
+            content_hash (str): SHA-256 of the audio
+            record (bool): Count the lookup in the hit/miss statistics
+        """
+        if content_hash not in self.entries:
+            if record:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        path = self._path(content_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.total_bytes -= self.entries.pop(content_hash)
+            if record:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self.entries.move_to_end(content_hash)
+        if record:
+            self.hits += 1
+            CACHE_LOOKUPS.labels("hit").inc()
+        return transcript
+
+    def contains(self, content_hash: str) -> bool:
+        return content_hash in self.entries
+
+    def put(self, content_hash: str, transcript: str):
+        """Store a transcript and evict the least recently used entries over the size cap"""
+        path = self._path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = transcript.encode("utf-8")
+        # Write to a temp file and rename so readers never see a partial transcript
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        self.total_bytes -= self.entries.pop(content_hash, 0)
+        self.entries[content_hash] = len(data)
+        self.total_bytes += len(data)
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            content_hash, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(content_hash))
+            except FileNotFoundError:
+                pass
+            logger.info(f"Evicted cached transcript {content_hash}")
+
+    def get_url_entry(self, url: str) -> Optional[Dict]:
+        """Get the hash and validators recorded for a URL, if its transcript is still cached"""
+        entry = self.url_index.get(self._url_key(url))
+        if entry is None or entry.get("hash") not in self.entries:
+            return None
+        return entry
+
+    def set_url_entry(self, url: str, content_hash: str, etag: Optional[str] = None,
+                      last_modified: Optional[str] = None):
+        """Remember which content a URL served, together with its validators"""
+        key = self._url_key(url)
+        if not etag and not last_modified:
+            # Without validators we can't tell if the file changed, so don't shortcut it
+            if self.url_index.pop(key, None) is not None:
+                self._save_url_index()
+            return
+        self.url_index.pop(key, None)
+        self.url_index[key] = {"hash": content_hash, "etag": etag, "last_modified": last_modified}
+        while len(self.url_index) > URL_INDEX_MAX_ENTRIES:
+            self.url_index.popitem(last=False)
+        self._save_url_index()
+
+    def record_revalidated(self):
+        """Count a hit served through the URL shortcut (304 Not Modified)"""
+        self.revalidated += 1
+        CACHE_LOOKUPS.labels("revalidated").inc()
+
+    def _save_url_index(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.url_index, f)
+        os.replace(temp_path, self.url_index_path)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "urls": len(self.url_index),
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.revalidated) / lookups if lookups else None,
+        }
+
+
+_cache: Optional[TranscriptionCache] = None
+
+
+def get_transcription_cache() -> TranscriptionCache:
+    """Get the process-wide transcription cache"""
+    global _cache
+    if _cache is None:
+        _cache = TranscriptionCache()
+    return _cache
+
+
+registry.gauge(
+    "transcription_cache_hit_ratio",
+    "Share of transcription cache lookups served from the cache",
+    callback=lambda: [((), _cache.stats()["hit_ratio"] or 0.0)] if _cache is not None else [],
+)
+registry.gauge(
+    "transcription_cache_bytes",
+    "Bytes of transcripts held in the cache",
+    callback=lambda: [((), _cache.total_bytes)] if _cache is not None else [],
+)
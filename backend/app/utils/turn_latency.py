@@ -0,0 +1,171 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+import numpy as np
+from .audio_codec import ULAW_TO_PCM16
+from .metrics import Histogram, RollingQuantiles, registry
+
+logger = logging.getLogger(__name__)
+
+# Inbound frames whose peak reaches this level (|sample| >> 7, so 4 is about -36 dBFS) count as speech
+SPEECH_LEVEL = int(os.getenv("TURN_SPEECH_LEVEL", "4"))
+# Speech after this much silence starts a new utterance, whose onset is when a barge-in began
+SPEECH_ONSET_GAP = float(os.getenv("TURN_SPEECH_ONSET_GAP_SECONDS", "0.3"))
+# Interruptions further than this from the caller's last speech onset were not caused by it
+BARGE_IN_WINDOW = float(os.getenv("TURN_BARGE_IN_WINDOW_SECONDS", "5"))
+TURN_HISTORY = int(os.getenv("TURN_LATENCY_CALL_HISTORY", "200"))
+SUMMARY_WINDOW = int(os.getenv("TURN_LATENCY_SUMMARY_WINDOW", "2000"))
+RECENT_TURNS = 50
+
+MEASURES = (
+    "end_of_speech_to_transcript",     # Caller stops talking -> user transcript from the agent
+    "transcript_to_agent_response",    # User transcript -> agent response text
+    "end_of_speech_to_first_audio",    # Caller stops talking -> first agent audio of the reply
+    "interrupt_to_clear",              # Agent interrupted -> clear message sent to Twilio
+    "barge_in_to_silence",             # Caller starts talking over the agent -> clear message sent
+)
+TURN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+TURN_LATENCY = registry.histogram(
+    "call_turn_latency_seconds",
+    "Conversational turn latency across all calls, by measure",
+    ["measure"],
+    buckets=TURN_BUCKETS,
+)
+
+
+# Maps each mu-law byte to its absolute level >> 7, so a frame's peak is max(frame.translate(...))
+ULAW_LEVELS = np.minimum(np.abs(ULAW_TO_PCM16.astype(np.int32)) >> 7, 255).astype(np.uint8).tobytes()
+
+
+class TurnLatencyTracker:
+    """
+    Turn timing for one call
+
+    The SDK callbacks and output() run on the ElevenLabs thread while
+    inbound audio arrives on the event loop, so state is guarded by a lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_speech_at: Optional[float] = None
+        self.speech_started_at: Optional[float] = None
+        self.turn: Optional[Dict[str, float]] = None
+        self.turns = 0
+        self.interruptions = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_TURNS)
+        self.histogram = Histogram("turn_latency_seconds", "Turn latency for one call", ["measure"],
+                                   buckets=TURN_BUCKETS)
+
+    def _observe(self, measure: str, seconds: float):
+        self.histogram.labels(measure).observe(seconds)
+        turn_latency.observe(measure, seconds)
+
+    def inbound_audio(self, frame: bytes):
+        """Note the time of the last inbound mu-law frame that contained speech"""
+        if frame and max(frame.translate(ULAW_LEVELS)) >= SPEECH_LEVEL:
+            now = time.monotonic()
+            if self.last_speech_at is None or now - self.last_speech_at > SPEECH_ONSET_GAP:
+                self.speech_started_at = now
+            self.last_speech_at = now
+
+    def user_transcript(self):
+        """A user turn ended, start timing the agent's reply"""
+        now = time.monotonic()
+        with self.lock:
+            self._close_turn()
+            end_of_speech = self.last_speech_at if self.last_speech_at is not None else now
+            self.turn = {"end_of_speech": end_of_speech, "transcript": now}
+            self.turns += 1
+            self._observe("end_of_speech_to_transcript", now - end_of_speech)
+
+    def agent_response(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.turn is not None and "agent_response" not in self.turn:
+                self.turn["agent_response"] = now
+                self._observe("transcript_to_agent_response", now - self.turn["transcript"])
+
+    def agent_audio(self):
+        """Agent audio arrived; the first chunk after a user turn ends that turn"""
+        with self.lock:
+            if self.turn is not None and "first_audio" not in self.turn:
+                now = time.monotonic()
+                self.turn["first_audio"] = now
+                self._observe("end_of_speech_to_first_audio", now - self.turn["end_of_speech"])
+                self._close_turn()
+
+    def clear_sent(self, interrupted_at: float):
+        """The clear message for an interruption that started at interrupted_at reached Twilio"""
+        now = time.monotonic()
+        with self.lock:
+            self.interruptions += 1
+            self._observe("interrupt_to_clear", now - interrupted_at)
+            onset = self.speech_started_at
+            if onset is not None and interrupted_at - BARGE_IN_WINDOW <= onset <= interrupted_at:
+                self._observe("barge_in_to_silence", now - onset)
+
+    def _close_turn(self):
+        turn, self.turn = self.turn, None
+        if turn is None:
+            return
+        start = turn["end_of_speech"]
+        self.recent.append({
+            stage: round((at - start) * 1000, 1) for stage, at in turn.items() if stage != "end_of_speech"
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "turns": self.turns,
+                "interruptions": self.interruptions,
+                "histograms_seconds": self.histogram.snapshot(),
+                "recent_turns_ms": list(self.recent),
+            }
+
+
+class TurnLatencyStats:
+    """Fleet-wide turn latency percentiles plus the per-call trackers of active and recent calls"""
+
+    def __init__(self, history: int = TURN_HISTORY, window: int = SUMMARY_WINDOW):
+        self.history = history
+        self.active: Dict[str, TurnLatencyTracker] = {}
+        self.finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.quantiles = {measure: RollingQuantiles(window) for measure in MEASURES}
+        self.lock = threading.Lock()
+
+    def observe(self, measure: str, seconds: float):
+        TURN_LATENCY.labels(measure).observe(seconds)
+        with self.lock:
+            self.quantiles[measure].add(seconds * 1000)
+
+    def track(self, call_sid: Optional[str], tracker: TurnLatencyTracker):
+        if call_sid:
+            self.active[call_sid] = tracker
+
+    def finish(self, call_sid: Optional[str]):
+        """Keep the per-call summary of an ended call"""
+        tracker = self.active.pop(call_sid, None) if call_sid else None
+        if tracker is None:
+            return
+        self.finished[call_sid] = tracker.summary()
+        while len(self.finished) > self.history:
+            self.finished.popitem(last=False)
+
+    def get(self, call_sid: str) -> Optional[Dict[str, Any]]:
+        tracker = self.active.get(call_sid)
+        if tracker is not None:
+            return {**tracker.summary(), "finished": False}
+        summary = self.finished.get(call_sid)
+        return {**summary, "finished": True} if summary is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            percentiles = {measure: quantiles.snapshot() for measure, quantiles in self.quantiles.items()}
+        return {"active_calls": len(self.active), "latency_ms": percentiles}
+
+
+turn_latency = TurnLatencyStats()
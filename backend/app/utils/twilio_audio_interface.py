@@ -1,21 +1,61 @@
+import time
 import asyncio
-from typing import Callable
+from typing import Callable, Optional
 import queue
 import threading
 import base64
 from elevenlabs.conversational_ai.conversation import AudioInterface
 import websockets
+from .runtime_metrics import (
+    INBOUND_FRAMES, STALE_FRAMES_DROPPED, SUPPRESSED_PERCENT, register_stream, unregister_stream,
+)
+from .call_tracing import call_tracer
+from .turn_latency import TurnLatencyTracker, turn_latency
+from .audio_codec import AGENT_INPUT_AUDIO_FORMAT, AGENT_OUTPUT_AUDIO_FORMAT, TWILIO_AUDIO_FORMAT, AudioConverter
+from .voice_activity import SILENCE_GATE_ENABLED, SilenceGate
+from .call_recorder import RECORDING_ENABLED, CallRecorder
+
+# Twilio sends one 20 ms frame of 8 kHz mu-law per media message; 0xFF is mu-law silence
+FRAME_SECONDS = 0.02
+SILENCE_FRAME = b"\xff" * 160
+
 
 class TwilioAudioInterface(AudioInterface):
-    def __init__(self, websocket):
+    def __init__(self, websocket=None):
+        # Must be created on the server's event loop, which owns the websocket.
+        # Without a websocket (a session pre-warmed during ringing) agent audio
+        # is buffered until attach_websocket() is called.
         self.websocket = websocket
+        self.loop = asyncio.get_running_loop()
+        # Items are (generation, mu-law audio, base64 payload). interrupt() bumps the generation,
+        # which invalidates everything queued before it in one step.
         self.output_queue = queue.Queue()
+        self.generation = 0
+        self.cleared_generation = 0
+        self.interrupted_at = None
+        self.stale_frames_dropped = 0
+        self.output_ready = asyncio.Event()
         self.should_stop = threading.Event()
         self.stream_sid = None
+        self.call_sid = None
         self.input_callback = None
-        self.output_thread = None
+        self.sender_task = None
+        self.silence_task = None
+        self.started_at = None
+        self.attached_at = time.monotonic() if websocket is not None else None
+        self.first_audio_at = None
+        self.on_first_audio: Optional[Callable[[float], None]] = None
+        self.turns = TurnLatencyTracker()
+        # Twilio's 8 kHz mu-law <-> the agent's formats; both pass through when they match
+        self.inbound_codec = AudioConverter(TWILIO_AUDIO_FORMAT, AGENT_INPUT_AUDIO_FORMAT)
+        self.outbound_codec = AudioConverter(AGENT_OUTPUT_AUDIO_FORMAT, TWILIO_AUDIO_FORMAT)
+        # Optionally keep line silence from the agent, see SilenceGate
+        self.silence_gate = SilenceGate() if SILENCE_GATE_ENABLED else None
+        # Optional recording of both directions for re-transcription, opened once the call SID is known
+        self.recorder: Optional[CallRecorder] = None
         self.host_availability = None
         self.media_packet_count = 0
+        self.output_packet_count = 0
         self.log_frequency = 20  # Log only every 20 packets
 
     def set_host_availability(self, availability):
@@ -26,15 +66,38 @@ class TwilioAudioInterface(AudioInterface):
     def start(self, input_callback: Callable[[bytes], None]):
         print("\n=== TWILIO AUDIO INTERFACE: STARTING ===\n")
         self.input_callback = input_callback
-        self.output_thread = threading.Thread(target=self._output_thread)
-        self.output_thread.start()
+        self.started_at = time.monotonic()
+        register_stream(self)
+        # Frames are sent by a task on the server loop rather than a thread per call
+        self.loop.call_soon_threadsafe(self._start_sender)
         print("\n=== TWILIO AUDIO INTERFACE: STARTED ===\n")
 
+    def attach_websocket(self, websocket, stream_sid: str):
+        """Connect a pre-warmed interface to the Twilio media stream and flush buffered audio"""
+        self.websocket = websocket
+        self.stream_sid = stream_sid
+        self.attached_at = time.monotonic()
+        # Nothing has reached Twilio yet, so earlier interruptions need no clear
+        self.cleared_generation = self.generation
+        self._open_recorder()
+        self.output_ready.set()
+        print(f"\n=== TWILIO AUDIO INTERFACE: ATTACHED TO STREAM {stream_sid} ({self.output_queue.qsize()} buffered) ===\n")
+
     def stop(self):
         print("\n=== TWILIO AUDIO INTERFACE: STOPPING ===\n")
         self.should_stop.set()
-        if self.output_thread:
-            self.output_thread.join(timeout=5.0)
+        self._wake_sender()
+        unregister_stream(self)
+        if self.silence_gate is not None and self.silence_gate.frames:
+            SUPPRESSED_PERCENT.observe(self.silence_gate.suppressed_percent())
+            print(f"Silence gate for stream {self.stream_sid}: {self.silence_gate.stats()}")
+        turn_latency.finish(self.call_sid or self.stream_sid)
+        if self.recorder is not None:
+            # Recording happens on the server loop, so close it there too
+            try:
+                self.loop.call_soon_threadsafe(self.recorder.close)
+            except RuntimeError:
+                self.recorder.close()
         self.stream_sid = None
         print("\n=== TWILIO AUDIO INTERFACE: STOPPED ===\n")
 
@@ -50,65 +113,158 @@ class TwilioAudioInterface(AudioInterface):
             print(f"Size: {len(audio)} bytes")
             print(f"===========================================\n")
         
-        self.output_queue.put(audio)
+        audio = self.outbound_codec.convert(audio)
+        if not audio:
+            return
+        self.turns.agent_audio()
+        # Encode here, on the SDK's thread, so the event loop only has to send
+        self.output_queue.put((self.generation, audio, base64.b64encode(audio).decode("utf-8")))
+        self._wake_sender()
 
     def interrupt(self):
-        try:
-            while True:
-                _ = self.output_queue.get(block=False)
-        except queue.Empty:
-            pass
-        asyncio.run(self._send_clear_message_to_twilio())
+        # Called on the SDK thread, which is also the only caller of output(), so
+        # audio queued before this point carries an older generation. The sender
+        # drops it and sends the clear message on the server loop before any
+        # newer audio.
+        self.interrupted_at = time.monotonic()
+        self.generation += 1
+        # Don't let the resampler's tail of the discarded audio bleed into the next reply
+        self.outbound_codec.reset()
+        self._wake_sender()
 
     async def handle_twilio_message(self, data):
         try:
             if data["event"] == "start":
                 self.stream_sid = data["start"]["streamSid"]
+                self.call_sid = data["start"].get("callSid") or self.call_sid
+                turn_latency.track(self.call_sid or self.stream_sid, self.turns)
+                self._open_recorder()
                 print(f"Started stream with stream_sid: {self.stream_sid}")
             elif data["event"] == "media":
                 self.media_packet_count += 1
+                if self.media_packet_count == 1:
+                    call_tracer.mark(self.call_sid, "first_inbound_media")
                 # Only log occasionally to reduce noise
                 if self.media_packet_count % self.log_frequency == 0:
                     print(f"Received {self.media_packet_count} media packets so far (last: {len(data['media']['payload'])} bytes)")
                 
                 audio_data = base64.b64decode(data["media"]["payload"])
+                self.turns.inbound_audio(audio_data)
+                if self.recorder is not None:
+                    self.recorder.inbound(audio_data)
                 if self.input_callback:
-                    self.input_callback(audio_data)
+                    if self.silence_gate is None:
+                        self.input_callback(self.inbound_codec.convert(audio_data))
+                    else:
+                        self._forward_gated(audio_data)
             elif data["event"] == "stop":
                 print(f"Stream stopped after {self.media_packet_count} media packets")
                 self.stop()
         except Exception as e:
             print(f"Error in handle_twilio_message: {e}")
 
-    def _output_thread(self):
-        self.output_packet_count = 0
-        while not self.should_stop.is_set():
-            asyncio.run(self._send_audio_to_twilio())
+    def _open_recorder(self):
+        if not RECORDING_ENABLED or self.recorder is not None or not (self.call_sid or self.stream_sid):
+            return
+        try:
+            self.recorder = CallRecorder(self.call_sid or self.stream_sid)
+        except OSError as e:
+            print(f"Could not open call recording: {e}")
 
-    async def _send_audio_to_twilio(self):
+    def _forward_gated(self, audio_data: bytes):
+        gate = self.silence_gate
+        keepalives = gate.keepalives
+        frames = gate.process(audio_data)
+        if gate.keepalives != keepalives:
+            INBOUND_FRAMES.labels("keepalive").inc()
+        elif frames:
+            INBOUND_FRAMES.labels("forwarded").inc()
+        else:
+            INBOUND_FRAMES.labels("suppressed").inc()
+        for frame in frames:
+            self.input_callback(self.inbound_codec.convert(frame))
+
+    def _start_sender(self):
+        if self.sender_task is None and not self.should_stop.is_set():
+            self.sender_task = self.loop.create_task(self._send_audio_to_twilio())
+        if self.websocket is None and self.silence_task is None and not self.should_stop.is_set():
+            self.silence_task = self.loop.create_task(self._feed_silence())
+
+    async def _feed_silence(self):
+        """
+        Feed the agent real-time silence while a pre-warmed call is ringing
+
+        Without input the agent's turn and silence timeouts run against a
+        stalled stream: it re-prompts into the buffer or ends the session
+        before anyone picks up. Stops as soon as the media stream attaches.
+        """
+        next_frame = self.loop.time()
+        while self.websocket is None and not self.should_stop.is_set():
+            if self.input_callback:
+                try:
+                    self.input_callback(self.inbound_codec.convert(SILENCE_FRAME))
+                except Exception as e:
+                    print(f"Error feeding silence to the agent: {e}")
+                    return
+            # Paced on the loop clock so the agent sees 50 frames a second without drift
+            next_frame = max(next_frame + FRAME_SECONDS, self.loop.time() - FRAME_SECONDS)
+            await asyncio.sleep(next_frame - self.loop.time())
+
+    def _wake_sender(self):
         try:
-            audio = self.output_queue.get(timeout=0.2)
-            self.output_packet_count += 1
-            
-            # Only log occasionally
-            if self.output_packet_count % self.log_frequency == 0:
-                print(f"Sent {self.output_packet_count} audio packets to Twilio so far (last: {len(audio)} bytes)")
-                
-            audio_payload = base64.b64encode(audio).decode("utf-8")
-            audio_delta = {
-                "event": "media",
-                "streamSid": self.stream_sid,
-                "media": {"payload": audio_payload},
-            }
-            await self.websocket.send_json(audio_delta)
-        except queue.Empty:
+            self.loop.call_soon_threadsafe(self.output_ready.set)
+        except RuntimeError:
+            # The server loop has already shut down
             pass
-        except Exception as e:
-            print(f"Error sending audio: {e}")
 
-    async def _send_clear_message_to_twilio(self):
+    async def _send_audio_to_twilio(self):
+        while not self.should_stop.is_set():
+            await self.output_ready.wait()
+            self.output_ready.clear()
+            # Until the media stream is attached, agent audio stays in the queue
+            while not self.should_stop.is_set() and self.websocket is not None:
+                if self.cleared_generation != self.generation:
+                    self.cleared_generation = self.generation
+                    await self._send_clear_message_to_twilio(self.interrupted_at)
+                try:
+                    generation, audio, audio_payload = self.output_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if generation != self.generation:
+                    self.stale_frames_dropped += 1
+                    STALE_FRAMES_DROPPED.inc()
+                    continue
+                self.output_packet_count += 1
+
+                # Only log occasionally
+                if self.output_packet_count % self.log_frequency == 0:
+                    print(f"Sent {self.output_packet_count} audio packets to Twilio so far (last: {len(audio_payload)} base64 bytes)")
+
+                audio_delta = {
+                    "event": "media",
+                    "streamSid": self.stream_sid,
+                    "media": {"payload": audio_payload},
+                }
+                try:
+                    await self.websocket.send_json(audio_delta)
+                except Exception as e:
+                    print(f"Error sending audio: {e}")
+                    continue
+                if self.recorder is not None:
+                    self.recorder.outbound(audio)
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.monotonic()
+                    call_tracer.mark(self.call_sid, "first_outbound_audio", at=self.first_audio_at)
+                    if self.on_first_audio is not None:
+                        self.on_first_audio(self.first_audio_at - self.attached_at)
+
+    async def _send_clear_message_to_twilio(self, interrupted_at=None):
         try:
             clear_message = {"event": "clear", "streamSid": self.stream_sid}
             await self.websocket.send_json(clear_message)
+            if self.recorder is not None:
+                self.recorder.clear()
+            if interrupted_at is not None:
+                self.turns.clear_sent(interrupted_at)
         except Exception as e:
             print(f"Error sending clear message to Twilio: {e}") 
\ No newline at end of file
@@ -0,0 +1,49 @@
+import functools
+import urllib.parse
+from typing import Optional
+from xml.sax.saxutils import quoteattr
+
+# TwiML for connecting a call to the media stream, split around the parts that vary per request.
+# The call SID is passed as a stream <Parameter>; the media stream looks the call's host
+# parameters up by it instead of carrying them URL-encoded in the stream URL.
+_STREAM_HEAD = b'<?xml version="1.0" encoding="UTF-8"?><Response><Say /><Connect><Stream url='
+_STREAM_TAIL = b'</Stream></Connect></Response>'
+
+ERROR_TWIML = (
+    b'<?xml version="1.0" encoding="UTF-8"?><Response><Say>Sorry, there was an error connecting to our '
+    b'scheduling assistant. Please try again later.</Say></Response>'
+)
+
+
+@functools.lru_cache(maxsize=32)
+def _stream_prefix(host: str) -> bytes:
+    """Everything up to the call SID parameter value, rendered once per host"""
+    url = quoteattr(f"wss://{host}/api/twilio/media-stream")
+    return _STREAM_HEAD + url.encode("utf-8") + b'><Parameter name="callSid" value='
+
+
+def render_stream_twiml(host: str, call_sid: Optional[str]) -> bytes:
+    """Render the <Connect><Stream> TwiML for a call"""
+    return _stream_prefix(host) + quoteattr(call_sid or "").encode("utf-8") + b" />" + _STREAM_TAIL
+
+
+def form_value(body: bytes, name: bytes) -> Optional[str]:
+    """
+    Get one field from an application/x-www-form-urlencoded body without parsing the rest
+
+    Args:
+        body (bytes): Raw request body
+        name (bytes): Field name, e.g. b"CallSid"
+    """
+    key = name + b"="
+    start = 0
+    while True:
+        index = body.find(key, start)
+        if index < 0:
+            return None
+        # Only match at the start of a field, not inside another name or value
+        if index == 0 or body[index - 1:index] == b"&":
+            end = body.find(b"&", index)
+            raw = body[index + len(key):] if end < 0 else body[index + len(key):end]
+            return urllib.parse.unquote_plus(raw.decode("utf-8", "replace"))
+        start = index + 1
@@ -0,0 +1,237 @@
+import os
+import logging
+from collections import deque
+from typing import Dict, List, Tuple
+import numpy as np
+from .audio_codec import ULAW_TO_PCM16, pcm16_to_ulaw
+
+logger = logging.getLogger(__name__)
+
+# Frame length used for energy measurement
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "20"))
+# Frames quieter than this are never speech
+VAD_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-50"))
+# Frames this far above the estimated noise floor count as speech
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+# How long a speech decision is held after the energy drops, so word endings aren't cut
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "300"))
+
+# Full scale for 16-bit PCM, used as the 0 dBFS reference
+PCM16_FULL_SCALE = 32768.0
+
+# Live silence gate for inbound call audio (see SilenceGate)
+SILENCE_GATE_ENABLED = os.getenv("SILENCE_GATE_ENABLED", "false").lower() == "true"
+# Longer than VAD_HANGOVER_MS so word endings and short pauses reach the agent unchanged
+SILENCE_GATE_HANGOVER_MS = int(os.getenv("SILENCE_GATE_HANGOVER_MS", "600"))
+# Silence is forwarded at full rate for at least this long after speech. The agent
+# decides a turn has ended from the audio time it receives, so thinning any sooner
+# would shorten the pause it hears and delay its reply. Keep it at or above the
+# agent's turn-end window.
+SILENCE_GATE_TURN_END_MS = int(os.getenv("SILENCE_GATE_TURN_END_MS", "2000"))
+# During suppressed silence one comfort-noise frame is sent this often
+SILENCE_GATE_KEEPALIVE_MS = int(os.getenv("SILENCE_GATE_KEEPALIVE_MS", "200"))
+# Suppressed frames replayed when speech starts, so soft word onsets aren't clipped
+SILENCE_GATE_PREROLL_MS = int(os.getenv("SILENCE_GATE_PREROLL_MS", "60"))
+# How fast the noise floor estimate may rise per second when the line gets noisier
+SILENCE_GATE_FLOOR_RISE_DB = float(os.getenv("SILENCE_GATE_FLOOR_RISE_DB", "3"))
+
+# Frames converted to float per step in frame_energy_db, so a memory-mapped
+# recording is read a block at a time instead of copied whole
+ENERGY_BLOCK_FRAMES = 4096
+
+# Squared PCM level of each mu-law byte, so a frame's mean square is one gather and a mean
+ULAW_SQUARES = ULAW_TO_PCM16.astype(np.float64) ** 2
+
+
+def frame_energy_db(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    """
+    Compute the RMS energy of consecutive frames in dBFS
+
+    Args:
+        samples (np.ndarray): PCM16 samples
+        frame_length (int): Samples per frame; a trailing partial frame is ignored
+
+    Returns:
+        np.ndarray: One float per frame
+    """
+    frame_count = len(samples) // frame_length
+    mean_square = np.empty(frame_count, dtype=np.float64)
+    for first in range(0, frame_count, ENERGY_BLOCK_FRAMES):
+        last = min(first + ENERGY_BLOCK_FRAMES, frame_count)
+        frames = np.asarray(samples[first * frame_length:last * frame_length],
+                            dtype=np.float32).reshape(last - first, frame_length)
+        mean_square[first:last] = np.einsum("ij,ij->i", frames, frames, dtype=np.float64)
+    mean_square /= frame_length
+    return 10.0 * np.log10(mean_square / (PCM16_FULL_SCALE ** 2) + 1e-12)
+
+
+def apply_hangover(speech: np.ndarray, hangover_frames: int) -> np.ndarray:
+    """Keep each speech decision on for hangover_frames frames after it ends"""
+    if hangover_frames <= 0 or not speech.any():
+        return speech
+    # Distance (in frames) since the last speech frame, via a running maximum of speech indices
+    indices = np.where(speech, np.arange(len(speech)), -hangover_frames - 1)
+    last_speech = np.maximum.accumulate(indices)
+    return (np.arange(len(speech)) - last_speech) <= hangover_frames
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int, frame_ms: int = VAD_FRAME_MS,
+                  floor_db: float = VAD_FLOOR_DB, margin_db: float = VAD_MARGIN_DB,
+                  hangover_ms: int = VAD_HANGOVER_MS) -> np.ndarray:
+    """
+    Energy-based voice activity detection
+
+    The noise floor is estimated as the 10th percentile of the frame
+    energies. Frames louder than the floor by margin_db (and louder than
+    floor_db) are speech, held on for hangover_ms afterwards.
+
+    Args:
+        samples (np.ndarray): PCM16 samples
+        sample_rate (int): Sample rate in Hz
+        frame_ms (int): Frame length in milliseconds
+
+    Returns:
+        np.ndarray: Boolean speech flag per frame
+    """
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+    energy = frame_energy_db(samples, frame_length)
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = float(np.percentile(energy, 10))
+    threshold = max(floor_db, noise_floor + margin_db)
+    speech = energy > threshold
+    return apply_hangover(speech, int(hangover_ms / frame_ms))
+
+
+def speech_segments(speech: np.ndarray, frame_ms: int = VAD_FRAME_MS, min_silence_ms: int = 1000,
+                    padding_ms: int = 200) -> List[Tuple[int, int]]:
+    """
+    Turn per-frame speech flags into frame ranges to keep
+
+    Silences shorter than min_silence_ms are kept as they are, longer ones
+    (including leading and trailing silence) are cut down to padding_ms on
+    each side of the neighbouring speech.
+
+    Returns:
+        list: (start_frame, end_frame) pairs, end exclusive
+    """
+    if not speech.any():
+        return []
+    # Edges of speech runs: +1 where a run starts, -1 where it ends
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_gap = int(min_silence_ms / frame_ms)
+    padding = int(padding_ms / frame_ms)
+    segments = []
+    segment_start, segment_end = starts[0], ends[0]
+    for start, end in zip(starts[1:], ends[1:]):
+        if start - segment_end < min_gap:
+            segment_end = end
+        else:
+            segments.append((segment_start, segment_end))
+            segment_start, segment_end = start, end
+    segments.append((segment_start, segment_end))
+
+    frame_count = len(speech)
+    return [(max(int(start) - padding, 0), min(int(end) + padding, frame_count)) for start, end in segments]
+
+
+class SilenceGate:
+    """
+    Streaming voice activity gate for 8 kHz mu-law call audio
+
+    Frames louder than an adaptive noise floor by VAD_MARGIN_DB are speech
+    and are forwarded. The gate stays open for the longer of hangover_ms
+    and turn_end_ms afterwards, so the agent hears the pause that ends a
+    turn in real time. Longer silences are replaced by one low-level
+    comfort-noise frame every keepalive_ms, which keeps the upstream
+    stream alive at a fraction of the frames. The last preroll_ms of
+    suppressed audio is replayed when speech starts.
+    """
+
+    def __init__(self, frame_ms: int = VAD_FRAME_MS, hangover_ms: int = SILENCE_GATE_HANGOVER_MS,
+                 keepalive_ms: int = SILENCE_GATE_KEEPALIVE_MS, preroll_ms: int = SILENCE_GATE_PREROLL_MS,
+                 floor_db: float = VAD_FLOOR_DB, margin_db: float = VAD_MARGIN_DB,
+                 turn_end_ms: int = SILENCE_GATE_TURN_END_MS):
+        self.frame_ms = frame_ms
+        self.hangover_frames = max(max(hangover_ms, turn_end_ms) // frame_ms, 0)
+        self.keepalive_frames = max(keepalive_ms // frame_ms, 1)
+        self.floor_db = floor_db
+        self.margin_db = margin_db
+        self.floor_rise_db = SILENCE_GATE_FLOOR_RISE_DB * frame_ms / 1000
+        self.noise_floor_db = floor_db
+        self.preroll = deque(maxlen=max(preroll_ms // frame_ms, 0))
+        # Frames since the last speech frame; starts closed
+        self.silent_frames = self.hangover_frames + 1
+        self.frames = 0
+        self.forwarded = 0
+        self.suppressed = 0
+        self.keepalives = 0
+        self._comfort_noise: Dict[int, bytes] = {}
+
+    def frame_energy_db(self, frame: bytes) -> float:
+        mean_square = ULAW_SQUARES[np.frombuffer(frame, dtype=np.uint8)].mean()
+        return float(10.0 * np.log10(mean_square / (PCM16_FULL_SCALE ** 2) + 1e-12))
+
+    def comfort_noise(self, length: int) -> bytes:
+        """A frame of faint noise, well below any speech threshold"""
+        frame = self._comfort_noise.get(length)
+        if frame is None:
+            noise = np.random.default_rng(length).normal(0, 4, length)
+            frame = self._comfort_noise[length] = pcm16_to_ulaw(noise.astype(np.int16))
+        return frame
+
+    def process(self, frame: bytes) -> List[bytes]:
+        """
+        Gate one inbound frame
+
+        Returns:
+            list: The frames to forward in its place - the frame itself,
+            preroll plus the frame at speech onset, a comfort-noise frame,
+            or nothing
+        """
+        self.frames += 1
+        energy = self.frame_energy_db(frame)
+        # The floor follows quiet frames down at once and rises slowly, so speech can't drag it up
+        if energy < self.noise_floor_db:
+            self.noise_floor_db = energy
+        else:
+            self.noise_floor_db = min(self.noise_floor_db + self.floor_rise_db, energy)
+
+        if energy > max(self.floor_db, self.noise_floor_db + self.margin_db):
+            forward = list(self.preroll) if self.silent_frames > self.hangover_frames else []
+            self.preroll.clear()
+            self.silent_frames = 0
+            forward.append(frame)
+            self.forwarded += 1
+            # Replayed preroll frames were counted as suppressed when they arrived
+            self.suppressed -= len(forward) - 1
+            self.forwarded += len(forward) - 1
+            return forward
+
+        self.silent_frames += 1
+        if self.silent_frames <= self.hangover_frames:
+            self.forwarded += 1
+            return [frame]
+
+        self.preroll.append(frame)
+        self.suppressed += 1
+        if (self.silent_frames - self.hangover_frames - 1) % self.keepalive_frames == 0:
+            self.keepalives += 1
+            return [self.comfort_noise(len(frame))]
+        return []
+
+    def suppressed_percent(self) -> float:
+        return round(self.suppressed / self.frames * 100, 1) if self.frames else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "forwarded": self.forwarded,
+            "suppressed": self.suppressed,
+            "keepalives": self.keepalives,
+            "suppressed_percent": self.suppressed_percent(),
+            "noise_floor_db": round(self.noise_floor_db, 1),
+        }
@@ -1,16 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app.models.meeting import AudioRequest
 from pydantic import BaseModel
+from typing import List, Literal, Optional
 from app.controllers.meeting_controller import MeetingController
 from app.middleware.cors_middleware import CustomCORSMiddleware
 from app.middleware.auth_middleware import get_authenticated_user, get_current_user
+from app.middleware.metrics_middleware import MetricsMiddleware
 from dotenv import load_dotenv
+import asyncio
+import json
 import logging
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from app.routes import twilio_routes, calendar_routes
 from app.utils.call_manager import CallManager
+from app.utils.api_call_metrics import get_api_call_stats
+from app.utils.metrics import registry as metrics_registry
+from app.utils.runtime_metrics import loop_lag_monitor, register_call_manager
+from app.utils.http_client import close_http_session
+from app.controllers.audio_controller import get_download_progress
+from app.utils.transcription_cache import get_transcription_cache
+from app.utils.conversation_cache import get_conversation_cache
+from app.controllers.elevenlabs_controller import signed_url_pool
+from app.controllers.twilio_controller import close_async_twilio_client
+from app.utils.task_pools import task_pools
+from app.utils.agent_sessions import agent_sessions
+from app.utils.call_recorder import prune_recordings
+from app.utils.transcript_budget import load_token_encoder
+from app.services.meeting_repository import close_meeting_repository
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route request latency (added last so it wraps everything else)
+app.add_middleware(MetricsMiddleware)
+
 # Dependency to get controllers
 def get_meeting_controller():
     return MeetingController()
@@ -45,13 +67,88 @@ class ElevenLabsRequest(BaseModel):
 class ConversationRequest(BaseModel):
     conversationId: str
 
+class BulkConversationRequest(BaseModel):
+    conversationIds: List[str]
+    elevenLabsConcurrency: Optional[int] = None  # Conversation fetches in flight at once
+    llmConcurrency: Optional[int] = None  # Transcript parses in flight at once
+
 # Make sure the CallManager is initialized when the app starts
 app.state.call_manager = CallManager()
+register_call_manager("app", app.state.call_manager)
+register_call_manager("twilio", twilio_routes.call_manager)
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag_monitor.start()
+
+@app.on_event("startup")
+async def start_signed_url_pool():
+    # Mint signed URLs ahead of time so browser sessions don't wait on ElevenLabs
+    if os.getenv("ELEVENLABS_API_KEY") and os.getenv("AGENT_ID"):
+        signed_url_pool.start()
+
+@app.on_event("startup")
+def prune_call_recordings():
+    # Recordings are kept for re-transcription until CALL_RECORDING_RETENTION_SECONDS have passed
+    prune_recordings()
+
+@app.on_event("startup")
+async def load_transcript_token_encoder():
+    # The first load can download the encoding; counts are estimated until it finishes
+    asyncio.get_running_loop().run_in_executor(None, load_token_encoder)
+
+@app.on_event("shutdown")
+async def stop_signed_url_pool():
+    await signed_url_pool.stop()
+
+@app.on_event("shutdown")
+async def stop_loop_lag_monitor():
+    await loop_lag_monitor.stop()
+
+@app.on_event("shutdown")
+async def close_shared_http_session():
+    await close_http_session()
+
+@app.on_event("shutdown")
+async def stop_campaigns():
+    await twilio_routes.campaign_dialer.close()
+    await close_async_twilio_client()
+
+@app.on_event("shutdown")
+async def drain_completed_call_jobs():
+    await twilio_routes.completed_calls.stop()
+
+@app.on_event("shutdown")
+def close_prewarmed_agent_sessions():
+    agent_sessions.close()
+
+@app.on_event("shutdown")
+def shutdown_task_pools():
+    task_pools.shutdown()
+
+@app.on_event("shutdown")
+def close_meeting_store():
+    close_meeting_repository()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 def read_root():
     return {"message": "Meeting Scheduler API is running"}
 
+@app.get("/api/metrics/api-calls")
+def get_api_call_metrics():
+    """Get latency, token, error and retry metrics for the LLM and speech API calls"""
+    return {"sites": get_api_call_stats()}
+
+@app.get("/api/metrics/task-pools")
+def get_task_pool_metrics():
+    """Get running, queued and rejected counts for the shared worker pools"""
+    return {"pools": task_pools.stats()}
+
 @app.get("/api/hello")
 def hello_world():
     return {"message": "Hello from FastAPI!", "status": "success"}
@@ -70,9 +167,52 @@ def create_meeting(
         "meeting": controller.meeting_service.create_meeting(meeting)
     }
 
+@app.put("/api/meetings/{meeting_id}")
+def update_meeting(
+    meeting_id: str,
+    meeting: dict,
+    user = Depends(get_authenticated_user),
+    controller: MeetingController = Depends(get_meeting_controller)
+):
+    # Only the owner can replace a meeting; someone else's id looks the same as a missing one
+    updated = controller.meeting_service.update_meeting(meeting_id, meeting, user['uid'])
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    return {"message": "Meeting updated successfully", "meeting": updated}
+
 @app.get("/api/meetings")
-def get_meetings(controller: MeetingController = Depends(get_meeting_controller)):
-    return {"meetings": controller.get_all_meetings()}
+def get_meetings(
+    request: Request,
+    userId: Optional[str] = None,
+    clientId: Optional[str] = None,
+    startFrom: Optional[str] = None,
+    startTo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    format: Literal["json", "ndjson"] = "json",
+    controller: MeetingController = Depends(get_meeting_controller)
+):
+    """
+    List meetings ordered by start time
+
+    Pages are fetched with the nextCursor of the previous page. With
+    format=ndjson (or Accept: application/x-ndjson) every matching meeting
+    is streamed as one JSON object per line instead.
+    """
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            controller.stream_meetings(userId, clientId, startFrom, startTo),
+            media_type="application/x-ndjson"
+        )
+    body = controller.get_meetings_page(userId, clientId, startFrom, startTo, cursor, limit)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/meetings/{meeting_id}")
+def get_meeting(meeting_id: str, controller: MeetingController = Depends(get_meeting_controller)):
+    meeting = controller.meeting_service.get_meeting_by_id(meeting_id)
+    if meeting is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    return {"meeting": meeting}
 
 @app.get("/api/meeting-example")
 def get_meeting_example(controller: MeetingController = Depends(get_meeting_controller)):
@@ -84,9 +224,21 @@ async def process_audio(request: AudioRequest, controller: MeetingController = D
         request.audioUrl,
         user_id=request.userId,
         client_id=request.clientId,
-        meeting_id=request.meetingId
+        meeting_id=request.meetingId,
+        chunked=request.chunked,
+        speech_profile=request.speechProfile
     )
 
+@app.get("/api/process-audio/downloads")
+def get_audio_downloads():
+    """Get the progress of audio downloads in flight"""
+    return {"downloads": get_download_progress()}
+
+@app.get("/api/process-audio/cache")
+def get_transcription_cache_stats():
+    """Get size and hit ratio of the transcription cache"""
+    return get_transcription_cache().stats()
+
 @app.options("/api/test-cors")
 async def test_cors_options():
     return {"message": "CORS preflight request successful"}
@@ -126,6 +278,16 @@ async def get_signed_url(controller: MeetingController = Depends(get_meeting_con
     """Get a signed URL for connecting to the Eleven Labs agent"""
     return await controller.elevenlabs_controller.get_signed_url()
 
+@app.get("/api/metrics/signed-url-pool")
+def get_signed_url_pool_stats():
+    """Get occupancy and hit ratio of the signed URL pool"""
+    return signed_url_pool.stats()
+
+@app.get("/api/metrics/conversation-cache")
+def get_conversation_cache_stats():
+    """Get size and hit ratio of the finished-conversation cache"""
+    return get_conversation_cache().stats()
+
 @app.get("/api/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str, controller: MeetingController = Depends(get_meeting_controller)):
     """Get details of a conversation by ID"""
@@ -139,6 +301,27 @@ async def process_conversation_by_id(request: dict, controller: MeetingControlle
         raise HTTPException(status_code=400, detail="Missing conversation_id in request")
     return await controller.process_conversation_by_id(conversation_id)
 
+@app.post("/api/process-conversations/bulk")
+async def process_conversations_bulk(
+    request: BulkConversationRequest,
+    controller: MeetingController = Depends(get_meeting_controller)
+):
+    """
+    Process many conversations by ID
+
+    Results are streamed as newline-delimited JSON, one line per
+    conversation in the order they finish.
+    """
+    results = controller.process_conversations_bulk(
+        request.conversationIds,
+        elevenlabs_concurrency=request.elevenLabsConcurrency,
+        llm_concurrency=request.llmConcurrency
+    )
+    return StreamingResponse(
+        (json.dumps(result) + "\n" async for result in results),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/api/process-text")
 async def process_text(request: ElevenLabsRequest, controller: MeetingController = Depends(get_meeting_controller)):
     """Process text input and extract meeting details"""
@@ -0,0 +1,83 @@
+"""
+Per-frame cost of the media stream audio conversions
+
+Feeds a few seconds of synthetic speech-like audio through each
+AudioConverter path 20 ms at a time, the way TwilioAudioInterface does,
+and reports the time per frame and the share of real time it takes.
+
+    python scripts/audio_codec_benchmark.py --seconds 60
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.audio_codec import AudioConverter, parse_audio_format, pcm16_to_ulaw  # noqa: E402
+
+FRAME_MS = 20
+
+PATHS = (
+    ("ulaw_8000", "ulaw_8000"),    # Passthrough, the default configuration
+    ("ulaw_8000", "pcm_8000"),
+    ("ulaw_8000", "pcm_16000"),    # Inbound to a 16 kHz agent
+    ("pcm_16000", "ulaw_8000"),    # Outbound from a 16 kHz agent
+    ("ulaw_8000", "pcm_24000"),
+    ("pcm_24000", "ulaw_8000"),
+    ("ulaw_8000", "alaw_8000"),
+)
+
+
+def synthetic_pcm(sample_rate: int, seconds: float) -> np.ndarray:
+    """A few harmonics with a syllable-rate envelope, plus a little noise"""
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    noise = np.random.default_rng(0).normal(0, 0.02, len(t))
+    return np.clip((voice * envelope + noise) * 6000, -32768, 32767).astype(np.int16)
+
+
+def frames_for(audio_format: str, seconds: float):
+    encoding, sample_rate = parse_audio_format(audio_format)
+    samples = synthetic_pcm(sample_rate, seconds)
+    data = pcm16_to_ulaw(samples) if encoding == "ulaw" else samples.tobytes()
+    frame_bytes = len(data) * FRAME_MS // int(seconds * 1000)
+    return [data[i:i + frame_bytes] for i in range(0, len(data), frame_bytes)]
+
+
+def benchmark(source: str, target: str, seconds: float):
+    frames = frames_for(source, seconds)
+    converter = AudioConverter(source, target)
+    # Warm up the converter state and numpy's dispatch caches
+    for frame in frames[:50]:
+        converter.convert(frame)
+    converter.reset()
+
+    timings = np.empty(len(frames))
+    for index, frame in enumerate(frames):
+        started = time.perf_counter()
+        converter.convert(frame)
+        timings[index] = time.perf_counter() - started
+
+    timings *= 1e6
+    p50, p99 = np.percentile(timings, [50, 99])
+    real_time = timings.sum() / 1e6 / seconds * 100
+    print(f"{source:>10} -> {target:<10} {p50:8.1f} {p99:8.1f} {timings.max():8.1f} {real_time:8.3f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Seconds of audio per path")
+    args = parser.parse_args()
+
+    print(f"{len(frames_for('ulaw_8000', args.seconds))} frames of {FRAME_MS} ms per path")
+    print(f"{'path':>24} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'of real time':>9}")
+    for source, target in PATHS:
+        benchmark(source, target, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Load test for the Twilio /voice webhook
+
+Posts Twilio-style form bodies to a running server and reports latency
+percentiles as seen by the client, then prints the server-side handler
+percentiles from /api/twilio/voice/latency.
+
+Every request carries a new CallSid, and the webhook pre-warms an
+ElevenLabs agent session for each new call - one live, billed agent
+session per request. Run the server with AGENT_PREWARM_ENABLED=false;
+the script refuses to run against a server with pre-warming on unless
+--allow-prewarm is given.
+
+    AGENT_PREWARM_ENABLED=false uvicorn main:app --port 8000
+    python scripts/voice_webhook_load.py --base-url http://localhost:8000 --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+import urllib.parse
+import uuid
+
+import aiohttp
+
+
+def twilio_form_body() -> bytes:
+    """A form body shaped like the one Twilio sends when a call is answered"""
+    fields = {
+        "AccountSid": "AC" + uuid.uuid4().hex,
+        "ApiVersion": "2010-04-01",
+        "CallSid": "CA" + uuid.uuid4().hex,
+        "CallStatus": "in-progress",
+        "Called": "+15555550100",
+        "CalledCity": "SAN FRANCISCO",
+        "CalledCountry": "US",
+        "CalledState": "CA",
+        "CalledZip": "94105",
+        "Caller": "+15555550199",
+        "CallerCity": "",
+        "CallerCountry": "US",
+        "CallerState": "CA",
+        "CallerZip": "",
+        "Direction": "outbound-api",
+        "From": "+15555550199",
+        "To": "+15555550100",
+    }
+    return urllib.parse.urlencode(fields).encode("ascii")
+
+
+def percentile(ordered, q):
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def prewarm_enabled(session: aiohttp.ClientSession, base_url: str) -> bool:
+    async with session.get(f"{base_url}/api/twilio/sessions/stats") as response:
+        if response.status != 200:
+            # Can't tell, assume the worst
+            return True
+        return bool((await response.json()).get("enabled"))
+
+
+async def run(base_url: str, total: int, concurrency: int, query: str, allow_prewarm: bool):
+    url = f"{base_url}/api/twilio/voice"
+    if query:
+        url += f"?{query}"
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    async with aiohttp.ClientSession() as session:
+        if not allow_prewarm and await prewarm_enabled(session, base_url):
+            print("The server pre-warms agent sessions, which would open one ElevenLabs session per request.")
+            print("Restart it with AGENT_PREWARM_ENABLED=false, or pass --allow-prewarm.")
+            return
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                body = twilio_form_body()
+                started = time.perf_counter()
+                try:
+                    async with session.post(url, data=body, headers=headers) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(latencies)
+        print(f"{len(ordered)} requests in {elapsed:.2f}s ({len(ordered) / elapsed:.0f} req/s), {errors} errors")
+        if ordered:
+            for q in (0.5, 0.9, 0.99):
+                print(f"  p{int(q * 100)}: {percentile(ordered, q) * 1000:.2f} ms")
+            print(f"  max: {ordered[-1] * 1000:.2f} ms")
+
+        async with session.get(f"{base_url}/api/twilio/voice/latency") as response:
+            if response.status == 200:
+                print(f"Server handler latency: {(await response.json())['latency_ms']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query", default="availability=Mon-Fri%209-5&host_email=host%40example.com&host_name=Host",
+                        help="Query string on the webhook URL, as TwilioController sets it")
+    parser.add_argument("--allow-prewarm", action="store_true",
+                        help="Run even if the server pre-warms (and pays for) an agent session per request")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.requests, args.concurrency, args.query, args.allow_prewarm))
+
+
+if __name__ == "__main__":
+    main()
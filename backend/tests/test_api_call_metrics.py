@@ -0,0 +1,94 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import api_call_metrics
+from app.utils.api_call_metrics import API_CALLS, API_CALL_TOKENS, instrumented_call
+from app.utils.task_pools import run_task_when_free
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions / client.audio.transcriptions"""
+
+    def __init__(self, failures=()):
+        self.calls = []
+        self.failures = list(failures)
+
+    def create(self, *, model, messages=None, file=None, response_format=None):
+        self.calls.append({"model": model, "messages": messages, "file": file})
+        if self.failures:
+            raise self.failures.pop(0)
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3,
+                                                     prompt_tokens_details=None))
+
+
+class InternalServerError(Exception):
+    pass
+
+
+class BadRequestError(Exception):
+    pass
+
+
+def test_model_is_passed_to_the_client_and_used_as_label():
+    client = FakeCompletions()
+    before = API_CALLS.labels("test.chat", "gpt-4o-mini", "success").value
+
+    response = instrumented_call("test.chat", client.create, model="gpt-4o-mini",
+                                 messages=[{"role": "user", "content": "hi"}])
+
+    assert client.calls == [{"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "file": None}]
+    assert response.usage.prompt_tokens == 12
+    assert API_CALLS.labels("test.chat", "gpt-4o-mini", "success").value == before + 1
+    assert API_CALL_TOKENS.labels("test.chat", "gpt-4o-mini", "prompt").value >= 12
+
+
+def test_retryable_errors_are_retried_and_uploads_rewound(monkeypatch):
+    monkeypatch.setattr(api_call_metrics, "RETRY_BASE_DELAY", 0)
+    client = FakeCompletions(failures=[InternalServerError("boom")])
+    upload = io.BytesIO(b"audio")
+    upload.read()
+
+    instrumented_call("test.transcribe", client.create, model="whisper-1", file=("audio.mp3", upload),
+                      response_format="text")
+
+    assert len(client.calls) == 2
+    assert all(call["model"] == "whisper-1" for call in client.calls)
+    assert upload.tell() == 0
+
+
+def test_other_errors_are_raised_without_retrying():
+    client = FakeCompletions(failures=[BadRequestError("bad")])
+    before = API_CALLS.labels("test.error", "gpt-4o-mini", "error").value
+
+    with pytest.raises(BadRequestError):
+        instrumented_call("test.error", client.create, model="gpt-4o-mini", messages=[])
+
+    assert len(client.calls) == 1
+    assert API_CALLS.labels("test.error", "gpt-4o-mini", "error").value == before + 1
+
+
+def test_retry_backoff_in_the_task_pool_leaves_the_event_loop_free(monkeypatch):
+    monkeypatch.setattr(api_call_metrics, "RETRY_BASE_DELAY", 0.1)
+    client = FakeCompletions(failures=[InternalServerError("boom")])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        await run_task_when_free("llm", instrumented_call, "test.async", client.create, model="gpt-4o-mini",
+                                 messages=[])
+        ticking.cancel()
+        return ticks
+
+    # The backoff is at least 100 ms, during which the loop keeps running other tasks
+    assert asyncio.run(main()) >= 5
+    assert len(client.calls) == 2
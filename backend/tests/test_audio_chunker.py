@@ -0,0 +1,40 @@
+from app.utils.audio_chunker import plan_chunks, stitch_transcripts
+
+
+def test_short_recordings_are_one_chunk():
+    assert plan_chunks(300.0, [(100.0, 101.0)], max_chunk_seconds=600) == [(0.0, 300.0)]
+
+
+def test_cuts_land_in_the_latest_silence_within_bounds():
+    silences = [(50.0, 52.0), (400.0, 402.0), (550.0, 554.0), (900.0, 910.0)]
+    chunks = plan_chunks(1200.0, silences, max_chunk_seconds=600, min_chunk_seconds=120)
+
+    # 51 is too early for a chunk, 552 is the last silence before 600
+    assert chunks == [(0.0, 552.0), (552.0, 905.0), (905.0, 1200.0)]
+
+
+def test_chunks_without_silence_are_cut_hard_with_overlap():
+    chunks = plan_chunks(1500.0, [], max_chunk_seconds=600, min_chunk_seconds=120, overlap_seconds=2)
+
+    assert chunks == [(0.0, 600.0), (598.0, 1198.0), (1196.0, 1500.0)]
+    assert all(end - start <= 600 for start, end in chunks)
+
+
+def test_chunks_cover_the_recording_in_order():
+    silences = [(t, t + 0.6) for t in range(37, 3600, 91)]
+    chunks = plan_chunks(3600.0, silences, max_chunk_seconds=600, min_chunk_seconds=120)
+
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 3600.0
+    assert all(end - start <= 600 for start, end in chunks)
+    assert all(previous[1] >= current[0] for previous, current in zip(chunks, chunks[1:]))
+
+
+def test_stitch_drops_words_repeated_across_an_overlap():
+    texts = ["we should meet on Tuesday at", "Tuesday, at noon. Does that work?"]
+    assert stitch_transcripts(texts) == "we should meet on Tuesday at noon. Does that work?"
+
+
+def test_stitch_joins_boundaries_without_overlap_as_is():
+    texts = ["I said yes", "yes and then", "", "then we left"]
+    assert stitch_transcripts(texts, overlaps=[False, False, False, False]) == "I said yes yes and then then we left"
+    assert stitch_transcripts(texts, overlaps=[False, True, False, True]) == "I said yes and then we left"
@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from app.utils.audio_codec import (
+    ALAW_TO_PCM16, ULAW_TO_PCM16, AudioConverter, StreamingResampler, alaw_to_pcm16, pcm16_to_alaw,
+    pcm16_to_ulaw, ulaw_to_pcm16,
+)
+from app.utils.turn_latency import ULAW_LEVELS
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    audioop = pytest.importorskip("audioop")
+
+ALL_BYTES = bytes(range(256))
+ALL_SAMPLES = np.arange(-32768, 32768, dtype=np.int16)
+
+
+def sine(frequency, rate, seconds=1.0, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def test_decode_tables_match_audioop():
+    assert np.array_equal(ULAW_TO_PCM16, np.frombuffer(audioop.ulaw2lin(ALL_BYTES, 2), dtype="<i2"))
+    assert np.array_equal(ALAW_TO_PCM16, np.frombuffer(audioop.alaw2lin(ALL_BYTES, 2), dtype="<i2"))
+    assert np.array_equal(ulaw_to_pcm16(ALL_BYTES), ULAW_TO_PCM16)
+    assert np.array_equal(alaw_to_pcm16(ALL_BYTES), ALAW_TO_PCM16)
+
+
+def test_encode_tables_match_audioop_for_every_sample():
+    assert pcm16_to_ulaw(ALL_SAMPLES) == audioop.lin2ulaw(ALL_SAMPLES.tobytes(), 2)
+    assert pcm16_to_alaw(ALL_SAMPLES) == audioop.lin2alaw(ALL_SAMPLES.tobytes(), 2)
+
+
+def test_ulaw_levels_follow_the_decode_table():
+    assert len(ULAW_LEVELS) == 256
+    assert all(ULAW_LEVELS[byte] == min(abs(int(ULAW_TO_PCM16[byte])) >> 7, 255) for byte in range(256))
+    # 0xFF and 0x7F are the two mu-law zeros
+    assert (ULAW_LEVELS[0xFF], ULAW_LEVELS[0x7F], ULAW_LEVELS[0x00]) == (0, 0, 250)
+
+
+def test_streaming_resampler_matches_one_shot_resampling():
+    samples = sine(440, 8000)
+    resampler = StreamingResampler(8000, 16000)
+    whole = resampler.process(samples)
+    resampler.reset()
+    # Twilio sends 20 ms frames
+    framed = np.concatenate([resampler.process(samples[i:i + 160]) for i in range(0, len(samples), 160)])
+
+    assert len(whole) == 16000
+    assert np.array_equal(whole, framed)
+
+
+def test_resampler_output_tracks_audioop_ratecv():
+    samples = sine(440, 8000)
+    ours = StreamingResampler(8000, 16000).process(samples)
+    theirs = np.frombuffer(audioop.ratecv(samples.tobytes(), 2, 1, 8000, 16000, None)[0], dtype="<i2")
+
+    # Align for the FIR filter's group delay, then compare the waveforms
+    def correlation(delay):
+        return np.corrcoef(ours[delay + 100:15000 + delay], theirs[100:15000])[0, 1]
+    delay = max(range(40), key=correlation)
+    assert correlation(delay) > 0.99
+    assert audioop.rms(ours.tobytes(), 2) == pytest.approx(audioop.rms(theirs.tobytes(), 2), rel=0.05)
+
+
+def test_downsampling_removes_content_above_the_new_nyquist():
+    # 6 kHz can't be represented at 8 kHz and must be filtered out, not aliased to 2 kHz
+    samples = sine(6000, 16000)
+    output = StreamingResampler(16000, 8000).process(samples)
+    assert len(output) == 8000
+    assert audioop.rms(output[200:].tobytes(), 2) < 0.05 * audioop.rms(samples.tobytes(), 2)
+
+
+def test_audio_converter_round_trip_and_odd_pcm_splits():
+    assert AudioConverter("ulaw_8000", "ulaw_8000").convert(b"\x01\x02") == b"\x01\x02"
+
+    converter = AudioConverter("pcm_8000", "ulaw_8000")
+    pcm = sine(440, 8000, seconds=0.02).tobytes()
+    out = converter.convert(pcm[:161]) + converter.convert(pcm[161:])
+    assert out == audioop.lin2ulaw(pcm, 2)
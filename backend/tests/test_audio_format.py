@@ -0,0 +1,58 @@
+import asyncio
+import io
+import os
+
+from app.utils import audio_format
+from app.utils.audio_format import WHISPER_FORMATS, sniff_audio_format, transcode_to_mp3
+
+MP4_HEADER = b"\x00\x00\x00\x20ftypisom" + bytes(52)
+M4A_HEADER = b"\x00\x00\x00\x20ftypM4A " + bytes(52)
+MP3_HEADER = b"ID3\x04" + bytes(60)
+MPEG_PS_HEADER = b"\x00\x00\x01\xba" + bytes(60)
+
+
+def test_sniffed_formats():
+    assert sniff_audio_format(MP4_HEADER) == "mp4"
+    assert sniff_audio_format(M4A_HEADER) == "m4a"
+    assert sniff_audio_format(MP3_HEADER) == "mp3"
+    assert sniff_audio_format(b"\xff\xfb\x90\x00") == "mp3"
+    assert sniff_audio_format(b"\xff\xf1\x50\x80") == "aac"
+    # An MPEG program stream is not what Whisper calls "mpeg", so it is transcoded
+    assert sniff_audio_format(MPEG_PS_HEADER) == "mpeg"
+    assert "mpeg" not in WHISPER_FORMATS
+
+
+def run_transcode(monkeypatch, content):
+    calls = []
+
+    async def fake_run_ffmpeg(args, input_file=None, output=None):
+        source = args[args.index("-i") + 1]
+        on_disk = None
+        if source != "pipe:0":
+            with open(source, "rb") as file:
+                on_disk = file.read()
+        calls.append((source, input_file, on_disk))
+        return io.BytesIO(b"mp3"), 0
+
+    monkeypatch.setattr(audio_format, "run_ffmpeg", fake_run_ffmpeg)
+    audio_file = io.BytesIO(content)
+    asyncio.run(transcode_to_mp3(audio_file))
+    return calls[0], audio_file
+
+
+def test_mp4_input_is_given_to_ffmpeg_as_a_file(monkeypatch):
+    content = MP4_HEADER + b"mdat" * 100 + b"moov"
+    (source, input_file, on_disk), _ = run_transcode(monkeypatch, content)
+
+    assert input_file is None
+    assert on_disk == content
+    # The temporary copy is removed once ffmpeg is done
+    assert not os.path.exists(source)
+
+
+def test_other_input_is_streamed_through_stdin(monkeypatch):
+    (source, input_file, on_disk), audio_file = run_transcode(monkeypatch, MPEG_PS_HEADER + b"pack" * 100)
+
+    assert source == "pipe:0"
+    assert input_file is audio_file
+    assert audio_file.tell() == 0
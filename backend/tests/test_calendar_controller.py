@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+
+from app.controllers import calendar_controller
+from app.controllers.calendar_controller import CalendarController
+
+
+class FakeFirebaseService:
+    def __init__(self, tokens, store_succeeds=True):
+        self.tokens = tokens
+        self.store_succeeds = store_succeeds
+        self.reads = []
+        self.writes = []
+
+    async def get_user_tokens_many(self, user_emails):
+        self.reads.append(list(user_emails))
+        return {email: self.tokens.get(email) for email in user_emails}
+
+    async def store_user_tokens_many(self, tokens_by_email):
+        self.writes.append(tokens_by_email)
+        return self.store_succeeds
+
+
+def make_controller(monkeypatch, tokens, store_succeeds=True):
+    service = FakeFirebaseService(tokens, store_succeeds)
+    monkeypatch.setattr(calendar_controller, "get_firebase_service", lambda: service)
+    controller = CalendarController()
+    refreshed = []
+
+    async def refresh_access_token(refresh_token):
+        refreshed.append(refresh_token)
+        if refresh_token == "revoked":
+            raise RuntimeError("invalid_grant")
+        return {"access_token": f"new-{refresh_token}", "token_expiry": 9999999999}
+
+    controller.refresh_access_token = refresh_access_token
+    return controller, service, refreshed
+
+
+def test_only_expired_tokens_are_refreshed_and_written_in_one_call(monkeypatch):
+    now = datetime.now().timestamp()
+    tokens = {
+        "expired@example.com": {"refresh_token": "r1", "access_token": "old", "token_expiry": now - 60, "scope": "cal"},
+        "valid@example.com": {"refresh_token": "r2", "access_token": "ok", "token_expiry": now + 3600},
+        "revoked@example.com": {"refresh_token": "revoked", "token_expiry": now - 60},
+        "no-refresh@example.com": {"access_token": "x"},
+    }
+    controller, service, refreshed = make_controller(monkeypatch, tokens)
+    emails = list(tokens) + ["unknown@example.com"]
+
+    result = asyncio.run(controller.refresh_expired_tokens(emails))
+
+    assert service.reads == [emails]
+    assert sorted(refreshed) == ["r1", "revoked"]
+    assert result == {
+        "refreshed": ["expired@example.com"],
+        "valid": ["valid@example.com"],
+        "missing": ["no-refresh@example.com", "unknown@example.com"],
+        "failed": ["revoked@example.com"],
+    }
+    # Refreshed fields are merged over the stored ones
+    assert service.writes == [{"expired@example.com": {
+        "refresh_token": "r1", "access_token": "new-r1", "token_expiry": 9999999999, "scope": "cal"
+    }}]
+
+
+def test_failed_write_reports_the_tokens_as_failed(monkeypatch):
+    tokens = {"expired@example.com": {"refresh_token": "r1", "token_expiry": 0}}
+    controller, service, _ = make_controller(monkeypatch, tokens, store_succeeds=False)
+
+    result = asyncio.run(controller.refresh_expired_tokens(list(tokens)))
+
+    assert result["refreshed"] == []
+    assert result["failed"] == ["expired@example.com"]
+
+
+def test_nothing_is_written_when_no_token_expired(monkeypatch):
+    tokens = {"valid@example.com": {"refresh_token": "r", "token_expiry": datetime.now().timestamp() + 3600}}
+    controller, service, refreshed = make_controller(monkeypatch, tokens)
+
+    assert asyncio.run(controller.refresh_expired_tokens(list(tokens)))["valid"] == ["valid@example.com"]
+    assert (refreshed, service.writes) == ([], [])
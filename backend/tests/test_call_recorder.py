@@ -0,0 +1,103 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils import call_recorder
+from app.utils.audio_codec import ULAW_TO_PCM16
+from app.utils.call_recorder import CallRecorder, recording_stats, render_recording_wav
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1761000000.0 + self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(call_recorder, "RECORDING_DIR", str(tmp_path))
+    monkeypatch.setattr(call_recorder, "time", clock)
+    return clock
+
+
+def frame(index, length=160):
+    return bytes((index * 7 + offset) % 256 for offset in range(length))
+
+
+def rendered_samples(path):
+    with render_recording_wav(path) as output:
+        with wave.open(output, "rb") as wav:
+            assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, 2, 8000)
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+
+
+def test_round_trip_mixes_both_directions_on_one_timeline(clock):
+    recorder = CallRecorder("CA1", max_seconds=5)
+    inbound = [frame(i) for i in range(10)]
+    for index, data in enumerate(inbound):
+        clock.now = index * 0.02
+        recorder.inbound(data)
+    # Agent audio sent in one burst is placed at the time it will play
+    clock.now = 0.1
+    outbound = [frame(100 + i) for i in range(3)]
+    for data in outbound:
+        recorder.outbound(data)
+    recorder.close()
+
+    expected = ULAW_TO_PCM16[np.frombuffer(b"".join(inbound), dtype=np.uint8)].astype(np.int32)
+    agent = ULAW_TO_PCM16[np.frombuffer(b"".join(outbound), dtype=np.uint8)]
+    mixed = np.zeros(max(len(expected), 800 + len(agent)), dtype=np.int32)
+    mixed[:len(expected)] += expected
+    mixed[800:800 + len(agent)] += agent
+    assert np.array_equal(rendered_samples(recorder.path), np.clip(mixed, -32768, 32767))
+
+    stats = recording_stats(recorder.path)
+    assert (stats["frames"], stats["bytes"], stats["started_at"]) == (13, 13 * 160, 1761000000.0)
+    assert oct(os.stat(recorder.path).st_mode & 0o777) == "0o600"
+
+
+def test_ring_wraps_and_keeps_the_latest_audio(clock):
+    recorder = CallRecorder("CA2", max_seconds=1)
+    # 150-byte frames don't divide the 16000-byte ring, so one frame is split across its end
+    frames = [frame(i, length=150) for i in range(120)]
+    for index, data in enumerate(frames):
+        clock.now = index * 150 / 8000
+        recorder.inbound(data)
+    recorder.close()
+
+    # The index holds the last 100 frames, whose audio is all still in the ring
+    kept = b"".join(frames[-recorder.index_capacity:])
+    expected = ULAW_TO_PCM16[np.frombuffer(kept, dtype=np.uint8)]
+    assert np.array_equal(rendered_samples(recorder.path), expected)
+    assert recording_stats(recorder.path)["seconds_kept"] == 2.0
+
+
+def test_interrupted_agent_audio_is_replaced_not_mixed(clock):
+    recorder = CallRecorder("CA3", max_seconds=5)
+    recorder.outbound(frame(1))
+    recorder.outbound(frame(2))
+    # Twilio cleared its buffer after the first frame played
+    clock.now = 0.02
+    recorder.clear()
+    recorder.outbound(frame(3))
+    recorder.close()
+
+    expected = ULAW_TO_PCM16[np.frombuffer(frame(1) + frame(3), dtype=np.uint8)]
+    assert np.array_equal(rendered_samples(recorder.path), expected)
+
+
+def test_unknown_files_are_rejected(clock, tmp_path):
+    path = tmp_path / "bogus.rec"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        render_recording_wav(str(path))
+    assert recording_stats(str(path)) is None
+    assert recording_stats(str(tmp_path / "missing.rec")) is None
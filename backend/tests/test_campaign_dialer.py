@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+from twilio.base.exceptions import TwilioRestException
+
+from app.services import campaign_dialer
+from app.services.campaign_dialer import CampaignDialer, TokenBucket
+
+real_sleep = asyncio.sleep
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1761000000.0 + self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await real_sleep(0)
+
+
+class FakeTwilio:
+    def __init__(self, failures=None):
+        # Exceptions to raise, per number, before a call is created
+        self.failures = {number: list(errors) for number, errors in (failures or {}).items()}
+        self.created = []
+
+    async def create_call(self, number, host_availability, host_email, host_name):
+        errors = self.failures.get(number)
+        if errors:
+            raise errors.pop(0)
+        self.created.append(number)
+        return SimpleNamespace(sid=f"CA{len(self.created)}")
+
+
+async def settle():
+    for _ in range(5):
+        await real_sleep(0.01)
+
+
+def test_token_bucket_paces_to_the_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(campaign_dialer, "time", clock)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+
+    async def main():
+        bucket = TokenBucket(rate=2, burst=2)
+        taken_at = []
+        for _ in range(5):
+            await bucket.take()
+            taken_at.append(clock.now)
+        return taken_at
+
+    # The burst goes out at once, then one token every 1 / rate seconds
+    assert asyncio.run(main()) == [0.0, 0.0, 0.5, 1.0, 1.5]
+
+
+def test_dialer_limits_concurrent_calls_and_follows_status_callbacks():
+    twilio = FakeTwilio()
+    created = []
+
+    async def main():
+        dialer = CampaignDialer(twilio, on_call_created=lambda sid, params: created.append((sid, params["host_name"])))
+        campaign = dialer.start(["5550000001", "+15550000002", "+15550000001", "+15550000003"],
+                                host_name="Sam", calls_per_second=1000, max_concurrent=2)
+        await settle()
+        # The duplicate is dialed once and only two calls run at a time
+        assert len(campaign.entries) == 3
+        assert (twilio.created, campaign.active) == (["+15550000001", "+15550000002"], 2)
+
+        assert dialer.on_status("CA1", "in-progress")
+        assert campaign.entries[0].state == "in-progress"
+        assert dialer.on_status("CA1", "completed")
+        await settle()
+        assert twilio.created[-1] == "+15550000003"
+
+        assert not dialer.on_status("CA-unknown", "completed")
+        dialer.on_status("CA2", "busy")
+        dialer.on_status("CA3", "no-answer")
+        await settle()
+        return campaign
+
+    campaign = asyncio.run(main())
+    assert campaign.status == "finished"
+    assert campaign.counts == {"completed": 1, "busy": 1, "no-answer": 1}
+    assert created == [("CA1", "Sam"), ("CA2", "Sam"), ("CA3", "Sam")]
+
+
+def test_only_throttling_and_connect_errors_are_retried(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(campaign_dialer, "time", clock)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    throttled = TwilioRestException(429, "/Calls", "Too Many Requests")
+    server_error = TwilioRestException(500, "/Calls", "Internal Server Error")
+    twilio = FakeTwilio({
+        "+15550000001": [throttled, throttled],
+        "+15550000002": [server_error],
+        "+15550000003": [throttled] * campaign_dialer.MAX_ATTEMPTS,
+    })
+
+    async def main():
+        dialer = CampaignDialer(twilio)
+        # Token waits of 1 / 4 s stay exact on the fake clock and apart from the backoff sleeps
+        campaign = dialer.start(["+15550000001", "+15550000002", "+15550000003"],
+                                calls_per_second=4, max_concurrent=5)
+        await campaign.task
+        return campaign
+
+    campaign = asyncio.run(main())
+    first, second, third = campaign.entries
+    assert (first.state, first.attempts) == ("initiated", 3)
+    # A 500 may mean the call was placed, so it is not retried
+    assert (second.state, second.attempts, second.error) == ("error", 1, "500: Internal Server Error")
+    assert (third.state, third.attempts) == ("error", campaign_dialer.MAX_ATTEMPTS)
+    assert twilio.created == ["+15550000001"]
+    # Exponential backoff between attempts
+    assert sorted(seconds for seconds in clock.sleeps if seconds >= 1) == [1, 1, 2, 2]
+    assert campaign.active == 1
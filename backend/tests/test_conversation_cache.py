@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+
+from app.utils.conversation_cache import ConversationCache
+
+
+def conversation(conversation_id, status="done", size=0):
+    return {"conversation_id": conversation_id, "status": status, "transcript": "x" * size}
+
+
+def raw_size(value):
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def test_concurrent_lookups_share_one_fetch(tmp_path):
+    cache = ConversationCache(str(tmp_path))
+    fetches = []
+
+    async def fetch(conversation_id):
+        fetches.append(conversation_id)
+        await asyncio.sleep(0.01)
+        return conversation(conversation_id)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("c1", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert fetches == ["c1"]
+    assert all(result == conversation("c1") for result in results)
+    # Every caller gets its own copy
+    results[0]["status"] = "changed"
+    assert results[1]["status"] == "done"
+    assert (cache.counts["miss"], cache.counts["coalesced"]) == (1, 4)
+    assert cache.get("c1") == conversation("c1")
+
+
+def test_fetch_errors_reach_every_waiter_and_are_not_cached(tmp_path):
+    cache = ConversationCache(str(tmp_path))
+    calls = []
+
+    async def fetch(conversation_id):
+        calls.append(conversation_id)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("c1", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == ["c1"]
+    assert cache.in_flight == {}
+    assert cache.get("c1") is None
+
+
+def test_cancelled_leader_lets_a_waiter_fetch(tmp_path):
+    cache = ConversationCache(str(tmp_path))
+    started = []
+
+    async def fetch(conversation_id):
+        started.append(conversation_id)
+        await asyncio.sleep(0.05)
+        return conversation(conversation_id)
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_fetch("c1", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_fetch("c1", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await waiter
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(main()) == conversation("c1")
+    assert started == ["c1", "c1"]
+
+
+def test_unfinished_conversations_are_not_cached(tmp_path):
+    cache = ConversationCache(str(tmp_path))
+
+    async def fetch(conversation_id):
+        return conversation(conversation_id, status="processing")
+
+    assert asyncio.run(cache.get_or_fetch("c1", fetch))["status"] == "processing"
+    assert cache.get("c1") is None
+    assert cache.counts["uncacheable"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used_and_falls_back_to_disk(tmp_path):
+    entry_size = raw_size(conversation("c0", size=100))
+    cache = ConversationCache(str(tmp_path), memory_max_bytes=entry_size * 2)
+    for index in range(3):
+        cache.put(f"c{index}", conversation(f"c{index}", size=100))
+
+    assert list(cache.memory) == ["c1", "c2"]
+    assert cache.memory_bytes == entry_size * 2
+    # The evicted entry is still on disk and comes back into memory
+    assert cache.get("c0") == conversation("c0", size=100)
+    assert cache.counts["disk"] == 1
+    assert list(cache.memory) == ["c2", "c0"]
+
+
+def test_disk_tier_evicts_least_recently_used_files(tmp_path):
+    cache = ConversationCache(str(tmp_path), memory_max_bytes=1, disk_max_bytes=10 ** 9)
+    for index in range(3):
+        cache.put(f"c{index}", conversation(f"c{index}", size=50))
+    file_size = cache.disk["c0"]
+    cache.get("c0")
+
+    cache.disk_max_bytes = file_size * 3
+    cache.put("c3", conversation("c3", size=50))
+
+    assert list(cache.disk) == ["c2", "c0", "c3"]
+    assert not (tmp_path / "c1" / "c1.json.z").exists()
+    assert ConversationCache(str(tmp_path)).disk.keys() == {"c2", "c0", "c3"}
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import socket
+import uuid
+
+import pytest
+
+
+def emulator_reachable():
+    host = os.getenv("FIRESTORE_EMULATOR_HOST")
+    if not host:
+        return False
+    hostname, _, port = host.rpartition(":")
+    try:
+        socket.create_connection((hostname, int(port)), timeout=1).close()
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+pytestmark = pytest.mark.skipif(
+    not emulator_reachable(), reason="needs the Firestore emulator (set FIRESTORE_EMULATOR_HOST)"
+)
+
+
+@pytest.fixture
+def service():
+    from app.services.firebase_service import FirebaseService
+    return FirebaseService()
+
+
+def test_bulk_tokens_round_trip_across_batches(service):
+    from app.services.firebase_service import MAX_BATCH_READS, MAX_BATCH_WRITES
+
+    run = uuid.uuid4().hex
+    emails = [f"user{i}-{run}@example.com" for i in range(MAX_BATCH_WRITES + 50)]
+    missing = [f"missing{i}-{run}@example.com" for i in range(3)]
+    assert len(emails) > MAX_BATCH_READS
+
+    async def main():
+        stored = await service.store_user_tokens_many(
+            {email: {"access_token": f"token-{i}", "token_expiry": i} for i, email in enumerate(emails)}
+        )
+        assert stored
+        # Merged writes keep the fields they don't mention
+        assert await service.store_user_tokens_many({emails[0]: {"access_token": "new"}})
+        return await service.get_user_tokens_many(emails + missing + emails[:2])
+
+    tokens = asyncio.run(main())
+    assert list(tokens) == emails + missing
+    assert tokens[emails[0]] == {"access_token": "new", "token_expiry": 0}
+    assert all(tokens[email]["access_token"] == f"token-{i}" for i, email in enumerate(emails) if i)
+    assert all(tokens[email] is None for email in missing)
+
+
+def test_bulk_read_of_nobody_is_empty(service):
+    assert asyncio.run(service.get_user_tokens_many([])) == {}
@@ -0,0 +1,92 @@
+import asyncio
+
+from app.utils.job_queue import JobQueue
+
+
+def test_jobs_run_on_a_fixed_number_of_workers():
+    async def main():
+        running = 0
+        peak = 0
+        done = []
+
+        async def handler(job_id, delay):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(delay)
+            running -= 1
+            done.append(job_id)
+
+        queue = JobQueue("test", handler, workers=2)
+        assert all(queue.submit(i, 0.01) for i in range(6))
+        await queue.stop()
+        return queue, peak, done
+
+    queue, peak, done = asyncio.run(main())
+    assert peak == 2
+    assert sorted(done) == list(range(6))
+    assert queue.stats() == {"workers": 2, "queued": 0, "submitted": 6, "succeeded": 6, "failed": 0, "dropped": 0}
+
+
+def test_a_failing_job_does_not_stop_its_worker():
+    async def main():
+        done = []
+
+        async def handler(job_id):
+            if job_id == "bad":
+                raise RuntimeError("boom")
+            done.append(job_id)
+
+        queue = JobQueue("test", handler, workers=1)
+        for job_id in ("a", "bad", "b"):
+            queue.submit(job_id)
+        await queue.stop()
+        return queue, done
+
+    queue, done = asyncio.run(main())
+    assert done == ["a", "b"]
+    assert (queue.counts["succeeded"], queue.counts["failed"]) == (2, 1)
+
+
+def test_submit_drops_jobs_when_the_queue_is_full():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(job_id):
+            await release.wait()
+
+        queue = JobQueue("test", handler, workers=1, max_size=2)
+        queue.submit(1)
+        await asyncio.sleep(0)
+        # One job is running, two fill the queue, the fourth is dropped without blocking
+        results = [queue.submit(2), queue.submit(3), queue.submit(4)]
+        release.set()
+        await queue.stop()
+        return queue, results
+
+    queue, results = asyncio.run(main())
+    assert results == [True, True, False]
+    assert (queue.counts["submitted"], queue.counts["succeeded"], queue.counts["dropped"]) == (3, 3, 1)
+
+
+def test_stop_cancels_jobs_that_outlive_the_timeout():
+    async def main():
+        cancelled = []
+
+        async def handler(job_id):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(job_id)
+                raise
+
+        queue = JobQueue("test", handler, workers=1)
+        queue.submit("slow")
+        queue.submit("queued")
+        await asyncio.sleep(0)
+        await queue.stop(timeout=0.05)
+        return queue, cancelled
+
+    queue, cancelled = asyncio.run(main())
+    assert cancelled == ["slow"]
+    assert (queue.queue, queue.tasks) == (None, [])
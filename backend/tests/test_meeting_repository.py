@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from app.services.meeting_repository import MeetingRepository, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = MeetingRepository(str(tmp_path / "meetings.db"))
+    yield repository
+    repository.close()
+
+
+def test_add_commits_before_returning(tmp_path):
+    path = str(tmp_path / "meetings.db")
+    repository = MeetingRepository(path)
+    meeting = repository.add({"title": "Intro", "userId": "alice", "startDateTime": "2026-10-20T10:00:00Z"})
+
+    # A second connection sees the row straight away, nothing is left in a buffer
+    other = sqlite3.connect(path)
+    assert other.execute("SELECT user_id FROM meetings WHERE id = ?", (meeting["id"],)).fetchone() == ("alice",)
+    other.close()
+    repository.close()
+
+
+def test_client_ids_are_replaced_so_meetings_cannot_be_overwritten(repository):
+    original = repository.add({"title": "Alice's meeting", "userId": "alice"})
+    forged = repository.add({"id": original["id"], "title": "Mallory's meeting", "userId": "mallory"})
+
+    assert forged["id"] != original["id"]
+    assert repository.get(original["id"])["title"] == "Alice's meeting"
+    assert repository.count() == 2
+
+
+def test_add_many_inserts_all_or_nothing(repository):
+    created = repository.add_many([{"title": f"Meeting {i}"} for i in range(3)])
+    assert len({meeting["id"] for meeting in created}) == 3
+    assert repository.count() == 3
+
+    repository.connection.execute(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON meetings WHEN NEW.data LIKE '%bad%' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    )
+    with pytest.raises(sqlite3.Error):
+        repository.add_many([{"title": "good"}, {"title": "bad"}])
+    assert repository.count() == 3
+
+
+def test_update_only_replaces_the_owners_meeting(repository):
+    meeting = repository.add({"title": "Intro", "userId": "alice"})
+
+    assert repository.update(meeting["id"], {"title": "Hijacked"}, "mallory") is None
+    assert repository.get(meeting["id"])["title"] == "Intro"
+
+    updated = repository.update(meeting["id"], {"title": "Follow-up", "userId": "mallory",
+                                                "startDateTime": "2026-10-21T09:00:00Z"}, "alice")
+    assert updated == {"title": "Follow-up", "userId": "alice", "startDateTime": "2026-10-21T09:00:00Z",
+                       "id": meeting["id"]}
+    assert repository.get(meeting["id"]) == updated
+    assert repository.find(user_id="alice", start_from=0) == [updated]
+    assert repository.update("missing", {"title": "x"}, "alice") is None
+
+
+def test_pages_follow_start_time_order(repository):
+    starts = ["2026-10-22T10:00:00Z", None, "2026-10-21T09:00:00Z", "2026-10-21T10:00:00+02:00", "2026-10-23"]
+    for index, start in enumerate(starts):
+        repository.add({"title": str(index), "userId": "alice", "startDateTime": start})
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = repository.page(user_id="alice", cursor=cursor, limit=2)
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert pages == list(repository.iter_json(user_id="alice", batch_size=2))
+    # Meetings without a start time sort first, the rest by UTC start (10:00+02:00 is before 09:00Z)
+    assert [meeting["title"] for meeting in repository.find(user_id="alice")] == ["1", "3", "2", "0", "4"]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(1761000000.0, "abc")) == (1761000000.0, "abc")
+    assert decode_cursor(encode_cursor(None, "abc")) == (None, "abc")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
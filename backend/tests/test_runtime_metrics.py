@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from app.utils import runtime_metrics
+from app.utils.metrics import registry
+
+
+def frame_lines():
+    return sorted(
+        line for line in registry.render().splitlines()
+        if line.startswith(("media_stream_received_frames_total{", "media_stream_sent_frames_total{"))
+    )
+
+
+def test_frame_counters_are_read_without_changing_state():
+    stream = SimpleNamespace(stream_sid="MZ1", media_packet_count=120, output_packet_count=40, output_queue=None)
+    runtime_metrics.register_stream(stream)
+    try:
+        first = frame_lines()
+        # Any number of scrapers see the same monotonic totals
+        assert frame_lines() == first == [
+            'media_stream_received_frames_total{stream_sid="MZ1"} 120',
+            'media_stream_sent_frames_total{stream_sid="MZ1"} 40',
+        ]
+        stream.media_packet_count += 50
+        assert 'media_stream_received_frames_total{stream_sid="MZ1"} 170' in frame_lines()
+        assert "# TYPE media_stream_received_frames_total counter" in registry.render()
+    finally:
+        runtime_metrics.unregister_stream(stream)
+    assert frame_lines() == []
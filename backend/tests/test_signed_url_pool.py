@@ -0,0 +1,73 @@
+import asyncio
+
+from app.utils import signed_url_pool
+from app.utils.signed_url_pool import SignedUrlPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def counting_fetch():
+    minted = []
+
+    async def fetch():
+        minted.append(f"url-{len(minted) + 1}")
+        return minted[-1]
+    return fetch, minted
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def test_urls_are_handed_out_soonest_expiring_first_and_dropped_near_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(signed_url_pool, "time", clock)
+    fetch, minted = counting_fetch()
+
+    async def main():
+        pool = SignedUrlPool(fetch, size=2, ttl=100, expiry_margin=10)
+        pool.start()
+        await settle()
+        assert [url for url, _ in pool.entries] == ["url-1", "url-2"]
+
+        clock.now = 50
+        assert await pool.get() == "url-1"
+        await settle()
+        # The replacement expires after the URL still in the pool, so it queues behind it
+        assert list(pool.entries) == [("url-2", 100), ("url-3", 150)]
+
+        # url-2 is within the expiry margin and is discarded instead of handed out
+        clock.now = 95
+        assert await pool.get() == "url-3"
+        assert pool.counts["expired"] == 1
+        await settle()
+        assert [url for url, _ in pool.entries] == ["url-4", "url-5"]
+        await pool.stop()
+        return pool.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["hit"], stats["miss"], stats["hit_ratio"]) == (2, 0, 1.0)
+    assert minted == ["url-1", "url-2", "url-3", "url-4", "url-5"]
+
+
+def test_empty_pool_fetches_directly(monkeypatch):
+    monkeypatch.setattr(signed_url_pool, "time", Clock())
+    fetch, minted = counting_fetch()
+
+    async def main():
+        pool = SignedUrlPool(fetch, size=0)
+        url = await pool.get()
+        await pool.stop()
+        return pool, url
+
+    pool, url = asyncio.run(main())
+    assert url == "url-1"
+    assert (pool.counts["hit"], pool.counts["miss"]) == (0, 1)
+    assert minted == ["url-1"]
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.task_pools import PoolSaturatedError, TaskPools
+
+
+class Gate:
+    """Blocking work that holds its worker until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def work(self, value=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+        return value
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def test_concurrency_is_limited_and_slots_are_handed_on():
+    async def main():
+        pools = TaskPools(thread_workers=8)
+        task_type = pools.register("test", concurrency=2, max_queue=10)
+        gate = Gate()
+        tasks = [asyncio.create_task(pools.run("test", gate.work, i)) for i in range(5)]
+        await settle()
+        assert (task_type.running, len(task_type.waiters)) == (2, 3)
+
+        gate.release.set()
+        assert await asyncio.gather(*tasks) == [0, 1, 2, 3, 4]
+        await settle()
+        assert gate.peak == 2
+        assert (task_type.running, len(task_type.waiters), task_type.completed) == (0, 0, 5)
+        pools.shutdown()
+
+    asyncio.run(main())
+
+
+def test_full_queue_raises_pool_saturated():
+    async def main():
+        pools = TaskPools(thread_workers=4)
+        task_type = pools.register("test", concurrency=1, max_queue=1)
+        gate = Gate()
+        running = asyncio.create_task(pools.run("test", gate.work))
+        queued = asyncio.create_task(pools.run("test", gate.work))
+        await settle()
+
+        with pytest.raises(PoolSaturatedError) as error:
+            await pools.run("test", gate.work)
+        assert (error.value.task_name, error.value.queued) == ("test", 1)
+        assert task_type.rejected == 1
+
+        gate.release.set()
+        await asyncio.gather(running, queued)
+        pools.shutdown()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        pools = TaskPools(thread_workers=4)
+        task_type = pools.register("test", concurrency=1, max_queue=4)
+        gate = Gate()
+        running = asyncio.create_task(pools.run("test", gate.work))
+        waiting = asyncio.create_task(pools.run("test", gate.work))
+        await settle()
+
+        waiting.cancel()
+        await settle()
+        assert len(task_type.waiters) == 0
+        assert task_type.running == 1
+
+        gate.release.set()
+        await running
+        await settle()
+        assert task_type.running == 0
+        pools.shutdown()
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_running_task_keeps_its_slot_until_the_work_ends():
+    async def main():
+        pools = TaskPools(thread_workers=4)
+        task_type = pools.register("test", concurrency=1, max_queue=4)
+        gate = Gate()
+        running = asyncio.create_task(pools.run("test", gate.work))
+        await settle()
+
+        running.cancel()
+        queued = asyncio.create_task(pools.run("test", gate.work, "next"))
+        await settle()
+        # The cancelled work is still on its thread, so the next task must wait
+        assert gate.running == 1
+        assert (task_type.running, len(task_type.waiters)) == (1, 1)
+
+        gate.release.set()
+        assert await queued == "next"
+        assert gate.peak == 1
+        pools.shutdown()
+
+    asyncio.run(main())
+
+
+def test_run_when_free_waits_past_a_full_queue():
+    async def main():
+        pools = TaskPools(thread_workers=4)
+        task_type = pools.register("test", concurrency=1, max_queue=1)
+        gate = Gate()
+        running = asyncio.create_task(pools.run("test", gate.work, "first"))
+        queued = asyncio.create_task(pools.run("test", gate.work, "second"))
+        waiting = asyncio.create_task(pools.run_when_free("test", gate.work, "third"))
+        await settle()
+        assert not waiting.done()
+        assert (len(task_type.waiters), task_type.rejected) == (2, 0)
+
+        gate.release.set()
+        assert await asyncio.gather(running, queued, waiting) == ["first", "second", "third"]
+        assert gate.peak == 1
+        pools.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+from app.controllers import audio_controller
+from app.utils.transcription_cache import TranscriptionCache
+
+SIGNED_URL = "https://storage.example.com/call.mp3?X-Goog-Signature=secret-token"
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def test_url_index_is_keyed_by_url_hash(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    cache.put("a" * 64, "hello")
+    cache.set_url_entry(SIGNED_URL, "a" * 64, etag='"v1"')
+
+    on_disk = (tmp_path / "url_index.json").read_text()
+    assert "secret-token" not in on_disk
+    assert list(json.loads(on_disk)) == [url_key(SIGNED_URL)]
+    assert TranscriptionCache(str(tmp_path)).get_url_entry(SIGNED_URL)["etag"] == '"v1"'
+
+    cache.set_url_entry(SIGNED_URL, "a" * 64)
+    assert cache.get_url_entry(SIGNED_URL) is None
+
+
+def test_old_url_keys_are_hashed_on_load(tmp_path):
+    (tmp_path / "url_index.json").write_text(json.dumps({SIGNED_URL: {"hash": "b" * 64, "etag": '"v1"'}}))
+
+    cache = TranscriptionCache(str(tmp_path))
+
+    assert list(cache.url_index) == [url_key(SIGNED_URL)]
+    assert "secret-token" not in (tmp_path / "url_index.json").read_text()
+
+
+class FakeAudioFile:
+    closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+@pytest.fixture
+def controller(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    cache = TranscriptionCache(str(tmp_path))
+    monkeypatch.setattr(audio_controller, "get_transcription_cache", lambda: cache)
+    controller = audio_controller.AudioController()
+    return controller
+
+
+def test_transcribe_url_uses_the_download_metadata(controller):
+    downloads = []
+    metadata = {"sha256": "c" * 64, "bytes": 3, "etag": '"v1"', "last_modified": None}
+
+    async def download_audio(url, headers=None):
+        downloads.append(headers)
+        if headers:
+            return None, None
+        return FakeAudioFile(), dict(metadata)
+
+    async def transcribe_audio(audio_file, chunked=None, speech_profile=None):
+        return "transcript"
+
+    controller.download_audio = download_audio
+    controller.transcribe_audio = transcribe_audio
+
+    assert asyncio.run(controller.transcribe_url(SIGNED_URL)) == "transcript"
+    assert controller.last_audio_stats["cache"] == "miss"
+    # The second request is conditional and the 304 is served from the cache
+    assert asyncio.run(controller.transcribe_url(SIGNED_URL)) == "transcript"
+    assert controller.last_audio_stats == {"cache": "revalidated", "sha256": "c" * 64}
+    assert downloads == [None, {"If-None-Match": '"v1"'}]
@@ -0,0 +1,114 @@
+import numpy as np
+
+from app.utils.audio_codec import pcm16_to_ulaw
+from app.utils.voice_activity import SilenceGate, apply_hangover, detect_speech, frame_energy_db, speech_segments
+
+RATE = 16000
+FRAME = RATE * 20 // 1000
+
+
+def tone(seconds, amplitude=8000, frequency=300):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def noise(seconds, level=30, seed=0):
+    return np.random.default_rng(seed).normal(0, level, int(RATE * seconds)).astype(np.int16)
+
+
+def test_frame_energy_is_in_dbfs():
+    full_scale_square = np.full(FRAME * 2, 32767, dtype=np.int16)
+    energy = frame_energy_db(np.concatenate((full_scale_square, np.zeros(FRAME + 5, dtype=np.int16))), FRAME)
+
+    # The trailing partial frame is ignored
+    assert len(energy) == 3
+    assert np.allclose(energy[:2], 0.0, atol=0.01)
+    assert energy[2] < -100
+
+
+def test_hangover_extends_speech_runs():
+    speech = np.array([0, 1, 0, 0, 0, 0, 1, 0], dtype=bool)
+    assert apply_hangover(speech, 2).tolist() == [False, True, True, True, False, False, True, True]
+    assert apply_hangover(speech, 0) is speech
+
+
+def test_detect_speech_finds_speech_over_background_noise():
+    samples = np.concatenate((noise(1.0), tone(0.5) + noise(0.5, seed=1), noise(1.0, seed=2)))
+    speech = detect_speech(samples, RATE, hangover_ms=0)
+
+    assert len(speech) == 125
+    assert speech[50:75].all()
+    assert not speech[:50].any() and not speech[75:].any()
+    # The hangover keeps word endings
+    assert detect_speech(samples, RATE, hangover_ms=100)[75:80].all()
+
+
+def test_silence_is_never_speech():
+    assert not detect_speech(np.zeros(RATE, dtype=np.int16), RATE).any()
+    assert len(detect_speech(np.zeros(10, dtype=np.int16), RATE)) == 0
+
+
+def test_speech_segments_merge_short_gaps_and_pad_long_ones():
+    speech = np.zeros(300, dtype=bool)
+    speech[100:120] = True
+    speech[130:150] = True   # 200 ms gap, merged
+    speech[250:260] = True   # 2 s gap, a new segment
+
+    assert speech_segments(speech, min_silence_ms=1000, padding_ms=200) == [(90, 160), (240, 270)]
+    assert speech_segments(np.zeros(10, dtype=bool)) == []
+    # Padding is clipped to the recording
+    assert speech_segments(np.ones(5, dtype=bool), padding_ms=200) == [(0, 5)]
+
+
+def ulaw_frame(amplitude, seed=0):
+    if amplitude:
+        samples = tone(0.02, amplitude)[::2]
+    else:
+        samples = np.random.default_rng(seed).normal(0, 8, 160).astype(np.int16)
+    return pcm16_to_ulaw(samples)
+
+
+def make_gate():
+    # 5 frames of hangover, a keepalive every 3 suppressed frames, 2 frames of preroll
+    return SilenceGate(frame_ms=20, hangover_ms=100, turn_end_ms=0, keepalive_ms=60, preroll_ms=40)
+
+
+def test_gate_suppresses_silence_with_keepalives():
+    gate = make_gate()
+    silence = [ulaw_frame(0, seed) for seed in range(9)]
+    outputs = [gate.process(frame) for frame in silence]
+
+    assert [len(out) for out in outputs] == [0, 0, 1, 0, 0, 1, 0, 0, 1]
+    assert all(out == [gate.comfort_noise(160)] for out in outputs if out)
+    assert gate.stats()["suppressed"] == 9 and gate.keepalives == 3
+    assert gate.suppressed_percent() == 100.0
+
+
+def test_gate_replays_preroll_at_speech_onset_and_holds_open_for_the_hangover():
+    gate = make_gate()
+    silence = [ulaw_frame(0, seed) for seed in range(4)]
+    for frame in silence:
+        gate.process(frame)
+    speech = ulaw_frame(8000)
+
+    # The last two suppressed frames come back ahead of the speech
+    assert gate.process(speech) == silence[-2:] + [speech]
+    trailing = [ulaw_frame(0, seed) for seed in range(10, 17)]
+    outputs = [gate.process(frame) for frame in trailing]
+    assert outputs[:5] == [[frame] for frame in trailing[:5]]
+    assert outputs[5] == [gate.comfort_noise(160)] and outputs[6] == []
+
+    stats = gate.stats()
+    assert stats["frames"] == 12
+    assert stats["forwarded"] + stats["suppressed"] == stats["frames"]
+    assert (stats["forwarded"], stats["suppressed"]) == (8, 4)
+
+
+def test_gate_turn_end_window_keeps_the_pause_in_real_time():
+    gate = SilenceGate(frame_ms=20, hangover_ms=100, turn_end_ms=400, keepalive_ms=60, preroll_ms=0)
+    gate.process(ulaw_frame(8000))
+    outputs = [gate.process(ulaw_frame(0, seed)) for seed in range(25)]
+
+    # 400 ms of silence after speech reaches the agent unchanged before thinning starts
+    assert all(len(out) == 1 for out in outputs[:20])
+    assert outputs[20:] == [[gate.comfort_noise(160)], [], [], [gate.comfort_noise(160)], []]